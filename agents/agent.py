@@ -2,16 +2,22 @@
 
 import asyncio
 import os
+import time
+import weakref
 from contextlib import AsyncExitStack
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from typing import Any
 
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
 
 from .tools.base import Tool
-from .utils.connections import setup_mcp_connections
+from .utils import tracing
+from .utils.compaction import Compactor
+from .utils.connections import MCPConnectionPool, setup_mcp_connections
 from .utils.history_util import MessageHistory
-from .utils.tool_util import execute_tools
+from .utils.schema_cache import ToolSchemaCache
+from .utils.tool_util import ToolDispatcher, ToolScheduler, execute_tools
+from .utils.tracing import Span, Tracer
 
 
 @dataclass
@@ -30,6 +36,34 @@ class ModelConfig:
     context_window_tokens: int = 180000
 
 
+@dataclass
+class StreamMetrics:
+    """Timing for one streamed API call."""
+
+    time_to_first_token: float | None
+    total_time: float
+    tools_dispatched_early: int = 0
+
+
+def _record_response(span: Span, response: Any) -> None:
+    """Token usage and stop reason of an API response as span attributes."""
+    usage = response.usage
+    span.set_attributes(
+        stop_reason=getattr(response, "stop_reason", None),
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        cache_read_input_tokens=(
+            getattr(usage, "cache_read_input_tokens", 0) or 0
+        ),
+        cache_creation_input_tokens=(
+            getattr(usage, "cache_creation_input_tokens", 0) or 0
+        ),
+        tool_calls=sum(
+            1 for block in response.content if block.type == "tool_use"
+        ),
+    )
+
+
 class Agent:
     """Claude-powered agent with tool use capabilities."""
 
@@ -41,8 +75,14 @@ class Agent:
         mcp_servers: list[dict[str, Any]] | None = None,
         config: ModelConfig | None = None,
         verbose: bool = False,
-        client: Anthropic | None = None,
+        client: Anthropic | AsyncAnthropic | None = None,
         message_params: dict[str, Any] | None = None,
+        stream: bool = False,
+        mcp_pool: MCPConnectionPool | None = None,
+        mcp_schema_cache: ToolSchemaCache | None = None,
+        compactor: Compactor | None = None,
+        tool_scheduler: ToolScheduler | None = None,
+        tracer: Tracer | None = None,
     ):
         """Initialize an Agent.
         
@@ -53,9 +93,31 @@ class Agent:
             mcp_servers: MCP server configurations
             config: Model configuration with defaults
             verbose: Enable detailed logging
-            client: Anthropic client instance
+            client: Anthropic client instance. Defaults to AsyncAnthropic so
+                    API calls never block the event loop; a sync Anthropic
+                    client is run in a worker thread instead.
             message_params: Additional parameters for client.messages.create().
                            These override any conflicting parameters from config.
+            stream: Stream responses and start each tool as soon as its
+                    tool_use block is complete. Requires an AsyncAnthropic
+                    client.
+            mcp_pool: Keep MCP connections open in this pool across runs
+                      instead of reconnecting every turn.
+            mcp_schema_cache: Build MCP tools from cached schemas instead
+                              of waiting for every server to list them;
+                              changed schemas are swapped in for the next
+                              turn. Pools use their own schema_cache
+                              instead.
+            compactor: Compaction strategies applied when the history
+                       outgrows the context window (defaults to eliding
+                       old tool results, clipping large blocks, then
+                       dropping the oldest messages).
+            tool_scheduler: Concurrency limits and timeouts for tool calls.
+                            Share one scheduler between agents to cap
+                            load on common backends.
+            tracer: Records a span per run, turn, API call and tool call
+                    (see utils.tracing for JSONL, in-memory and
+                    OpenTelemetry exporters).
         """
         self.name = name
         self.system = system
@@ -63,96 +125,226 @@ class Agent:
         self.tools = list(tools or [])
         self.config = config or ModelConfig()
         self.mcp_servers = mcp_servers or []
+        self.mcp_pool = mcp_pool
+        self.mcp_schema_cache = mcp_schema_cache
+        self.tool_scheduler = tool_scheduler or ToolScheduler()
+        self.tracer = tracer or Tracer()
         self.message_params = message_params or {}
-        self.client = client or Anthropic(
+        self._owns_client = client is None
+        self.client = client or AsyncAnthropic(
             api_key=os.environ.get("ANTHROPIC_API_KEY", "")
         )
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_finalizer: weakref.finalize | None = None
+        # Tool definitions in API format, keyed by the tools they came from
+        self._tool_payloads: tuple[tuple[Tool, ...], list] = ((), [])
+        self.stream = stream
+        self.stream_metrics: list[StreamMetrics] = []
+        if self.stream and not isinstance(self.client, AsyncAnthropic):
+            raise ValueError("stream=True requires an AsyncAnthropic client")
         self.history = MessageHistory(
             model=self.config.model,
             system=self.system,
             context_window_tokens=self.config.context_window_tokens,
             client=self.client,
+            compactor=compactor,
         )
 
         if self.verbose:
             print(f"\n[{self.name}] Agent initialized")
 
+    def _swap_tools(self, old: list[Tool], new: list[Tool]) -> None:
+        """Replace `old` tools with `new` ones in a single assignment.
+
+        A turn builds its tool list from self.tools once, so it sees
+        either the old tools or the new ones, never a mix.
+        """
+        old_ids = set(map(id, old))
+        index = next(
+            (i for i, tool in enumerate(self.tools) if id(tool) in old_ids),
+            None,
+        )
+        if index is None:
+            # The run that loaded them is over
+            return
+        kept = [tool for tool in self.tools if id(tool) not in old_ids]
+        self.tools = kept[:index] + list(new) + kept[index:]
+
+    def _tool_dicts(self) -> list[dict[str, Any]]:
+        """Tool definitions in API format, rebuilt only when tools change."""
+        # Holding the tools keeps their ids from being reused by new ones
+        cached, payloads = self._tool_payloads
+        if len(cached) != len(self.tools) or not all(
+            a is b for a, b in zip(cached, self.tools)
+        ):
+            payloads = [tool.to_dict() for tool in self.tools]
+            self._tool_payloads = (tuple(self.tools), payloads)
+        return payloads
+
     def _prepare_message_params(self) -> dict[str, Any]:
         """Prepare parameters for client.messages.create() call.
         
         Returns a dict with base parameters from config, with any
         message_params overriding conflicting keys.
         """
+        has_tools = bool(self.tools)
         return {
             "model": self.config.model,
             "max_tokens": self.config.max_tokens,
             "temperature": self.config.temperature,
-            "system": self.system,
-            "messages": self.history.format_for_api(),
-            "tools": [tool.to_dict() for tool in self.tools],
+            "system": self.history.format_system(has_tools=has_tools),
+            "messages": self.history.format_for_api(has_tools=has_tools),
+            "tools": self.history.format_tools(self._tool_dicts()),
             **self.message_params,
         }
 
+    async def _create_message(self, **kwargs) -> Any:
+        """Call messages.create without blocking the event loop."""
+        if isinstance(self.client, AsyncAnthropic):
+            return await self.client.messages.create(**kwargs)
+        return await asyncio.to_thread(self.client.messages.create, **kwargs)
+
+    async def _stream_message(
+        self, dispatcher: ToolDispatcher, **kwargs
+    ) -> Any:
+        """Stream a response, dispatching tools as their input completes."""
+        start = time.perf_counter()
+        first_token = None
+
+        async with self.client.messages.stream(**kwargs) as stream:
+            async for event in stream:
+                if first_token is None and event.type == "content_block_delta":
+                    first_token = time.perf_counter() - start
+                elif (
+                    event.type == "content_block_stop"
+                    and event.content_block.type == "tool_use"
+                ):
+                    dispatcher.submit(event.content_block)
+            response = await stream.get_final_message()
+
+        metrics = StreamMetrics(
+            time_to_first_token=first_token,
+            total_time=time.perf_counter() - start,
+            tools_dispatched_early=dispatcher.dispatched,
+        )
+        self.stream_metrics.append(metrics)
+        tracing.current_span().set_attributes(
+            time_to_first_token_ms=(
+                None if first_token is None else first_token * 1000
+            ),
+            tools_dispatched_early=dispatcher.dispatched,
+        )
+        if self.verbose and first_token is not None:
+            print(
+                f"\n[{self.name}] Time to first token: "
+                f"{first_token * 1000:.0f}ms"
+            )
+        return response
+
     async def _agent_loop(self, user_input: str) -> list[dict[str, Any]]:
         """Process user input and handle tool calls in a loop"""
         if self.verbose:
             print(f"\n[{self.name}] Received: {user_input}")
         await self.history.add_message("user", user_input, None)
 
-        tool_dict = {tool.name: tool for tool in self.tools}
-
+        turn = 0
         while True:
-            self.history.truncate()
-            params = self._prepare_message_params()
-
-            # Merge headers properly - default beta header can be overridden by message_params
-            default_headers = {"anthropic-beta": "code-execution-2025-05-22"}
-            if "extra_headers" in params:
-                # Pop extra_headers from params and merge with defaults
-                custom_headers = params.pop("extra_headers")
-                merged_headers = {**default_headers, **custom_headers}
+            turn += 1
+            # Rebuilt every turn: MCP tools may be swapped in mid-run
+            tool_dict = {tool.name: tool for tool in self.tools}
+            with self.tracer.span("agent.turn", agent=self.name, turn=turn):
+                response, tool_results = await self._agent_turn(tool_dict)
+            if tool_results is None:
+                return response
+
+    async def _agent_turn(
+        self, tool_dict: dict[str, Tool]
+    ) -> tuple[Any, list[dict[str, Any]] | None]:
+        """One model call and the tool calls it requests.
+
+        Returns:
+            The response, and the tool results (None when the model made
+            no tool calls and the loop is done)
+        """
+        turn_span = tracing.current_span()
+        for event in await self.history.compact():
+            turn_span.add_event("compaction", **asdict(event))
+        params = self._prepare_message_params()
+
+        # Merge headers properly - default beta header can be overridden by message_params
+        default_headers = {"anthropic-beta": "code-execution-2025-05-22"}
+        if "extra_headers" in params:
+            # Pop extra_headers from params and merge with defaults
+            custom_headers = params.pop("extra_headers")
+            merged_headers = {**default_headers, **custom_headers}
+        else:
+            merged_headers = default_headers
+
+        dispatcher = ToolDispatcher(tool_dict, self.tool_scheduler)
+        with self.tracer.span(
+            "llm.request", model=params["model"], stream=self.stream
+        ) as llm_span:
+            if self.stream:
+                try:
+                    response = await self._stream_message(
+                        dispatcher, **params, extra_headers=merged_headers
+                    )
+                except BaseException:
+                    dispatcher.cancel()
+                    raise
             else:
-                merged_headers = default_headers
+                response = await self._create_message(
+                    **params,
+                    extra_headers=merged_headers
+                )
+            _record_response(llm_span, response)
+        tool_calls = [
+            block for block in response.content if block.type == "tool_use"
+        ]
 
-            response = self.client.messages.create(
-                **params,
-                extra_headers=merged_headers
-            )
-            tool_calls = [
-                block for block in response.content if block.type == "tool_use"
-            ]
-
-            if self.verbose:
-                for block in response.content:
-                    if block.type == "text":
-                        print(f"\n[{self.name}] Output: {block.text}")
-                    elif block.type == "tool_use":
-                        params_str = ", ".join(
-                            [f"{k}={v}" for k, v in block.input.items()]
-                        )
-                        print(
-                            f"\n[{self.name}] Tool call: "
-                            f"{block.name}({params_str})"
-                        )
-
-            await self.history.add_message(
-                "assistant", response.content, response.usage
+        if self.verbose:
+            for block in response.content:
+                if block.type == "text":
+                    print(f"\n[{self.name}] Output: {block.text}")
+                elif block.type == "tool_use":
+                    params_str = ", ".join(
+                        [f"{k}={v}" for k, v in block.input.items()]
+                    )
+                    print(
+                        f"\n[{self.name}] Tool call: "
+                        f"{block.name}({params_str})"
+                    )
+
+        await self.history.add_message(
+            "assistant", response.content, response.usage
+        )
+        llm_span.set("cache_hit_rate", self.history.cache_stats.last_hit_rate)
+        if self.verbose:
+            stats = self.history.cache_stats
+            print(
+                f"\n[{self.name}] Cache hit rate: "
+                f"{stats.last_hit_rate:.0%} this turn, "
+                f"{stats.hit_rate:.0%} overall"
             )
 
-            if tool_calls:
-                tool_results = await execute_tools(
-                    tool_calls,
-                    tool_dict,
+        if not tool_calls:
+            return response, None
+        if self.stream:
+            tool_results = await dispatcher.results(tool_calls)
+        else:
+            tool_results = await execute_tools(
+                tool_calls,
+                tool_dict,
+                scheduler=self.tool_scheduler,
+            )
+        if self.verbose:
+            for block in tool_results:
+                print(
+                    f"\n[{self.name}] Tool result: "
+                    f"{block.get('content')}"
                 )
-                if self.verbose:
-                    for block in tool_results:
-                        print(
-                            f"\n[{self.name}] Tool result: "
-                            f"{block.get('content')}"
-                        )
-                await self.history.add_message("user", tool_results)
-            else:
-                return response
+        await self.history.add_message("user", tool_results)
+        return response, tool_results
 
     async def run_async(self, user_input: str) -> list[dict[str, Any]]:
         """Run agent with MCP tools asynchronously."""
@@ -160,14 +352,62 @@ class Agent:
             original_tools = list(self.tools)
 
             try:
-                mcp_tools = await setup_mcp_connections(
-                    self.mcp_servers, stack
-                )
+                if self.mcp_pool is not None:
+                    mcp_tools = await self.mcp_pool.get_tools(
+                        self.mcp_servers
+                    )
+                else:
+                    mcp_tools = await setup_mcp_connections(
+                        self.mcp_servers,
+                        stack,
+                        schema_cache=self.mcp_schema_cache,
+                        on_tools_changed=self._swap_tools,
+                    )
                 self.tools.extend(mcp_tools)
-                return await self._agent_loop(user_input)
+                with self.tracer.span("agent.run", agent=self.name):
+                    return await self._agent_loop(user_input)
             finally:
                 self.tools = original_tools
 
     def run(self, user_input: str) -> list[dict[str, Any]]:
-        """Run agent synchronously"""
-        return asyncio.run(self.run_async(user_input))
+        """Run agent synchronously.
+
+        Reuses one event loop across calls so the async client's pooled
+        connections stay valid between turns. The loop is closed by
+        close(), or when the agent is garbage collected.
+        """
+        if self._loop is None or self._loop.is_closed():
+            self._loop = asyncio.new_event_loop()
+            self._loop_finalizer = weakref.finalize(self, self._loop.close)
+        return self._loop.run_until_complete(self.run_async(user_input))
+
+    def close(self) -> None:
+        """Close the event loop used by run().
+
+        A client the agent created itself is closed with it (its pooled
+        connections belong to that loop), so the agent cannot run again;
+        a client passed in is left open. MCP pool connections opened on
+        the loop are closed too.
+        """
+        loop, self._loop = self._loop, None
+        if self._loop_finalizer is not None:
+            self._loop_finalizer.detach()
+            self._loop_finalizer = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            if self.mcp_pool is not None and self.mcp_pool.loop is loop:
+                # Pooled connections opened by run() die with this loop
+                loop.run_until_complete(self.mcp_pool.aclose())
+            if self._owns_client:
+                loop.run_until_complete(self.client.close())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.run_until_complete(loop.shutdown_default_executor())
+        finally:
+            loop.close()
+
+    def __enter__(self) -> "Agent":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
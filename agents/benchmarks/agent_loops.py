@@ -0,0 +1,251 @@
+"""Benchmark whole Agent loops by replaying recorded API traffic.
+
+Each scenario is recorded once against the local mock API server into
+a cassette, then replayed with no network: first for timing (run
+latency percentiles and throughput), then under tracemalloc for the
+peak memory a run allocates. With --latency-scale 0 (the default) the
+replay answers instantly, so the numbers are the agent's own overhead:
+request formatting, JSON (de)serialization, tool dispatch and history
+bookkeeping.
+
+Scenarios:
+    fanout    a few rounds of many parallel tool calls
+    history   many rounds of one call with a large result
+    mcp       rounds of calls to a stdio MCP server's tool
+
+Cassettes are kept in --cassette-dir and reused when present, so a
+recording made against the real API with the same tools can be
+dropped in and replayed instead.
+
+Run with:
+    python -m agents.benchmarks.agent_loops --runs 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+from ..agent import Agent
+from ..tools.base import Tool
+from ..tools.think import ThinkTool
+from ..utils.connections import MCPConnectionPool
+from .mock_api import (
+    MockAPIServer,
+    Responder,
+    text_response,
+    tool_use_response,
+)
+from .replay import Cassette, ReplayTransport, recording_client
+
+DUMMY_SERVER = Path(__file__).parent / "dummy_mcp_server.py"
+
+
+class PayloadTool(Tool):
+    """Tool returning a fixed block of text, to grow the history."""
+
+    def __init__(self, size: int):
+        super().__init__(
+            name="payload",
+            description="Return a block of text.",
+            input_schema={"type": "object", "properties": {}},
+        )
+        self.result = ("lorem ipsum " * (size // 12 + 1))[:size]
+
+    async def execute(self, **kwargs) -> str:
+        return self.result
+
+
+def scripted(rounds: int, calls: list[tuple[str, dict[str, Any]]]) -> Responder:
+    """Responder asking for `calls` for `rounds` rounds, then ending."""
+
+    def responder(request: dict[str, Any]) -> dict[str, Any]:
+        done = sum(1 for m in request["messages"] if m["role"] == "assistant")
+        if done < rounds:
+            return tool_use_response(request, calls)
+        return text_response(request, text="done")
+
+    return responder
+
+
+@dataclass
+class Scenario:
+    name: str
+    responder: Responder
+    tools: Callable[[], list[Tool]] = list
+    mcp_servers: list[dict[str, Any]] = field(default_factory=list)
+
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int
+    timings: list[float]
+    wall: float
+    peak_bytes: list[int]
+    misses: int
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.timings)
+        index = min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))
+        return ordered[index]
+
+
+def scenarios(args: argparse.Namespace) -> list[Scenario]:
+    think = [("think", {"thought": f"step {i}"}) for i in range(args.fanout)]
+    echo = [("dummy_echo", {"text": f"call {i}"}) for i in range(4)]
+    return [
+        Scenario("fanout", scripted(args.rounds, think), lambda: [ThinkTool()]),
+        Scenario(
+            "history",
+            scripted(args.history_rounds, [("payload", {})]),
+            lambda: [PayloadTool(args.payload)],
+        ),
+        Scenario(
+            "mcp",
+            scripted(args.rounds, echo),
+            mcp_servers=[
+                {
+                    "type": "stdio",
+                    "command": sys.executable,
+                    "args": [str(DUMMY_SERVER), "--name", "dummy"],
+                }
+            ],
+        ),
+    ]
+
+
+async def _run(
+    scenario: Scenario, client: AsyncAnthropic, pool: MCPConnectionPool
+) -> None:
+    agent = Agent(
+        name=f"{scenario.name}-bench",
+        system="You are a benchmark.",
+        tools=scenario.tools(),
+        mcp_servers=scenario.mcp_servers,
+        client=client,
+        mcp_pool=pool,
+    )
+    await agent.run_async("go")
+
+
+async def _record(scenario: Scenario, path: str, latency: float) -> None:
+    pool = MCPConnectionPool()
+    with MockAPIServer(latency=latency, responder=scenario.responder) as server:
+        async with recording_client(
+            path, base_url=server.base_url, api_key="mock"
+        ) as client:
+            await _run(scenario, client, pool)
+    await pool.aclose()
+
+
+async def _replay(
+    scenario: Scenario, cassette: Cassette, args: argparse.Namespace
+) -> Result:
+    pool = MCPConnectionPool()
+    misses = 0
+
+    async def run_once() -> float:
+        nonlocal misses
+        transport = ReplayTransport(cassette, args.latency_scale)
+        http_client = DefaultAsyncHttpxClient(transport=transport)
+        async with AsyncAnthropic(
+            api_key="replay", max_retries=0, http_client=http_client
+        ) as client:
+            start = time.perf_counter()
+            await _run(scenario, client, pool)
+            elapsed = time.perf_counter() - start
+        misses += transport.misses
+        return elapsed
+
+    # Warm up imports, schema caches and the MCP connection
+    await run_once()
+    misses = 0
+
+    limit = asyncio.Semaphore(args.concurrency)
+
+    async def limited() -> float:
+        async with limit:
+            return await run_once()
+
+    start = time.perf_counter()
+    timings = await asyncio.gather(*(limited() for _ in range(args.runs)))
+    wall = time.perf_counter() - start
+
+    peaks = []
+    tracemalloc.start()
+    for _ in range(args.alloc_runs):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        await run_once()
+        peaks.append(tracemalloc.get_traced_memory()[1] - before)
+    tracemalloc.stop()
+
+    await pool.aclose()
+    return Result(
+        scenario=scenario.name,
+        requests=len(cassette),
+        timings=list(timings),
+        wall=wall,
+        peak_bytes=peaks,
+        misses=misses,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--alloc-runs", type=int, default=3)
+    parser.add_argument("--latency-scale", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--fanout", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--history-rounds", type=int, default=100)
+    parser.add_argument("--payload", type=int, default=2000)
+    parser.add_argument("--cassette-dir", default=None)
+    parser.add_argument(
+        "--only", action="append", help="Run only these scenarios"
+    )
+    args = parser.parse_args()
+
+    cassette_dir = args.cassette_dir or tempfile.mkdtemp(prefix="agent-bench-")
+    print(f"cassettes: {cassette_dir}")
+    print(
+        f"runs={args.runs} concurrency={args.concurrency} "
+        f"latency_scale={args.latency_scale}"
+    )
+    print(
+        f"{'scenario':<10}{'requests':>9}{'runs/s':>9}{'p50 ms':>9}"
+        f"{'p99 ms':>9}{'peak KiB':>10}{'misses':>8}"
+    )
+    for scenario in scenarios(args):
+        if args.only and scenario.name not in args.only:
+            continue
+        path = os.path.join(cassette_dir, f"{scenario.name}.jsonl")
+        if not os.path.exists(path):
+            asyncio.run(_record(scenario, path, args.latency))
+        result = asyncio.run(_replay(scenario, Cassette.load(path), args))
+        peak = max(result.peak_bytes, default=0) / 1024
+        print(
+            f"{result.scenario:<10}{result.requests:>9}"
+            f"{len(result.timings) / result.wall:>9.1f}"
+            f"{result.percentile(0.5) * 1000:>9.1f}"
+            f"{result.percentile(0.99) * 1000:>9.1f}"
+            f"{peak:>10.0f}{result.misses:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
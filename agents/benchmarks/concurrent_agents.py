@@ -0,0 +1,70 @@
+"""Benchmark N concurrent agents sharing one event loop.
+
+Compares AsyncAnthropic agents overlapping their network waits on one
+loop against the same agents issuing blocking calls one after another.
+
+Run with:
+    python -m agents.benchmarks.concurrent_agents --agents 32 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+
+from anthropic import Anthropic, AsyncAnthropic
+
+from ..agent import Agent
+from .mock_api import MockAPIServer
+
+
+def _make_agents(n: int, client: Anthropic | AsyncAnthropic) -> list[Agent]:
+    return [
+        Agent(name=f"bench-{i}", system="You are a benchmark.", client=client)
+        for i in range(n)
+    ]
+
+
+async def _run_concurrent(agents: list[Agent]) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(agent.run_async("ping") for agent in agents))
+    return time.perf_counter() - start
+
+
+def _run_blocking(agents: list[Agent]) -> float:
+    start = time.perf_counter()
+    for agent in agents:
+        agent.client.messages.create(
+            **agent._prepare_message_params(),
+        )
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--agents", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with MockAPIServer(latency=args.latency) as server:
+        sync_client = Anthropic(base_url=server.base_url, api_key="mock")
+        blocking = _run_blocking(_make_agents(args.agents, sync_client))
+
+        async def concurrent() -> float:
+            async_client = AsyncAnthropic(
+                base_url=server.base_url, api_key="mock"
+            )
+            async with async_client:
+                return await _run_concurrent(
+                    _make_agents(args.agents, async_client)
+                )
+
+        overlapped = asyncio.run(concurrent())
+
+    print(f"agents={args.agents} latency={args.latency:.3f}s")
+    print(f"blocking sequential: {blocking:.3f}s")
+    print(f"async concurrent:    {overlapped:.3f}s")
+    print(f"speedup:             {blocking / overlapped:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+"""Stdio MCP server with a configurable startup delay, for benchmarks."""
+
+import argparse
+import time
+
+from mcp.server import FastMCP
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--name", default="dummy")
+    parser.add_argument("--startup-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    # Simulates slow imports or initialization before the server responds
+    time.sleep(args.startup_delay)
+
+    mcp = FastMCP(args.name, log_level="WARNING")
+
+    @mcp.tool(name=f"{args.name}_echo")
+    def echo(text: str) -> str:
+        """Echo the given text back."""
+        return text
+
+    mcp.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""Microbenchmark request formatting on long histories.
+
+Builds a history of N tool-using turns and measures the time and memory
+allocated to prepare the next request's messages and tools, comparing a
+full rebuild every turn (copy every message, call to_dict on every tool)
+against the incremental view kept by MessageHistory.
+
+Run with:
+    python -m agents.benchmarks.formatting --turns 1000
+"""
+
+import argparse
+import asyncio
+import time
+import tracemalloc
+from types import SimpleNamespace
+from typing import Any
+
+from ..agent import Agent
+from ..tools.base import Tool
+
+USAGE = SimpleNamespace(
+    input_tokens=10,
+    output_tokens=10,
+    cache_read_input_tokens=0,
+    cache_creation_input_tokens=0,
+)
+
+
+def _rebuild(agent: Agent) -> dict[str, Any]:
+    """Format a request the old way, copying the whole history."""
+    messages = [
+        {"role": m["role"], "content": m["content"]}
+        for m in agent.history.messages
+    ]
+    messages[-1]["content"] = [
+        {**block, "cache_control": {"type": "ephemeral"}}
+        for block in messages[-1]["content"]
+    ]
+    return {
+        "system": agent.system,
+        "messages": messages,
+        "tools": [tool.to_dict() for tool in agent.tools],
+    }
+
+
+def _incremental(agent: Agent) -> dict[str, Any]:
+    return agent._prepare_message_params()
+
+
+async def _grow(agent: Agent, turn: int) -> None:
+    tool_use = {
+        "type": "tool_use",
+        "id": f"toolu_{turn}",
+        "name": "tool_0",
+        "input": {"turn": turn},
+    }
+    await agent.history.add_message("assistant", [tool_use], USAGE)
+    await agent.history.add_message(
+        "user",
+        [
+            {
+                "type": "tool_result",
+                "tool_use_id": f"toolu_{turn}",
+                "content": f"result {turn}",
+            }
+        ],
+    )
+
+
+def _measure(turns: int, prepare) -> tuple[float, float]:
+    """Mean microseconds and bytes allocated per request at full length."""
+    agent = Agent(
+        name="format-bench",
+        system="You are a benchmark.",
+        tools=[
+            Tool(f"tool_{i}", "A benchmark tool.", {"type": "object"})
+            for i in range(20)
+        ],
+        client=SimpleNamespace(),
+    )
+    # Keep compaction out of the measurement
+    agent.history.context_window_tokens = 10**9
+
+    async def build() -> None:
+        await agent.history.add_message("user", "start")
+        for turn in range(turns):
+            prepare(agent)
+            await _grow(agent, turn)
+
+    asyncio.run(build())
+
+    samples = 200
+    start = time.perf_counter()
+    for _ in range(samples):
+        prepare(agent)
+    elapsed = (time.perf_counter() - start) / samples
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    params = prepare(agent)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del params
+    return elapsed * 1e6, allocated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=1000)
+    args = parser.parse_args()
+
+    rebuild_us, rebuild_bytes = _measure(args.turns, _rebuild)
+    incremental_us, incremental_bytes = _measure(args.turns, _incremental)
+
+    print(f"history: {2 * args.turns + 1} messages")
+    print(f"full rebuild: {rebuild_us:8.1f}us {rebuild_bytes:>9,} bytes")
+    print(f"incremental:  {incremental_us:8.1f}us {incremental_bytes:>9,} bytes")
+    print(f"speedup:      {rebuild_us / incremental_us:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
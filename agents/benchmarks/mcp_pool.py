@@ -0,0 +1,77 @@
+"""Benchmark per-turn MCP setup with and without a connection pool.
+
+Without a pool every turn spawns the stdio server, initializes a
+session, lists tools and tears it down again. With a pool only the
+first turn pays that cost.
+
+Run with:
+    python -m agents.benchmarks.mcp_pool --turns 5
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from anthropic import AsyncAnthropic
+
+from ..agent import Agent
+from ..utils.connections import MCPConnectionPool
+from .mock_api import MockAPIServer
+
+CALCULATOR = Path(__file__).parent.parent / "tools" / "calculator_mcp.py"
+
+
+async def _run_turns(
+    base_url: str, turns: int, pool: MCPConnectionPool | None
+) -> list[float]:
+    async with AsyncAnthropic(base_url=base_url, api_key="mock") as client:
+        agent = Agent(
+            name="mcp-bench",
+            system="You are a benchmark.",
+            mcp_servers=[
+                {
+                    "type": "stdio",
+                    "command": sys.executable,
+                    "args": [str(CALCULATOR)],
+                }
+            ],
+            client=client,
+            mcp_pool=pool,
+        )
+        timings = []
+        for _ in range(turns):
+            start = time.perf_counter()
+            await agent.run_async("ping")
+            timings.append(time.perf_counter() - start)
+        if pool is not None:
+            await pool.aclose()
+        return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=5)
+    args = parser.parse_args()
+
+    with MockAPIServer(latency=0.0) as server:
+        fresh = asyncio.run(_run_turns(server.base_url, args.turns, None))
+        pooled = asyncio.run(
+            _run_turns(server.base_url, args.turns, MCPConnectionPool())
+        )
+
+    def describe(timings: list[float]) -> str:
+        rest = timings[1:] or timings
+        return (
+            f"first {timings[0] * 1000:.0f}ms, "
+            f"later avg {sum(rest) / len(rest) * 1000:.0f}ms"
+        )
+
+    print(f"turns={args.turns}")
+    print(f"per-turn connect: {describe(fresh)}")
+    print(f"pooled:           {describe(pooled)}")
+
+
+if __name__ == "__main__":
+    main()
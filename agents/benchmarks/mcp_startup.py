@@ -0,0 +1,71 @@
+"""Benchmark MCP server startup latency with several stdio servers.
+
+Compares connecting to the servers one after another with the concurrent
+startup in setup_mcp_connections.
+
+Run with:
+    python -m agents.benchmarks.mcp_startup --servers 5 --startup-delay 0.5
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+from ..utils.connections import setup_mcp_connections
+
+DUMMY_SERVER = Path(__file__).parent / "dummy_mcp_server.py"
+
+
+def _server_configs(count: int, startup_delay: float) -> list[dict]:
+    return [
+        {
+            "type": "stdio",
+            "command": sys.executable,
+            "args": [
+                str(DUMMY_SERVER),
+                "--name",
+                f"server{i}",
+                "--startup-delay",
+                str(startup_delay),
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+async def _sequential(configs: list[dict]) -> tuple[float, int]:
+    start = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        tools = []
+        for config in configs:
+            tools += await setup_mcp_connections([config], stack)
+        return time.perf_counter() - start, len(tools)
+
+
+async def _concurrent(configs: list[dict]) -> tuple[float, int]:
+    start = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        tools = await setup_mcp_connections(configs, stack)
+        return time.perf_counter() - start, len(tools)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--servers", type=int, default=5)
+    parser.add_argument("--startup-delay", type=float, default=0.5)
+    args = parser.parse_args()
+
+    configs = _server_configs(args.servers, args.startup_delay)
+    sequential, n_seq = asyncio.run(_sequential(configs))
+    concurrent, n_con = asyncio.run(_concurrent(configs))
+
+    print(f"servers={args.servers} startup_delay={args.startup_delay:.2f}s")
+    print(f"sequential: {sequential:.3f}s ({n_seq} tools)")
+    print(f"concurrent: {concurrent:.3f}s ({n_con} tools)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Local mock of the Messages API for offline benchmarks."""
+
+import json
+import threading
+import time
+import uuid
+from collections.abc import Callable
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+Responder = Callable[[dict[str, Any]], dict[str, Any]]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 makes bursts of concurrent clients wait on
+    # SYN retransmits, which would dominate the measurements.
+    request_queue_size = 1024
+
+
+def text_response(request: dict[str, Any], text: str = "ok") -> dict[str, Any]:
+    """Build a minimal end_turn Messages API response."""
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": request.get("model", "mock-model"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": 10,
+            "output_tokens": 1,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        },
+    }
+
+
+def tool_use_response(
+    request: dict[str, Any], calls: list[tuple[str, dict[str, Any]]]
+) -> dict[str, Any]:
+    """Build a tool_use response requesting each (name, input) call."""
+    response = text_response(request, text="Calling tools.")
+    response["content"] += [
+        {
+            "type": "tool_use",
+            "id": f"toolu_{uuid.uuid4().hex[:24]}",
+            "name": name,
+            "input": tool_input,
+        }
+        for name, tool_input in calls
+    ]
+    response["stop_reason"] = "tool_use"
+    return response
+
+
+def tool_round_trip(calls: list[tuple[str, dict[str, Any]]]) -> Responder:
+    """Responder that asks for `calls`, then ends the turn on their results."""
+
+    def responder(request: dict[str, Any]) -> dict[str, Any]:
+        last = request["messages"][-1]["content"]
+        if isinstance(last, list) and any(
+            block.get("type") == "tool_result" for block in last
+        ):
+            return text_response(request, text="done")
+        return tool_use_response(request, calls)
+
+    return responder
+
+
+def _stream_events(body: dict[str, Any]) -> list[tuple[str, dict[str, Any]]]:
+    """Split a complete response into Messages API streaming events."""
+
+    def event(name: str, **data: Any) -> tuple[str, dict[str, Any]]:
+        return name, {"type": name, **data}
+
+    message = {**body, "content": [], "stop_reason": None}
+    events = [event("message_start", message=message)]
+    for index, block in enumerate(body["content"]):
+        if block["type"] == "tool_use":
+            start = {**block, "input": {}}
+            delta = {
+                "type": "input_json_delta",
+                "partial_json": json.dumps(block["input"]),
+            }
+        else:
+            start = {**block, "text": ""}
+            delta = {"type": "text_delta", "text": block["text"]}
+        events += [
+            event("content_block_start", index=index, content_block=start),
+            event("content_block_delta", index=index, delta=delta),
+            event("content_block_stop", index=index),
+        ]
+    events += [
+        event(
+            "message_delta",
+            delta={"stop_reason": body["stop_reason"], "stop_sequence": None},
+            usage={"output_tokens": body["usage"]["output_tokens"]},
+        ),
+        event("message_stop"),
+    ]
+    return events
+
+
+class MockAPIServer:
+    """Threaded HTTP server answering /v1/messages after a fixed latency.
+
+    Each content block costs `block_delay` seconds of simulated generation
+    time; streaming requests receive it as server-sent events.
+
+    Usage:
+        with MockAPIServer(latency=0.2) as server:
+            client = AsyncAnthropic(base_url=server.base_url, api_key="mock")
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.1,
+        responder: Responder | None = None,
+        block_delay: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = latency
+        self.responder = responder or text_response
+        self.block_delay = block_delay
+        self.requests = 0
+        # Client (host, port) pairs seen, one per TCP connection
+        self.peers: set[tuple[str, int]] = set()
+        self._lock = threading.Lock()
+        self._server = _Server((host, port), self._handler())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("content-length") or 0)
+                request = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    server.peers.add(self.client_address[:2])
+
+                if self.path.startswith("/v1/messages/count_tokens"):
+                    body = {"input_tokens": len(json.dumps(request)) // 4}
+                else:
+                    time.sleep(server.latency)
+                    body = server.responder(request)
+                    if request.get("stream"):
+                        self._write_stream(body)
+                        return
+                    time.sleep(server.block_delay * len(body["content"]))
+
+                payload = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _write_stream(self, body: dict[str, Any]) -> None:
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.send_header("connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                for name, data in _stream_events(body):
+                    self.wfile.write(
+                        f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+                    )
+                    self.wfile.flush()
+                    if name == "content_block_stop":
+                        time.sleep(server.block_delay)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "MockAPIServer":
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self) -> "MockAPIServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
@@ -0,0 +1,149 @@
+"""Simulate prompt cache hit rates over a long tool-using session.
+
+Each request is split into blocks (tools, system, message blocks) and run
+through a model of the prompt cache: a marker writes the prefix ending at
+its block, and a request reads the longest cached prefix ending at a
+marker or up to 20 blocks before it. The history is compacted as it
+would be in an agent, so the cache has to survive truncation.
+
+Run with:
+    python -m agents.benchmarks.prompt_cache --turns 200 --calls-per-turn 12
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+from types import SimpleNamespace
+from typing import Any
+
+from ..utils.cache_util import CacheBreakpointPlanner
+from ..utils.history_util import MessageHistory
+from ..utils.token_util import HeuristicTokenEstimator
+
+LOOKBACK_BLOCKS = 20
+
+TOOLS = [
+    {
+        "name": f"tool_{i}",
+        "description": "A benchmark tool. " * 40,
+        "input_schema": {"type": "object", "properties": {}},
+    }
+    for i in range(8)
+]
+SYSTEM = "You are a careful assistant working on a large codebase. " * 60
+
+
+def _blocks(request: dict[str, Any]) -> list[dict[str, Any]]:
+    blocks = [dict(tool) for tool in request["tools"]]
+    system = request["system"]
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+    blocks += system
+    for message in request["messages"]:
+        content = message["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        blocks += [{"role": message["role"], **block} for block in content]
+    return blocks
+
+
+class PromptCacheModel:
+    """Prefix cache keyed by a running hash over blocks."""
+
+    def __init__(self):
+        self.entries: set[str] = set()
+        self.estimator = HeuristicTokenEstimator()
+
+    def request(self, request: dict[str, Any]) -> SimpleNamespace:
+        blocks = _blocks(request)
+        digest = hashlib.sha256()
+        prefixes, tokens = [], []
+        for block in blocks:
+            plain = {k: v for k, v in block.items() if k != "cache_control"}
+            digest.update(json.dumps(plain, sort_keys=True).encode())
+            prefixes.append(digest.hexdigest())
+            tokens.append(self.estimator.estimate_text(json.dumps(plain)))
+        markers = [i for i, b in enumerate(blocks) if "cache_control" in b]
+
+        read_end = -1
+        for marker in markers:
+            for index in range(marker, max(-1, marker - LOOKBACK_BLOCKS), -1):
+                if prefixes[index] in self.entries:
+                    read_end = max(read_end, index)
+                    break
+        written_end = max(markers, default=-1)
+        for marker in markers:
+            self.entries.add(prefixes[marker])
+
+        read = sum(tokens[: read_end + 1])
+        created = sum(tokens[read_end + 1 : written_end + 1])
+        return SimpleNamespace(
+            input_tokens=sum(tokens) - read - created,
+            output_tokens=50,
+            cache_read_input_tokens=read,
+            cache_creation_input_tokens=created,
+        )
+
+
+async def _session(
+    planner: CacheBreakpointPlanner, turns: int, calls_per_turn: int
+) -> float:
+    history = MessageHistory(
+        model="mock-model",
+        system=SYSTEM,
+        context_window_tokens=60_000,
+        client=None,
+        cache_planner=planner,
+    )
+    cache = PromptCacheModel()
+    await history.add_message("user", "Refactor the project.")
+    for turn in range(turns):
+        await history.compact()
+        request = {
+            "tools": history.format_tools(TOOLS),
+            "system": history.format_system(has_tools=True),
+            "messages": history.format_for_api(has_tools=True),
+        }
+        usage = cache.request(request)
+        ids = [f"toolu_{turn}_{call}" for call in range(calls_per_turn)]
+        tool_uses = [
+            {"type": "tool_use", "id": id, "name": "tool_0", "input": {}}
+            for id in ids
+        ]
+        await history.add_message("assistant", tool_uses, usage)
+        await history.add_message(
+            "user",
+            [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": id,
+                    "content": f"{id} " + "output line " * 100,
+                }
+                for id in ids
+            ],
+        )
+    return history.cache_stats.hit_rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--calls-per-turn", type=int, default=4)
+    args = parser.parse_args()
+
+    single = CacheBreakpointPlanner(
+        max_breakpoints=1, cache_tools=False, cache_system=False
+    )
+    planned = CacheBreakpointPlanner()
+    calls = args.calls_per_turn
+    single_rate = asyncio.run(_session(single, args.turns, calls))
+    planned_rate = asyncio.run(_session(planned, args.turns, calls))
+
+    print(f"turns: {args.turns}, tool calls per turn: {calls}")
+    print(f"last message only:  {single_rate:.1%} of input read from cache")
+    print(f"planned markers:    {planned_rate:.1%} of input read from cache")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""Record and replay Messages API traffic for deterministic offline runs.
+
+A RecordingTransport sits under an Anthropic client's httpx client and
+appends every request/response pair to a JSONL cassette, including when
+each chunk of the response body arrived. A ReplayTransport serves those
+responses back without touching the network, at the recorded pace or
+with every delay scaled by latency_scale (0 replays instantly, which
+leaves only the agent's own overhead to measure).
+
+Requests are matched on a hash of their method, path and JSON body, so
+an agent whose behaviour is deterministic given the model's responses
+replays exactly. A request that no longer matches (say a tool returned
+a timestamp) takes the next unused recording for the same endpoint,
+unless the replay is strict.
+
+Usage:
+    with MockAPIServer() as server:  # or the real API
+        client = recording_client("run.jsonl", base_url=server.base_url)
+        await Agent(..., client=client).run_async("go")
+
+    client = replay_client("run.jsonl", latency_scale=0)
+    await Agent(..., client=client).run_async("go")
+"""
+
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from collections.abc import AsyncIterator, Callable, Iterator
+from typing import Any
+
+import httpx
+from anthropic import (
+    Anthropic,
+    AsyncAnthropic,
+    DefaultAsyncHttpxClient,
+    DefaultHttpxClient,
+)
+
+# Response headers worth keeping; the rest (dates, request ids, rate
+# limits) differ on every call and would only bloat cassettes.
+_KEPT_HEADERS = ("content-type", "retry-after")
+
+
+def request_key(method: str, path: str, body: bytes) -> str:
+    """Stable hash of a request, ignoring JSON key order and headers."""
+    try:
+        canonical = json.dumps(
+            json.loads(body), sort_keys=True, separators=(",", ":")
+        ).encode()
+    except ValueError:
+        canonical = body
+    digest = hashlib.sha256(f"{method} {path}\n".encode())
+    digest.update(canonical)
+    return digest.hexdigest()
+
+
+class Cassette:
+    """Recorded interactions, in the order their responses completed.
+
+    Each interaction is a dict with the request's method, path and key,
+    the response status and headers, `latency` (seconds until the
+    response headers arrived) and `chunks`, a list of
+    [seconds since the previous chunk, text] pairs.
+    """
+
+    def __init__(self, interactions: list[dict[str, Any]] | None = None):
+        self.interactions = list(interactions or [])
+
+    @classmethod
+    def load(cls, path: str) -> "Cassette":
+        with open(path, encoding="utf-8") as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def __len__(self) -> int:
+        return len(self.interactions)
+
+    @property
+    def duration(self) -> float:
+        """Total recorded latency of all interactions, in seconds."""
+        return sum(
+            i["latency"] + sum(delay for delay, _ in i["chunks"])
+            for i in self.interactions
+        )
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Pass a response body through while timing each chunk."""
+
+    def __init__(
+        self,
+        stream: Any,
+        start: float,
+        on_close: Callable[[list[list[Any]]], None],
+    ):
+        self._stream = stream
+        self._last = start
+        self._on_close = on_close
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        self._chunks: list[list[Any]] = []
+        self._closed = False
+
+    def _record(self, chunk: bytes) -> None:
+        now = time.perf_counter()
+        self._chunks.append([now - self._last, self._decoder.decode(chunk)])
+        self._last = now
+
+    def _finish(self) -> None:
+        if not self._closed:
+            self._closed = True
+            tail = self._decoder.decode(b"", final=True)
+            if tail:
+                self._chunks.append([0.0, tail])
+            self._on_close(self._chunks)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._record(chunk)
+            yield chunk
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._record(chunk)
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._finish()
+
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Forward requests to a real transport and record them to a cassette.
+
+    Interactions are appended to `path` as their response bodies are
+    closed, so a partly finished run still leaves a usable cassette.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        transport: httpx.BaseTransport | None = None,
+        async_transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.recorded = 0
+        self._transport = transport
+        self._async_transport = async_transport
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _prepare(self, request: httpx.Request) -> None:
+        # Record bodies as sent, so replays never need to decompress
+        request.headers["accept-encoding"] = "identity"
+
+    def _wrap(
+        self,
+        request: httpx.Request,
+        response: httpx.Response,
+        start: float,
+    ) -> httpx.Response:
+        entry = {
+            "method": request.method,
+            "path": request.url.path,
+            "key": request_key(
+                request.method, request.url.path, request.content
+            ),
+            "status": response.status_code,
+            "headers": {
+                name: response.headers[name]
+                for name in _KEPT_HEADERS
+                if name in response.headers
+            },
+            "latency": time.perf_counter() - start,
+        }
+
+        def save(chunks: list[list[Any]]) -> None:
+            line = json.dumps({**entry, "chunks": chunks})
+            with self._lock:
+                if not self._file.closed:
+                    self._file.write(line + "\n")
+                    self._file.flush()
+                    self.recorded += 1
+
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, time.perf_counter(), save),
+            extensions=response.extensions,
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._transport is None:
+            self._transport = httpx.HTTPTransport()
+        self._prepare(request)
+        request.read()
+        start = time.perf_counter()
+        response = self._transport.handle_request(request)
+        return self._wrap(request, response, start)
+
+    async def handle_async_request(
+        self, request: httpx.Request
+    ) -> httpx.Response:
+        if self._async_transport is None:
+            self._async_transport = httpx.AsyncHTTPTransport()
+        self._prepare(request)
+        await request.aread()
+        start = time.perf_counter()
+        response = await self._async_transport.handle_async_request(request)
+        return self._wrap(request, response, start)
+
+    def close(self) -> None:
+        if self._transport is not None:
+            self._transport.close()
+        with self._lock:
+            self._file.close()
+
+    async def aclose(self) -> None:
+        if self._async_transport is not None:
+            await self._async_transport.aclose()
+        with self._lock:
+            self._file.close()
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Yield recorded chunks after their (scaled) recorded delays."""
+
+    def __init__(self, chunks: list[list[Any]], scale: float):
+        self._chunks = chunks
+        self._scale = scale
+
+    def __iter__(self) -> Iterator[bytes]:
+        for delay, text in self._chunks:
+            if delay and self._scale:
+                time.sleep(delay * self._scale)
+            yield text.encode()
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for delay, text in self._chunks:
+            if delay and self._scale:
+                await asyncio.sleep(delay * self._scale)
+            yield text.encode()
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Answer requests from a cassette instead of the network.
+
+    Each recorded interaction is served at most once per transport, so
+    a run that makes the same request twice gets both recorded answers
+    in order. Create a new transport (sharing the Cassette) per run.
+    """
+
+    def __init__(
+        self,
+        cassette: Cassette | str,
+        latency_scale: float = 1.0,
+        strict: bool = False,
+    ):
+        """Create a replay transport.
+
+        Args:
+            cassette: Cassette, or path of a JSONL cassette to load
+            latency_scale: Multiplier for recorded delays; 0 answers
+                           immediately
+            strict: Refuse requests that match no recording exactly
+                    instead of falling back to the next unused recording
+                    for the same endpoint
+        """
+        if isinstance(cassette, str):
+            cassette = Cassette.load(cassette)
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.strict = strict
+        self.misses = 0
+        self._by_key: dict[str, deque[int]] = defaultdict(deque)
+        self._by_endpoint: dict[tuple[str, str], deque[int]] = (
+            defaultdict(deque)
+        )
+        for index, interaction in enumerate(cassette.interactions):
+            self._by_key[interaction["key"]].append(index)
+            endpoint = (interaction["method"], interaction["path"])
+            self._by_endpoint[endpoint].append(index)
+        self._used: set[int] = set()
+        self._lock = threading.Lock()
+
+    def _next_unused(self, queue: deque[int]) -> int | None:
+        while queue:
+            index = queue.popleft()
+            if index not in self._used:
+                self._used.add(index)
+                return index
+        return None
+
+    def _match(self, request: httpx.Request) -> dict[str, Any] | None:
+        method, path = request.method, request.url.path
+        key = request_key(method, path, request.content)
+        with self._lock:
+            index = self._next_unused(self._by_key.get(key, deque()))
+            if index is None:
+                self.misses += 1
+                if not self.strict:
+                    index = self._next_unused(
+                        self._by_endpoint.get((method, path), deque())
+                    )
+        if index is None:
+            return None
+        return self.cassette.interactions[index]
+
+    def _response(
+        self, request: httpx.Request, interaction: dict[str, Any] | None
+    ) -> httpx.Response:
+        if interaction is None:
+            # A 400 is not retried, so the client fails fast with this
+            # message instead of backing off against a missing recording
+            error = {
+                "type": "error",
+                "error": {
+                    "type": "invalid_request_error",
+                    "message": (
+                        f"No recorded response for {request.method} "
+                        f"{request.url.path} in the replay cassette"
+                    ),
+                },
+            }
+            return httpx.Response(400, json=error, request=request)
+        return httpx.Response(
+            interaction["status"],
+            headers=interaction["headers"],
+            stream=_ReplayStream(interaction["chunks"], self.latency_scale),
+            request=request,
+        )
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        interaction = self._match(request)
+        if interaction is not None and self.latency_scale:
+            time.sleep(interaction["latency"] * self.latency_scale)
+        return self._response(request, interaction)
+
+    async def handle_async_request(
+        self, request: httpx.Request
+    ) -> httpx.Response:
+        await request.aread()
+        interaction = self._match(request)
+        if interaction is not None and self.latency_scale:
+            await asyncio.sleep(interaction["latency"] * self.latency_scale)
+        return self._response(request, interaction)
+
+
+def recording_client(
+    path: str, sync: bool = False, **kwargs: Any
+) -> Anthropic | AsyncAnthropic:
+    """An Anthropic client that records its traffic to the cassette path.
+
+    Remaining keyword arguments go to the client (base_url, api_key...).
+    """
+    transport = RecordingTransport(path)
+    if sync:
+        return Anthropic(
+            http_client=DefaultHttpxClient(transport=transport), **kwargs
+        )
+    return AsyncAnthropic(
+        http_client=DefaultAsyncHttpxClient(transport=transport), **kwargs
+    )
+
+
+def replay_client(
+    cassette: Cassette | str,
+    latency_scale: float = 1.0,
+    strict: bool = False,
+    sync: bool = False,
+    **kwargs: Any,
+) -> Anthropic | AsyncAnthropic:
+    """An Anthropic client answered from a cassette, with no network."""
+    transport = ReplayTransport(cassette, latency_scale, strict)
+    kwargs.setdefault("api_key", "replay")
+    kwargs.setdefault("max_retries", 0)
+    if sync:
+        return Anthropic(
+            http_client=DefaultHttpxClient(transport=transport), **kwargs
+        )
+    return AsyncAnthropic(
+        http_client=DefaultAsyncHttpxClient(transport=transport), **kwargs
+    )
@@ -0,0 +1,78 @@
+"""Benchmark streaming with incremental tool dispatch.
+
+The mock model emits several tool_use blocks with simulated generation
+time between them. With streaming, each slow tool starts as soon as its
+block is complete, hiding tool latency behind generation latency.
+
+Run with:
+    python -m agents.benchmarks.streaming_tools --tools 4 --tool-latency 0.3
+"""
+
+import argparse
+import asyncio
+import time
+
+from anthropic import AsyncAnthropic
+
+from ..agent import Agent
+from ..tools.base import Tool
+from .mock_api import MockAPIServer, tool_round_trip
+
+
+class SleepTool(Tool):
+    """Tool that simulates a slow backend call."""
+
+    def __init__(self, latency: float):
+        super().__init__(
+            name="sleep",
+            description="Wait for a while.",
+            input_schema={"type": "object", "properties": {}},
+        )
+        self.latency = latency
+
+    async def execute(self, **kwargs) -> str:
+        await asyncio.sleep(self.latency)
+        return "slept"
+
+
+async def _run(base_url: str, stream: bool, tool_latency: float) -> Agent:
+    async with AsyncAnthropic(base_url=base_url, api_key="mock") as client:
+        agent = Agent(
+            name="stream-bench",
+            system="You are a benchmark.",
+            tools=[SleepTool(tool_latency)],
+            client=client,
+            stream=stream,
+        )
+        await agent.run_async("go")
+        return agent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tools", type=int, default=4)
+    parser.add_argument("--tool-latency", type=float, default=0.3)
+    parser.add_argument("--block-delay", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    responder = tool_round_trip([("sleep", {})] * args.tools)
+    with MockAPIServer(
+        latency=args.latency,
+        responder=responder,
+        block_delay=args.block_delay,
+    ) as server:
+        timings = {}
+        for stream in (False, True):
+            start = time.perf_counter()
+            agent = asyncio.run(_run(server.base_url, stream, args.tool_latency))
+            timings[stream] = time.perf_counter() - start
+
+    ttft = agent.stream_metrics[0].time_to_first_token or 0.0
+    print(f"tools={args.tools} tool_latency={args.tool_latency:.3f}s")
+    print(f"buffered: {timings[False]:.3f}s")
+    print(f"streamed: {timings[True]:.3f}s (first token {ttft * 1000:.0f}ms)")
+
+
+if __name__ == "__main__":
+    main()
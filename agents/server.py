@@ -0,0 +1,268 @@
+"""Long-running server multiplexing many agent conversations."""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+from anthropic import AsyncAnthropic
+
+from .agent import Agent, ModelConfig
+from .tools.base import Tool
+from .utils.connections import MCPConnectionPool
+from .utils.tool_util import ToolScheduler
+from .utils.tracing import Tracer
+
+
+@dataclass
+class PoolConfig:
+    """HTTP connection pool settings shared by every session."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    # HTTP/2 needs the optional `h2` package; without it the pool falls
+    # back to HTTP/1.1 keep-alive connections.
+    http2: bool = True
+
+
+class AgentServer:
+    """Serve many conversations over one event loop and one HTTP pool.
+
+    Each session gets its own Agent and MessageHistory, while all of them
+    share a single AsyncAnthropic client, so TLS handshakes and connection
+    setup are paid once per pooled connection rather than per request.
+    MCP servers are likewise connected once and shared by every session.
+
+    Usage:
+        async with AgentServer(system="You are helpful.") as server:
+            reply = await server.chat("user-1", "Hello!")
+    """
+
+    def __init__(
+        self,
+        system: str,
+        tools: list[Tool] | None = None,
+        mcp_servers: list[dict[str, Any]] | None = None,
+        config: ModelConfig | None = None,
+        pool: PoolConfig | None = None,
+        message_params: dict[str, Any] | None = None,
+        stream: bool = False,
+        tool_scheduler: ToolScheduler | None = None,
+        tracer: Tracer | None = None,
+        session_ttl: float | None = 3600.0,
+        api_key: str | None = None,
+        base_url: str | None = None,
+        verbose: bool = False,
+    ):
+        """Initialize an AgentServer.
+
+        Args:
+            system: System prompt shared by every session
+            tools: Tools available to every session
+            mcp_servers: MCP server configurations
+            config: Model configuration with defaults
+            pool: HTTP connection pool settings
+            message_params: Extra parameters for client.messages.create()
+            stream: Stream responses with incremental tool dispatch
+            tool_scheduler: Tool concurrency limits shared by all sessions
+            tracer: Tracer receiving the spans of every session
+            session_ttl: Seconds of inactivity before a session is dropped
+                         (None keeps sessions until end_session is called)
+            api_key: API key (defaults to ANTHROPIC_API_KEY)
+            base_url: Override the API base URL
+            verbose: Enable detailed logging
+        """
+        self.system = system
+        self.tools = list(tools or [])
+        self.mcp_servers = mcp_servers or []
+        self.config = config or ModelConfig()
+        self.pool = pool or PoolConfig()
+        self.message_params = message_params or {}
+        self.stream = stream
+        self.tool_scheduler = tool_scheduler or ToolScheduler()
+        self.tracer = tracer or Tracer()
+        self.session_ttl = session_ttl
+        self.api_key = api_key or os.environ.get("ANTHROPIC_API_KEY", "")
+        self.base_url = base_url
+        self.verbose = verbose
+
+        self.client: AsyncAnthropic | None = None
+        self.mcp_pool = MCPConnectionPool()
+        self._sessions: dict[str, Agent] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._last_used: dict[str, float] = {}
+
+    def _create_http_client(self) -> httpx.AsyncClient:
+        http2 = self.pool.http2 and importlib.util.find_spec("h2") is not None
+        if self.pool.http2 and not http2:
+            print("h2 is not installed, falling back to HTTP/1.1")
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.pool.max_connections,
+                max_keepalive_connections=self.pool.max_keepalive_connections,
+                keepalive_expiry=self.pool.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+
+    async def start(self) -> "AgentServer":
+        """Create the shared client. Must run inside the serving loop."""
+        if self.client is None:
+            self.client = AsyncAnthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                http_client=self._create_http_client(),
+            )
+        return self
+
+    async def close(self) -> None:
+        """Drop every session and close the pooled connections."""
+        self._sessions.clear()
+        self._locks.clear()
+        self._last_used.clear()
+        await self.mcp_pool.aclose()
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+    async def __aenter__(self) -> "AgentServer":
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+    @property
+    def sessions(self) -> list[str]:
+        """IDs of the sessions currently held in memory."""
+        return list(self._sessions)
+
+    def session(self, session_id: str) -> Agent:
+        """Get the Agent for a session, creating it on first use."""
+        if self.client is None:
+            raise RuntimeError("AgentServer has not been started")
+        if session_id not in self._sessions:
+            self._sessions[session_id] = Agent(
+                name=session_id,
+                system=self.system,
+                tools=self.tools,
+                mcp_servers=self.mcp_servers,
+                config=self.config,
+                verbose=self.verbose,
+                client=self.client,
+                message_params=self.message_params,
+                stream=self.stream,
+                mcp_pool=self.mcp_pool,
+                tool_scheduler=self.tool_scheduler,
+                tracer=self.tracer,
+            )
+            self._locks[session_id] = asyncio.Lock()
+        self._last_used[session_id] = time.monotonic()
+        return self._sessions[session_id]
+
+    def end_session(self, session_id: str) -> None:
+        """Forget a session and its message history."""
+        self._sessions.pop(session_id, None)
+        self._locks.pop(session_id, None)
+        self._last_used.pop(session_id, None)
+
+    def _evict_idle(self) -> None:
+        if self.session_ttl is None:
+            return
+        cutoff = time.monotonic() - self.session_ttl
+        for session_id, last_used in list(self._last_used.items()):
+            lock = self._locks.get(session_id)
+            if last_used < cutoff and not (lock and lock.locked()):
+                self.end_session(session_id)
+
+    async def chat(self, session_id: str, user_input: str) -> Any:
+        """Run one user turn in a session.
+
+        Turns within a session are serialized; different sessions run
+        concurrently on the same loop.
+        """
+        self._evict_idle()
+        agent = self.session(session_id)
+        async with self._locks[session_id]:
+            response = await agent.run_async(user_input)
+        self._last_used[session_id] = time.monotonic()
+        return response
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Answer newline-delimited JSON requests on one connection."""
+
+        async def answer(line: bytes) -> None:
+            try:
+                request = json.loads(line)
+                session_id = str(request["session_id"])
+                response = await self.chat(session_id, request["message"])
+                reply = {
+                    "session_id": session_id,
+                    "content": [
+                        block.model_dump() for block in response.content
+                    ],
+                }
+            except Exception as e:
+                reply = {"error": str(e)}
+            writer.write(json.dumps(reply).encode() + b"\n")
+            await writer.drain()
+
+        pending: set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(answer(line))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8765) -> None:
+        """Serve newline-delimited JSON over TCP until cancelled.
+
+        Each request line is {"session_id": ..., "message": ...} and gets a
+        reply line with the response content blocks, or {"error": ...}.
+        Requests on one connection may be answered out of order.
+        """
+        async with self:
+            server = await asyncio.start_server(
+                self._handle_client, host, port
+            )
+            if self.verbose:
+                print(f"AgentServer listening on {host}:{port}")
+            async with server:
+                await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run an AgentServer")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--system", default="You are a helpful assistant.")
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--keepalive-expiry", type=float, default=30.0)
+    args = parser.parse_args()
+
+    server = AgentServer(
+        system=args.system,
+        pool=PoolConfig(
+            max_connections=args.max_connections,
+            keepalive_expiry=args.keepalive_expiry,
+        ),
+        verbose=True,
+    )
+    asyncio.run(server.serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
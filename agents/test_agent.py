@@ -0,0 +1,205 @@
+"""Offline tests for Agent's API calls and streamed tool dispatch."""
+
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+from anthropic import Anthropic, AsyncAnthropic
+
+from agents.agent import Agent
+from agents.benchmarks.mock_api import (
+    MockAPIServer,
+    _stream_events,
+    tool_round_trip,
+    tool_use_response,
+)
+from agents.tools.base import Tool
+
+
+def test_async_client_calls_overlap():
+    with MockAPIServer(latency=0.3) as server:
+        client = AsyncAnthropic(base_url=server.base_url, api_key="x")
+        agents = [Agent(name=f"a{i}", system="test", client=client) for i in range(4)]
+
+        async def run_all():
+            async with client:
+                return await asyncio.gather(*(a.run_async("hi") for a in agents))
+
+        start = time.perf_counter()
+        responses = asyncio.run(run_all())
+        assert time.perf_counter() - start < 0.9
+        assert [r.content[0].text for r in responses] == ["ok"] * 4
+
+
+def test_sync_client_runs_in_worker_thread():
+    with MockAPIServer(latency=0.3) as server:
+        client = Anthropic(base_url=server.base_url, api_key="x")
+        callers = []
+        create = client.messages.create
+
+        def recording_create(**kwargs):
+            callers.append(threading.current_thread())
+            return create(**kwargs)
+
+        client.messages.create = recording_create
+        agents = [Agent(name=f"s{i}", system="test", client=client) for i in range(3)]
+
+        async def run_all():
+            return await asyncio.gather(*(a.run_async("hi") for a in agents))
+
+        start = time.perf_counter()
+        asyncio.run(run_all())
+        assert time.perf_counter() - start < 0.8
+        assert len(callers) == 3
+        assert threading.main_thread() not in callers
+
+
+def test_run_reuses_one_loop_and_close_releases_it():
+    with MockAPIServer(latency=0.0) as server:
+        agent = Agent(
+            name="sync",
+            system="test",
+            client=AsyncAnthropic(base_url=server.base_url, api_key="x"),
+        )
+        agent.run("one")
+        loop = agent._loop
+        agent.run("two")
+        assert agent._loop is loop
+        assert server.requests == 2
+
+        agent.close()
+        assert loop.is_closed()
+        assert agent._loop is None
+
+        # The client was passed in, so the agent can still run
+        with agent:
+            assert agent.run("three").content[0].text == "ok"
+        assert agent._loop is None
+
+
+def test_loop_is_closed_when_agent_is_collected():
+    with MockAPIServer(latency=0.0) as server:
+        agent = Agent(
+            name="dropped",
+            system="test",
+            client=AsyncAnthropic(base_url=server.base_url, api_key="x"),
+        )
+        agent.run("hi")
+        loop = agent._loop
+        del agent
+        assert loop.is_closed()
+
+
+class StampTool(Tool):
+    """Records when each call starts; sleeps, or fails on request."""
+
+    def __init__(self):
+        super().__init__(
+            name="stamp",
+            description="Record a call.",
+            input_schema={"type": "object"},
+        )
+        self.started: dict[str, float] = {}
+        self.cancelled: list[str] = []
+
+    async def execute(self, label: str, seconds: float = 0.0) -> str:
+        self.started[label] = time.perf_counter()
+        if label == "fail":
+            raise RuntimeError("stamp failed")
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            self.cancelled.append(label)
+            raise
+        return label
+
+
+def _streaming_agent(client, tool: StampTool) -> Agent:
+    return Agent(
+        name="streamer", system="test", tools=[tool], client=client, stream=True
+    )
+
+
+def test_streamed_tools_start_before_the_message_ends():
+    tool = StampTool()
+    calls = [("stamp", {"label": "a"}), ("stamp", {"label": "b"})]
+    with MockAPIServer(
+        latency=0.0, responder=tool_round_trip(calls), block_delay=0.2
+    ) as server:
+        client = AsyncAnthropic(base_url=server.base_url, api_key="x")
+        agent = _streaming_agent(client, tool)
+        start = time.perf_counter()
+        asyncio.run(agent.run_async("go"))
+
+    first = agent.stream_metrics[0]
+    assert first.tools_dispatched_early == 2
+    # Block "a" completes one block_delay before "b" and two before the end
+    assert tool.started["a"] - start < first.total_time - 0.3
+
+
+def test_streamed_results_follow_tool_use_order():
+    tool = StampTool()
+    calls = [
+        ("stamp", {"label": "slow", "seconds": 0.3}),
+        ("stamp", {"label": "fail"}),
+        ("stamp", {"label": "fast"}),
+    ]
+    with MockAPIServer(latency=0.0, responder=tool_round_trip(calls)) as server:
+        client = AsyncAnthropic(base_url=server.base_url, api_key="x")
+        agent = _streaming_agent(client, tool)
+        asyncio.run(agent.run_async("go"))
+
+    tool_uses = [
+        block for block in agent.history.messages[1]["content"]
+        if block.type == "tool_use"
+    ]
+    results = agent.history.messages[2]["content"]
+    assert [r["tool_use_id"] for r in results] == [b.id for b in tool_uses]
+    assert [r["content"] for r in results[::2]] == ["slow", "fast"]
+    assert results[1]["is_error"]
+    assert "stamp failed" in results[1]["content"]
+
+
+def test_broken_stream_cancels_dispatched_tools():
+    tool = StampTool()
+    body = tool_use_response({}, [("stamp", {"label": "long", "seconds": 10})])
+
+    async def broken_stream():
+        for name, data in _stream_events(body)[:-2]:
+            yield f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+        await asyncio.sleep(0.05)
+        raise httpx.ReadError("connection reset")
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=broken_stream(),
+        )
+
+    async def run():
+        http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with AsyncAnthropic(
+            api_key="x", max_retries=0, http_client=http_client
+        ) as client:
+            await _streaming_agent(client, tool).run_async("go")
+
+    with pytest.raises(httpx.ReadError):
+        asyncio.run(run())
+    assert "long" in tool.started
+    assert tool.cancelled == ["long"]
+
+
+def test_tool_payloads_follow_replaced_tools():
+    agent = Agent(name="tools", system="test", client=AsyncAnthropic(api_key="x"))
+    agent.tools = []
+    for i in range(200):
+        # The replaced tool is freed first, so its id may be reused
+        agent.tools.clear()
+        agent.tools.append(Tool(f"tool_{i}", "", {}))
+        assert [tool["name"] for tool in agent._tool_dicts()] == [f"tool_{i}"]
+    payloads = agent._tool_dicts()
+    assert agent._tool_dicts() is payloads
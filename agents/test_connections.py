@@ -0,0 +1,217 @@
+"""Tests for MCP connections and the connection pool, using stdio servers."""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import AsyncExitStack
+from pathlib import Path
+
+import pytest
+from anthropic import AsyncAnthropic
+from mcp.types import Tool as MCPToolDefinition
+
+from agents.agent import Agent
+from agents.benchmarks.mock_api import MockAPIServer
+from agents.tools.base import Tool
+from agents.utils.connections import MCPConnectionPool, setup_mcp_connections
+from agents.utils.schema_cache import ToolSchemaCache, server_fingerprint
+
+DUMMY_SERVER = Path(__file__).parent / "benchmarks" / "dummy_mcp_server.py"
+
+needs_proc = pytest.mark.skipif(
+    not os.path.isdir("/proc/self"), reason="lists child processes from /proc"
+)
+
+
+def _server(name: str = "dummy", *args: str) -> dict:
+    return {
+        "type": "stdio",
+        "command": sys.executable,
+        "args": [str(DUMMY_SERVER), "--name", name, *args],
+    }
+
+
+def _children() -> list[int]:
+    """PIDs of this process's live (non-zombie) child processes."""
+    children = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        state, ppid = stat.rsplit(")", 1)[1].split()[:2]
+        if int(ppid) == os.getpid() and state != "Z":
+            children.append(int(entry))
+    return children
+
+
+@needs_proc
+def test_pool_used_from_two_loops_leaves_no_processes():
+    pool = MCPConnectionPool()
+    loops = [asyncio.new_event_loop(), asyncio.new_event_loop()]
+    try:
+        for _ in range(3):
+            for loop in loops:
+                tools = loop.run_until_complete(pool.get_tools([_server()]))
+                assert [tool.name for tool in tools] == ["dummy_echo"]
+                assert pool.loop is loop
+                assert len(_children()) == 1
+        asyncio.run(pool.aclose())
+        assert _children() == []
+    finally:
+        for loop in loops:
+            loop.close()
+
+
+@needs_proc
+def test_agents_sharing_a_pool_close_their_connections():
+    pool = MCPConnectionPool()
+    with MockAPIServer(latency=0.0) as api:
+        agents = [
+            Agent(
+                name=f"agent-{i}",
+                system="test",
+                mcp_servers=[_server()],
+                client=AsyncAnthropic(base_url=api.base_url, api_key="x"),
+                mcp_pool=pool,
+            )
+            for i in range(2)
+        ]
+        for _ in range(3):
+            for agent in agents:
+                agent.run("hi")
+        assert len(_children()) == 1
+        for agent in agents:
+            agent.close()
+    assert _children() == []
+
+
+async def _setup(servers: list[dict], **kwargs) -> tuple[list[str], float]:
+    start = time.perf_counter()
+    async with AsyncExitStack() as stack:
+        tools = await setup_mcp_connections(servers, stack, **kwargs)
+        elapsed = time.perf_counter() - start
+        assert len(_children()) == len(tools)
+    return [tool.name for tool in tools], elapsed
+
+
+@needs_proc
+def test_servers_start_concurrently():
+    # Process startup is CPU bound, so compare against undelayed servers
+    _, baseline = asyncio.run(_setup([_server(f"s{i}") for i in range(3)]))
+    servers = [_server(f"s{i}", "--startup-delay", "1") for i in range(3)]
+    names, elapsed = asyncio.run(_setup(servers))
+    assert names == ["s0_echo", "s1_echo", "s2_echo"]
+    # Sequential startup would add the 1s delay three times
+    assert elapsed - baseline < 2
+    assert _children() == []
+
+
+@needs_proc
+def test_failing_and_slow_servers_do_not_block_the_others():
+    servers = [
+        _server("first"),
+        {"type": "stdio", "command": "/nonexistent/mcp-server"},
+        {**_server("slow", "--startup-delay", "30"), "timeout": 1.5},
+        _server("last"),
+    ]
+    names, elapsed = asyncio.run(_setup(servers, timeout=10))
+    assert names == ["first_echo", "last_echo"]
+    assert elapsed < 5
+    # The servers that started are stopped, the timed out one is killed
+    assert _children() == []
+
+
+def _definition(name: str) -> MCPToolDefinition:
+    return MCPToolDefinition(
+        name=name, description="A tool.", inputSchema={"type": "object"}
+    )
+
+
+def test_schema_cache_hit_miss_and_invalidation(tmp_path):
+    script = tmp_path / "server.py"
+    script.write_text("# v1\n")
+    config = {"type": "stdio", "command": sys.executable, "args": [str(script)]}
+    path = tmp_path / "cache" / "schemas.json"
+    cache = ToolSchemaCache(path)
+
+    assert cache.get(config) is None
+    assert cache.put(config, [_definition("a")], "1.0")
+    assert not cache.put(config, [_definition("a")], "1.0")
+    # Persisted, and read back by a new instance
+    assert [t.name for t in ToolSchemaCache(path).get(config)] == ["a"]
+    assert cache.put(config, [_definition("a"), _definition("b")])
+
+    # Editing the server script invalidates the entry
+    script.write_text("# v2, longer\n")
+    assert cache.get(config) is None
+    cache.put(config, [_definition("c")])
+    assert [t.name for t in cache.get(config)] == ["c"]
+
+    cache.invalidate(config)
+    assert cache.get(config) is None
+    assert ToolSchemaCache(path).get(config) is None
+    assert os.listdir(path.parent) == ["schemas.json"]
+
+
+def test_fingerprint_follows_module_servers(tmp_path, monkeypatch):
+    package = tmp_path / "fake_mcp_server"
+    package.mkdir()
+    (package / "__init__.py").write_text("VERSION = 1\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    config = {
+        "type": "stdio",
+        "command": sys.executable,
+        "args": ["-m", "fake_mcp_server.main"],
+    }
+    before = server_fingerprint(config)
+    assert server_fingerprint(config) == before
+    (package / "__init__.py").write_text("VERSION = 2  # upgraded\n")
+    assert server_fingerprint(config) != before
+    assert "fake_mcp_server" not in sys.modules
+
+
+@needs_proc
+def test_revalidated_schemas_are_swapped_in(tmp_path):
+    cache = ToolSchemaCache(tmp_path / "schemas.json")
+    config = _server()
+    cache.put(config, [_definition("stale_tool")])
+    swapped = []
+
+    async def run() -> list[str]:
+        changed = asyncio.Event()
+
+        def on_tools_changed(old, new):
+            swapped.append(([t.name for t in old], [t.name for t in new]))
+            changed.set()
+
+        async with AsyncExitStack() as stack:
+            tools = await setup_mcp_connections(
+                [config],
+                stack,
+                schema_cache=cache,
+                on_tools_changed=on_tools_changed,
+            )
+            await asyncio.wait_for(changed.wait(), 30)
+            return [tool.name for tool in tools]
+
+    assert asyncio.run(run()) == ["stale_tool"]
+    assert swapped == [(["stale_tool"], ["dummy_echo"])]
+    assert [t.name for t in cache.get(config)] == ["dummy_echo"]
+
+
+def test_agent_swaps_tools_in_one_step():
+    agent = Agent(name="swap", system="test", client=AsyncAnthropic(api_key="x"))
+    local, old, new = Tool("local", "", {}), Tool("old", "", {}), Tool("new", "", {})
+    agent.tools = [old, local]
+    before = agent.tools
+    agent._swap_tools([old], [new])
+    assert [t.name for t in agent.tools] == ["new", "local"]
+    assert [t.name for t in before] == ["old", "local"]
+    # Tools from a finished run are ignored
+    agent._swap_tools([old], [new])
+    assert [t.name for t in agent.tools] == ["new", "local"]
@@ -0,0 +1,71 @@
+"""Offline tests for the file_search tool and its trigram index."""
+
+import asyncio
+import os
+
+from agents.tools.file_search import FileSearchTool
+from agents.utils.search_index import TrigramIndex, required_literals
+
+
+def _search(tool: FileSearchTool, root, **kwargs) -> str:
+    return asyncio.run(tool.execute(path=str(root), **kwargs))
+
+
+def test_required_literals():
+    assert required_literals(r"def \w+_handler\(") == ["def ", "_handler("]
+    assert required_literals(r"colou?r_name") == ["colo", "r_name"]
+    assert required_literals(r"(foo)bar[xyz]bazz") == ["bar", "bazz"]
+    assert required_literals(r"error|warning") == []
+
+
+def test_search_with_context_and_ranking(tmp_path):
+    (tmp_path / "a.py").write_text("one\ntwo\nTARGET\nthree\nfour\n")
+    (tmp_path / "b.py").write_text("TARGET\nTARGET\n")
+    (tmp_path / "notes.md").write_text("no target here\n")
+    (tmp_path / "blob.bin").write_bytes(b"\0TARGET")
+    tool = FileSearchTool(index_dir=str(tmp_path / ".index"))
+
+    result = _search(tool, tmp_path, query="TARGET", context=1)
+    assert result.startswith("3 matches in 2 files")
+    assert result.index("b.py") < result.index("a.py")
+    assert "  2- two\n  3: TARGET\n  4- three" in result
+    assert "blob.bin" not in result
+
+    result = _search(tool, tmp_path, query="target", ignore_case=True)
+    assert "notes.md" in result
+    result = _search(
+        tool, tmp_path, query="target", ignore_case=True, include="*.py"
+    )
+    assert "notes.md" not in result
+    result = _search(tool, tmp_path, query=r"T\w+T$", regex=True)
+    assert result.startswith("3 matches")
+    assert "Invalid regular expression" in _search(
+        tool, tmp_path, query="(", regex=True
+    )
+
+
+def test_index_updates_incrementally_and_persists(tmp_path):
+    root = tmp_path / "src"
+    root.mkdir()
+    for i in range(5):
+        (root / f"m{i}.py").write_text(f"value = {i}\n")
+    index_dir = str(tmp_path / "index")
+
+    index = TrigramIndex(str(root), index_dir)
+    assert index.update()
+    assert index.indexed == 5
+    assert index.candidates(["value = 3"]) == ["m3.py"]
+
+    (root / "m3.py").write_text("value = 33\n")
+    os.utime(root / "m3.py", ns=(0, 1))
+    (root / "m4.py").unlink()
+    assert index.update()
+    assert index.indexed == 6
+    assert index.candidates(["value = 3"]) == ["m3.py"]
+    assert "m4.py" not in index.files
+    assert not index.update()
+
+    reloaded = TrigramIndex(str(root), index_dir)
+    assert not reloaded.update()
+    assert reloaded.indexed == 0
+    assert reloaded.candidates(["= 33"]) == ["m3.py"]
@@ -0,0 +1,350 @@
+"""Offline tests for the file tools."""
+
+import asyncio
+import mmap
+import os
+
+from agents.tools.file_tools import FileReadTool, FileWriteTool
+from agents.utils.file_util import (
+    LineIndex,
+    get_line_index,
+    sniff,
+    stream_edit,
+)
+from agents.utils.listing import DirectoryCache, list_directory
+
+
+def _write_lines(path, count: int) -> None:
+    path.write_text("".join(f"line {i}\n" for i in range(1, count + 1)))
+
+
+def _read(**kwargs) -> str:
+    return asyncio.run(FileReadTool().execute(operation="read", **kwargs))
+
+
+def test_line_range_read(tmp_path):
+    path = tmp_path / "log.txt"
+    _write_lines(path, 1000)
+    assert _read(path=str(path), start_line=500, end_line=502) == (
+        "line 500\nline 501\nline 502\n"
+    )
+    assert _read(path=str(path), start_line=999, max_lines=5) == (
+        "line 999\nline 1000\n"
+    )
+    assert _read(path=str(path), start_line=2000) == ""
+
+
+def test_line_index_is_sparse_and_reused(tmp_path):
+    path = tmp_path / "log.txt"
+    _write_lines(path, 1000)
+    _read(path=str(path), start_line=700, end_line=700)
+    index = get_line_index(str(path))
+    assert index.lines_scanned == 700
+    assert len(index.checkpoints) == 700 // index.stride + 1
+
+    # Appending keeps the existing index and extends it
+    with open(path, "a") as f:
+        f.write("line 1001\n")
+    assert _read(path=str(path), start_line=1001) == "line 1001\n"
+    assert get_line_index(str(path)) is index
+    assert index.lines_scanned == 1000
+
+
+def test_append_at_stride_boundary_keeps_checkpoints_aligned(tmp_path):
+    path = tmp_path / "log.txt"
+    _write_lines(path, 64)
+    # Scan to the end of the file, which ends on a checkpoint
+    assert _read(path=str(path), start_line=65) == ""
+    stride = get_line_index(str(path)).stride
+    assert 64 % stride == 0
+    with open(path, "a") as f:
+        f.write("".join(f"line {i}\n" for i in range(65, 200)))
+    assert _read(path=str(path), start_line=100, end_line=100) == "line 100\n"
+    assert _read(path=str(path), start_line=150, end_line=150) == "line 150\n"
+
+
+def test_rewritten_file_rebuilds_index(tmp_path):
+    path = tmp_path / "log.txt"
+    _write_lines(path, 200)
+    assert _read(path=str(path), start_line=150, end_line=150) == "line 150\n"
+    path.write_text("".join(f"row {i}\n" for i in range(1, 300)))
+    assert _read(path=str(path), start_line=150, end_line=150) == "row 150\n"
+
+
+def test_tail_and_byte_range(tmp_path):
+    path = tmp_path / "log.txt"
+    _write_lines(path, 100)
+    assert _read(path=str(path), tail=2) == "line 99\nline 100\n"
+    assert _read(path=str(path), tail=500).startswith("line 1\n")
+    assert _read(path=str(path), offset=7, length=6) == "line 2"
+
+    path.write_text("no newline\nat end")
+    assert _read(path=str(path), tail=1) == "at end"
+
+
+def test_stride_walk_matches_full_scan(tmp_path):
+    path = tmp_path / "log.txt"
+    _write_lines(path, 300)
+    lines = path.read_bytes().splitlines(keepends=True)
+    index = LineIndex(str(path), stride=7)
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            index.sync(mm, os.fstat(f.fileno()))
+            for line in (0, 6, 7, 8, 150, 299):
+                offset = index.line_offset(mm, line)
+                assert offset == sum(len(text) for text in lines[:line])
+
+
+def _tree(root, *paths: str) -> None:
+    for rel_path in paths:
+        path = root / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not rel_path.endswith("/"):
+            path.write_text(rel_path)
+
+
+def _list(root, **kwargs) -> list[str]:
+    listing = list_directory(str(root), cache=DirectoryCache(), **kwargs)
+    return [rel_path for rel_path, _ in listing.entries]
+
+
+def test_list_patterns_and_depth(tmp_path):
+    _tree(
+        tmp_path, "a.py", "b.txt", "src/c.py", "src/deep/d.py", ".hidden/e.py"
+    )
+    assert _list(tmp_path) == ["a.py", "b.txt", "src"]
+    assert _list(tmp_path, pattern="**/*.py") == [
+        "a.py",
+        "src/c.py",
+        "src/deep/d.py",
+    ]
+    assert _list(tmp_path, pattern="src/*.py") == ["src/c.py"]
+    assert _list(tmp_path, pattern="**/*.py", max_depth=2) == [
+        "a.py",
+        "src/c.py",
+    ]
+    assert _list(tmp_path, pattern=".hidden/*") == [".hidden/e.py"]
+
+
+def test_list_respects_gitignore(tmp_path):
+    _tree(
+        tmp_path,
+        ".git/",
+        "main.py",
+        "debug.log",
+        "build/out.py",
+        "pkg/keep.log",
+        "pkg/node_modules/x.js",
+    )
+    (tmp_path / ".gitignore").write_text("*.log\n!keep.log\nbuild/\n")
+    (tmp_path / "pkg" / ".gitignore").write_text("node_modules\n")
+    assert _list(tmp_path, pattern="**") == [
+        "main.py",
+        "pkg",
+        "pkg/keep.log",
+    ]
+    # Parent .gitignore files apply when listing a subdirectory
+    assert _list(tmp_path / "pkg", pattern="**") == ["keep.log"]
+    assert "debug.log" in _list(tmp_path, respect_gitignore=False)
+
+
+def test_list_gitignore_anchored_patterns(tmp_path):
+    _tree(
+        tmp_path,
+        ".git/",
+        "build/x.py",
+        "docs/tmp/y.txt",
+        "src/build/z.py",
+        "src/docs/tmp/w.txt",
+    )
+    (tmp_path / ".gitignore").write_text("/build\ndocs/tmp/\n")
+    assert _list(tmp_path, pattern="**/*.*") == [
+        "src/build/z.py",
+        "src/docs/tmp/w.txt",
+    ]
+    assert _list(tmp_path / "src", pattern="**/*.*") == [
+        "build/z.py",
+        "docs/tmp/w.txt",
+    ]
+
+
+def test_list_does_not_follow_directory_symlinks(tmp_path):
+    _tree(tmp_path, "a.txt", "sub/b.txt")
+    (tmp_path / "sub" / "loop").symlink_to(tmp_path, target_is_directory=True)
+    assert _list(tmp_path, pattern="**") == [
+        "a.txt",
+        "sub",
+        "sub/b.txt",
+        "sub/loop",
+    ]
+
+def test_list_pages_with_cursor(tmp_path):
+    _tree(tmp_path, *(f"f{i:02}.txt" for i in range(25)))
+    cache = DirectoryCache()
+    first = list_directory(str(tmp_path), limit=10, cache=cache)
+    assert (first.total, first.next_cursor) == (25, "f09.txt")
+    seen = [p for p, _ in first.entries]
+    cursor = first.next_cursor
+    while cursor is not None:
+        page = list_directory(
+            str(tmp_path), limit=10, cursor=cursor, cache=cache
+        )
+        seen += [p for p, _ in page.entries]
+        cursor = page.next_cursor
+    assert seen == [f"f{i:02}.txt" for i in range(25)]
+    # Later pages reuse the directory snapshot
+    assert (cache.hits, cache.misses) == (2, 1)
+
+    result = asyncio.run(
+        FileReadTool().execute(operation="list", path=str(tmp_path), limit=10)
+    )
+    assert 'cursor="f09.txt"' in result
+
+
+def test_directory_snapshot_invalidated_by_mtime(tmp_path):
+    _tree(tmp_path, "a.txt")
+    cache = DirectoryCache()
+    assert cache.entries(str(tmp_path)) == [("a.txt", False)]
+    (tmp_path / "b").mkdir()
+    os.utime(tmp_path, ns=(0, 1))
+    assert cache.entries(str(tmp_path)) == [("a.txt", False), ("b", True)]
+    assert cache.misses == 2
+
+
+def _edit(**kwargs) -> str:
+    return asyncio.run(FileWriteTool().execute(operation="edit", **kwargs))
+
+
+def test_edit_reports_lines_and_keeps_mode(tmp_path):
+    path = tmp_path / "config.txt"
+    path.write_text("a = 1\nb = 2\na = 1\n")
+    os.chmod(path, 0o640)
+    result = _edit(path=str(path), old_text="a = 1", new_text="a = 3")
+    assert "2 occurrences" in result and "(lines 1, 3)" in result
+    assert path.read_text() == "a = 3\nb = 2\na = 3\n"
+    assert os.stat(path).st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["config.txt"]
+
+
+def test_new_files_follow_the_umask(tmp_path):
+    previous = os.umask(0o027)
+    try:
+        path = tmp_path / "new" / "file.txt"
+        result = asyncio.run(
+            FileWriteTool().execute(
+                operation="write", path=str(path), content="hello"
+            )
+        )
+    finally:
+        os.umask(previous)
+    assert "Successfully wrote" in result
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+def test_matches_across_chunk_boundaries(tmp_path):
+    path = tmp_path / "big.txt"
+    text = "".join(f"row {i} NEEDLE\n" for i in range(500))
+    for chunk_size in (1, 7, 64, 4096):
+        path.write_text(text)
+        positions = stream_edit(
+            str(path), [("NEEDLE", "pin"), ("row 49", "ROW 49")], chunk_size
+        )
+        assert path.read_text() == text.replace("NEEDLE", "pin").replace(
+            "row 49", "ROW 49"
+        )
+        assert positions[0] == list(range(1, 501))
+        assert positions[1] == [50] + list(range(491, 501))
+
+
+def test_utf16_matches_stay_on_code_units(tmp_path):
+    path = tmp_path / "wide.txt"
+    # Encoded, these hold b"A\0" and b"\n\0" across two code units
+    text = "\u4142\u4300\u0a41\u0100\nA\n"
+    for chunk_size in (1, 3, 4096):
+        path.write_text(text, encoding="utf-16")
+        positions = stream_edit(
+            str(path), [("A", "B")], chunk_size, encoding="utf-16-le"
+        )
+        assert positions == [[2]]
+        assert path.read_text(encoding="utf-16") == text.replace("A", "B")
+    path.write_text("\u4142\u4300\n", encoding="utf-16")
+    assert "not found" in _edit(path=str(path), old_text="A", new_text="B")
+    assert path.read_text(encoding="utf-16") == "\u4142\u4300\n"
+
+
+def test_batched_edits_are_all_or_nothing(tmp_path):
+    path = tmp_path / "main.py"
+    path.write_text("def f():\n    return 1\n")
+    result = _edit(
+        path=str(path),
+        edits=[
+            {"old_text": "return 1", "new_text": "return 2"},
+            {"old_text": "missing", "new_text": "x"},
+        ],
+    )
+    assert "edit 2 was not found" in result
+    assert path.read_text() == "def f():\n    return 1\n"
+    assert os.listdir(tmp_path) == ["main.py"]
+
+    result = _edit(
+        path=str(path),
+        edits=[
+            {"old_text": "def f", "new_text": "def g"},
+            {"old_text": "return 1", "new_text": "return 2"},
+        ],
+    )
+    assert result.count("Successfully edited") == 2
+    assert path.read_text() == "def g():\n    return 2\n"
+
+
+def test_single_and_batched_edits_validate_alike(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("keep drop keep\n")
+    assert _edit(path=str(path), old_text=" drop", new_text="") == (
+        f"Successfully edited {path} (line 1)"
+    )
+    assert _edit(path=str(path), edits=[{"old_text": "keep", "new_text": ""}])
+    assert path.read_text() == " \n"
+
+    for kwargs in (
+        {"old_text": "", "new_text": "x"},
+        {"old_text": " "},
+        {"edits": [{"old_text": "", "new_text": "x"}]},
+        {"edits": [{"old_text": " "}]},
+    ):
+        assert _edit(path=str(path), **kwargs).startswith("Error: both")
+    assert path.read_text() == " \n"
+
+def test_binary_files_are_summarized(tmp_path):
+    path = tmp_path / "logo.png"
+    header = b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR"
+    size = (640).to_bytes(4, "big") + (480).to_bytes(4, "big")
+    path.write_bytes(header + size + bytes(range(256)) * 40)
+
+    result = _read(path=str(path))
+    assert result.startswith(f"Binary file: {path} (PNG image, 640x480, 10.")
+    dump = _read(path=str(path), offset=0, length=16)
+    assert dump == (
+        "00000000  89 50 4e 47 0d 0a 1a 0a 00 00 00 0d 49 48 44 52  "
+        "|.PNG........IHDR|"
+    )
+    assert "binary file" in _edit(path=str(path), old_text="PNG", new_text="x")
+
+
+def test_detected_encodings_round_trip(tmp_path):
+    legacy = tmp_path / "legacy.txt"
+    legacy.write_bytes("caf\xe9 cr\xe8me\n".encode("latin-1"))
+    assert sniff(str(legacy)).encoding == "cp1252"
+    assert _read(path=str(legacy)) == "caf\xe9 cr\xe8me\n"
+    _edit(path=str(legacy), old_text="cr\xe8me", new_text="br\xfbl\xe9e")
+    assert legacy.read_bytes() == "caf\xe9 br\xfbl\xe9e\n".encode("cp1252")
+
+    wide = tmp_path / "wide.txt"
+    wide.write_text("one\ntwo\nthree\n", encoding="utf-16")
+    kind = sniff(str(wide))
+    assert (kind.binary, kind.description) == (False, "UTF-16 text")
+    assert _read(path=str(wide)) == "one\ntwo\nthree\n"
+    assert _read(path=str(wide), start_line=2, end_line=2) == "two\n"
+    assert _read(path=str(wide), tail=1) == "three\n"
+    result = _edit(path=str(wide), old_text="two", new_text="2")
+    assert "(line 2)" in result
+    assert wide.read_text(encoding="utf-16") == "one\n2\nthree\n"
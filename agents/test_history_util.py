@@ -0,0 +1,316 @@
+"""Offline tests for MessageHistory token accounting."""
+
+import asyncio
+from types import SimpleNamespace
+
+from agents.utils.cache_util import CacheBreakpointPlanner
+from agents.utils.compaction import (
+    BlockClipping,
+    Compactor,
+    DropOldest,
+    Summarization,
+    ToolResultElision,
+)
+from agents.utils.history_util import MessageHistory
+from agents.utils.token_util import HeuristicTokenEstimator
+
+
+class _NoNetworkClient:
+    """Client that fails the test if history code touches the network."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"unexpected client access: {name}")
+
+
+def _usage(input_tokens: int, output_tokens: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        cache_read_input_tokens=None,
+        cache_creation_input_tokens=0,
+    )
+
+
+def _history(context_window_tokens: int = 100_000) -> MessageHistory:
+    return MessageHistory(
+        model="test-model",
+        system="You are a helpful assistant.",
+        context_window_tokens=context_window_tokens,
+        client=_NoNetworkClient(),
+    )
+
+
+def test_init_does_no_io():
+    history = _history()
+    assert history.total_tokens > 0
+
+
+def test_estimates_are_memoized():
+    estimator = HeuristicTokenEstimator()
+    text = "the same string " * 50
+    assert estimator.estimate_text(text) == estimator.estimate_text(text)
+    assert estimator.cache_info.hits == 1
+
+
+def test_calibration_moves_scale_towards_observed():
+    estimator = HeuristicTokenEstimator()
+    estimate = estimator.estimate_text("word " * 200)
+    estimator.calibrate(estimate, estimate * 2)
+    assert estimator.estimate_text("word " * 200) > estimate
+
+
+def test_pending_messages_count_before_first_response():
+    history = _history()
+    before = history.estimated_total_tokens
+    asyncio.run(history.add_message("user", "hello " * 100))
+    assert history.estimated_total_tokens > before
+    assert history.uncounted_tokens == history.message_estimates[0]
+
+
+def test_usage_replaces_estimates():
+    history = _history()
+    asyncio.run(history.add_message("user", "hi"))
+    asyncio.run(
+        history.add_message(
+            "assistant", [{"type": "text", "text": "hello"}], _usage(50, 5)
+        )
+    )
+    assert history.uncounted_tokens == 0
+    assert history.total_tokens == 55
+
+
+def test_truncate_uses_estimates_for_unsent_messages():
+    history = _history(context_window_tokens=200)
+    asyncio.run(history.add_message("user", "first " * 30))
+    asyncio.run(
+        history.add_message(
+            "assistant", [{"type": "text", "text": "ok"}], _usage(40, 10)
+        )
+    )
+    asyncio.run(history.add_message("user", "second " * 30))
+    asyncio.run(
+        history.add_message(
+            "assistant", [{"type": "text", "text": "ok"}], _usage(95, 10)
+        )
+    )
+    # Over the window only once the unsent message is counted
+    asyncio.run(history.add_message("user", "long " * 150))
+    assert history.total_tokens <= 200
+
+    history.truncate()
+
+    assert len(history.messages) == len(history.message_estimates)
+    assert history.messages[0]["content"][0]["text"].startswith("[Earlier")
+
+
+def _tool_turn(history: MessageHistory, index: int, result: str) -> None:
+    tool_use = {
+        "type": "tool_use",
+        "id": f"toolu_{index}",
+        "name": "read_file",
+        "input": {"path": f"file_{index}.txt"},
+    }
+    asyncio.run(
+        history.add_message(
+            "assistant",
+            [tool_use],
+            _usage(history.estimated_total_tokens, 20),
+        )
+    )
+    asyncio.run(
+        history.add_message(
+            "user",
+            [
+                {
+                    "type": "tool_result",
+                    "tool_use_id": f"toolu_{index}",
+                    "content": result,
+                }
+            ],
+        )
+    )
+
+
+def test_ledger_tracks_every_message():
+    history = _history()
+    asyncio.run(history.add_message("user", "read the files"))
+    for i in range(3):
+        _tool_turn(history, i, "data " * 200)
+    assert len(history.token_ledger) == len(history.messages)
+    assert history.uncounted_tokens == history.token_ledger[-1]
+
+
+def test_compact_elides_old_tool_results_first():
+    history = _history(context_window_tokens=800)
+    history.compactor = Compactor(
+        [ToolResultElision(keep_recent=2), DropOldest()]
+    )
+    asyncio.run(history.add_message("user", "read the files"))
+    for i in range(4):
+        _tool_turn(history, i, "data " * 200)
+    count = len(history.messages)
+    assert history.estimated_total_tokens > 800
+
+    asyncio.run(history.compact())
+
+    assert len(history.messages) == count
+    assert history.estimated_total_tokens <= 600
+    first_result = history.messages[2]["content"][0]
+    assert first_result["tool_use_id"] == "toolu_0"
+    assert first_result["content"].startswith("[Tool result elided")
+    assert history.messages[-1]["content"][0]["content"] == "data " * 200
+    assert [e.strategy for e in history.compactor.events] == [
+        "ToolResultElision"
+    ]
+
+
+def test_block_clipping_keeps_head_and_tail():
+    history = _history(context_window_tokens=500)
+    history.compactor = Compactor([BlockClipping(max_block_tokens=100)])
+    text = "start " + "middle " * 800 + "end"
+    asyncio.run(history.add_message("user", text))
+    asyncio.run(
+        history.add_message(
+            "assistant", [{"type": "text", "text": "ok"}], _usage(900, 2)
+        )
+    )
+    asyncio.run(history.add_message("user", "next"))
+
+    asyncio.run(history.compact())
+
+    clipped = history.messages[0]["content"][0]["text"]
+    assert clipped.startswith("start")
+    assert clipped.endswith("end")
+    assert "tokens clipped" in clipped
+    assert history.estimated_total_tokens < 500
+
+
+def test_block_clipping_is_idempotent():
+    history = _history()
+    strategy = BlockClipping(max_block_tokens=100, keep_recent=0)
+    text = "start " + "middle " * 800 + "end"
+    asyncio.run(history.add_message("user", [{"type": "text", "text": text}]))
+
+    saved = asyncio.run(strategy.apply(history, target_tokens=0))
+    clipped = history.messages[0]
+    assert saved > 0
+    block = clipped["content"][0]["text"]
+    assert history.token_estimator.estimate_text(block) <= 100
+
+    # Still over the target, but the block is never clipped again
+    for _ in range(2):
+        assert asyncio.run(strategy.apply(history, target_tokens=0)) == 0
+        assert history.messages[0] is clipped
+
+
+class _SummaryClient:
+    def __init__(self):
+        self.messages = self
+        self.calls = []
+
+    def create(self, **params):
+        self.calls.append(params)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="user wants files")]
+        )
+
+
+def test_summarization_replaces_prefix():
+    client = _SummaryClient()
+    history = _history(context_window_tokens=800)
+    history.compactor = Compactor(
+        [Summarization(client=client, keep_recent=2)]
+    )
+    asyncio.run(history.add_message("user", "read the files"))
+    for i in range(4):
+        _tool_turn(history, i, "data " * 200)
+
+    asyncio.run(history.compact())
+
+    assert len(client.calls) == 1
+    assert client.calls[0]["model"] != history.model
+    first = history.messages[0]
+    assert first["role"] == "user"
+    assert "user wants files" in first["content"][0]["text"]
+    assert history.messages[1]["role"] == "assistant"
+    assert len(history.token_ledger) == len(history.messages)
+    assert history.estimated_total_tokens <= 600
+
+
+def _markers(blocks) -> int:
+    return sum("cache_control" in block for block in blocks)
+
+
+def test_cache_breakpoints_stay_within_budget():
+    history = _history()
+    asyncio.run(history.add_message("user", "read the files"))
+    for i in range(6):
+        _tool_turn(history, i, "data " * 20)
+    tools = [{"name": "read_file", "input_schema": {"type": "object"}}]
+
+    system = history.format_system(has_tools=True)
+    formatted_tools = history.format_tools(tools)
+    messages = history.format_for_api(has_tools=True)
+
+    message_markers = [
+        i for i, m in enumerate(messages) if _markers(m["content"])
+    ]
+    total = _markers(system) + _markers(formatted_tools) + len(
+        message_markers
+    )
+    assert total == 4
+    assert _markers(system) == 1
+    # Newest message and the end of the previous request
+    assert message_markers[-2:] == [len(messages) - 3, len(messages) - 1]
+    assert all(_markers(m["content"]) <= 1 for m in messages)
+    assert "cache_control" not in history.messages[-1]["content"][-1]
+
+
+def test_cache_hit_rate_from_usage():
+    history = _history()
+    asyncio.run(history.add_message("user", "hi"))
+    usage = SimpleNamespace(
+        input_tokens=10,
+        output_tokens=5,
+        cache_read_input_tokens=70,
+        cache_creation_input_tokens=20,
+    )
+    reply = [{"type": "text", "text": "hi"}]
+    asyncio.run(history.add_message("assistant", reply, usage))
+    assert history.cache_stats.hit_rate == 0.7
+    assert history.cache_stats.requests == 1
+
+
+def test_compaction_keeps_compacted_prefix_marked():
+    history = _history(context_window_tokens=800)
+    history.compactor = Compactor([ToolResultElision(keep_recent=2)])
+    asyncio.run(history.add_message("user", "read the files"))
+    for i in range(4):
+        _tool_turn(history, i, "data " * 200)
+
+    asyncio.run(history.compact())
+
+    boundary = history.compaction_boundary
+    assert boundary is not None
+    messages = history.format_for_api(has_tools=True)
+    assert _markers(messages[boundary]["content"]) == 1
+
+
+def test_formatting_is_incremental():
+    history = _history()
+    history.cache_planner = CacheBreakpointPlanner(max_breakpoints=2)
+    asyncio.run(history.add_message("user", "read the files"))
+    _tool_turn(history, 0, "data")
+    first = history.format_for_api()
+    plain = first[1]
+    assert _markers(first[2]["content"]) == 1
+
+    _tool_turn(history, 1, "data")
+    second = history.format_for_api()
+
+    assert second is first
+    assert second[1] is plain
+    assert len(second) == len(history.messages)
+    # The breakpoint moved on and the marked copy was swapped back
+    assert second[2]["content"] is history.messages[2]["content"]
+    assert _markers(second[-1]["content"]) == 1
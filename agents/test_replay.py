@@ -0,0 +1,80 @@
+"""Offline tests for the record/replay transports."""
+
+import asyncio
+import time
+
+import pytest
+from anthropic import BadRequestError
+
+from agents.agent import Agent
+from agents.benchmarks.agent_loops import scripted
+from agents.benchmarks.mock_api import MockAPIServer
+from agents.benchmarks.replay import (
+    Cassette,
+    recording_client,
+    replay_client,
+)
+from agents.tools.think import ThinkTool
+
+
+async def _run(client, stream: bool = False) -> list:
+    async with client:
+        agent = Agent(
+            name="replayed",
+            system="test",
+            tools=[ThinkTool()],
+            client=client,
+            stream=stream,
+        )
+        return await agent.run_async("go")
+
+
+def test_record_then_replay_without_network(tmp_path):
+    path = str(tmp_path / "run.jsonl")
+    calls = [("think", {"thought": "a"}), ("think", {"thought": "b"})]
+    with MockAPIServer(latency=0.2, responder=scripted(2, calls)) as server:
+        client = recording_client(path, base_url=server.base_url, api_key="x")
+        recorded = asyncio.run(_run(client))
+        assert server.requests == 3
+
+    cassette = Cassette.load(path)
+    assert len(cassette) == 3
+    assert all(i["latency"] >= 0.2 for i in cassette.interactions)
+
+    start = time.perf_counter()
+    replayed = asyncio.run(_run(replay_client(cassette, latency_scale=0)))
+    assert time.perf_counter() - start < 0.5
+    assert replayed.content == recorded.content
+
+    start = time.perf_counter()
+    asyncio.run(_run(replay_client(cassette, latency_scale=0.5)))
+    assert time.perf_counter() - start >= 0.3
+
+    # A different conversation only replays in non-strict mode
+    async def run_other(client) -> None:
+        async with client:
+            agent = Agent(name="other", system="different", client=client)
+            await agent.run_async("go")
+
+    with pytest.raises(BadRequestError, match="No recorded response"):
+        asyncio.run(run_other(replay_client(path, strict=True)))
+    asyncio.run(run_other(replay_client(path, latency_scale=0)))
+
+
+def test_streamed_responses_replay_chunk_timing(tmp_path):
+    path = str(tmp_path / "stream.jsonl")
+    responder = scripted(1, [("think", {"thought": "a"})])
+    with MockAPIServer(
+        latency=0.0, responder=responder, block_delay=0.1
+    ) as server:
+        client = recording_client(path, base_url=server.base_url, api_key="x")
+        asyncio.run(_run(client, stream=True))
+
+    first, _ = Cassette.load(path).interactions
+    assert first["headers"]["content-type"].startswith("text/event-stream")
+    assert sum(delay for delay, _ in first["chunks"]) >= 0.2
+
+    start = time.perf_counter()
+    result = asyncio.run(_run(replay_client(path, latency_scale=1), True))
+    assert time.perf_counter() - start >= 0.25
+    assert result.content[0].text == "done"
@@ -0,0 +1,84 @@
+"""Offline tests for AgentServer's shared client and shutdown."""
+
+import asyncio
+
+import pytest
+
+from agents.benchmarks.mock_api import MockAPIServer
+from agents.server import AgentServer, PoolConfig
+
+
+def _server(base_url: str, **kwargs) -> AgentServer:
+    return AgentServer(
+        system="test",
+        pool=PoolConfig(http2=False),
+        api_key="x",
+        base_url=base_url,
+        **kwargs,
+    )
+
+
+def test_sessions_share_one_pooled_connection():
+    async def run(server: AgentServer) -> None:
+        async with server:
+            for turn in range(2):
+                for user in ("a", "b", "c"):
+                    reply = await server.chat(user, f"turn {turn}")
+                    assert reply.content[0].text == "ok"
+            assert sorted(server.sessions) == ["a", "b", "c"]
+            assert all(
+                server.session(user).client is server.client
+                for user in server.sessions
+            )
+            assert len(server.session("a").history.messages) == 4
+
+    with MockAPIServer(latency=0.0) as api:
+        asyncio.run(run(_server(api.base_url)))
+        assert api.requests == 6
+        assert len(api.peers) == 1
+
+
+def test_concurrent_sessions_stay_within_the_pool():
+    async def run(server: AgentServer) -> None:
+        async with server:
+            await asyncio.gather(
+                *(server.chat(f"user-{i}", "hi") for i in range(8))
+            )
+
+    with MockAPIServer(latency=0.1) as api:
+        server = _server(api.base_url)
+        server.pool.max_connections = 2
+        asyncio.run(run(server))
+        assert api.requests == 8
+        assert len(api.peers) == 2
+
+
+def test_close_drops_sessions_and_closes_the_client():
+    async def run(server: AgentServer):
+        await server.start()
+        await server.chat("a", "hi")
+        http_client = server.client._client
+        await server.close()
+        return http_client
+
+    with MockAPIServer(latency=0.0) as api:
+        server = _server(api.base_url)
+        http_client = asyncio.run(run(server))
+
+    assert http_client.is_closed
+    assert server.client is None
+    assert server.sessions == []
+    with pytest.raises(RuntimeError, match="not been started"):
+        server.session("a")
+
+
+def test_idle_sessions_are_evicted():
+    async def run(server: AgentServer) -> None:
+        async with server:
+            await server.chat("old", "hi")
+            await asyncio.sleep(0.1)
+            await server.chat("new", "hi")
+            assert server.sessions == ["new"]
+
+    with MockAPIServer(latency=0.0) as api:
+        asyncio.run(run(_server(api.base_url, session_ttl=0.05)))
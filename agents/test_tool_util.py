@@ -0,0 +1,318 @@
+"""Offline tests for tool scheduling and result caching."""
+
+import asyncio
+from types import SimpleNamespace
+
+from agents.tools.base import Tool
+from agents.tools.file_tools import FileReadTool, FileWriteTool
+from agents.utils.result_cache import ToolResultCache
+from agents.utils.tool_util import ToolDispatcher, ToolScheduler, execute_tools
+
+
+class SleepTool(Tool):
+    """Sleeps for the requested time and tracks peak concurrency."""
+
+    def __init__(self, name: str = "sleep"):
+        super().__init__(
+            name=name,
+            description="Sleep for a while.",
+            input_schema={"type": "object"},
+        )
+        self.running = 0
+        self.peak = 0
+
+    async def execute(self, seconds: float) -> str:
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self.running -= 1
+        return f"slept {seconds}"
+
+
+def _calls(name: str, *durations: float) -> list[SimpleNamespace]:
+    return [
+        SimpleNamespace(id=f"toolu_{i}", name=name, input={"seconds": d})
+        for i, d in enumerate(durations)
+    ]
+
+
+def test_global_limit_caps_concurrency():
+    tool = SleepTool()
+    scheduler = ToolScheduler(max_concurrency=3)
+    results = asyncio.run(
+        execute_tools(
+            _calls("sleep", *[0.01] * 10), {"sleep": tool}, scheduler=scheduler
+        )
+    )
+    assert tool.peak == 3
+    assert [r["tool_use_id"] for r in results] == [
+        f"toolu_{i}" for i in range(10)
+    ]
+    assert not any(r.get("is_error") for r in results)
+
+
+def test_per_tool_limit():
+    tool = SleepTool()
+    scheduler = ToolScheduler(tool_limits={"sleep": 2})
+    asyncio.run(scheduler.run(_calls("sleep", *[0.01] * 6), {"sleep": tool}))
+    assert tool.peak == 2
+
+
+def test_shared_scheduler_works_across_event_loops():
+    tool = SleepTool()
+    scheduler = ToolScheduler(max_concurrency=1, tool_limits={"sleep": 1})
+    for _ in range(2):
+        # Contended semaphores bind to the loop of each asyncio.run
+        results = asyncio.run(
+            scheduler.run(_calls("sleep", 0.01, 0.01), {"sleep": tool})
+        )
+        assert not any(r.get("is_error") for r in results)
+    assert tool.peak == 1
+
+def test_hung_tool_times_out_without_blocking_others():
+    tool = SleepTool()
+    scheduler = ToolScheduler(tool_timeouts={"sleep": 0.05})
+    results = asyncio.run(
+        scheduler.run(_calls("sleep", 0.01, 10.0), {"sleep": tool})
+    )
+    assert results[0]["content"] == "slept 0.01"
+    assert results[1]["is_error"]
+    assert "timed out" in results[1]["content"]
+
+
+def test_turn_deadline_returns_partial_results():
+    tool = SleepTool()
+    scheduler = ToolScheduler(turn_timeout=0.05)
+    results = asyncio.run(
+        scheduler.run(_calls("sleep", 0.01, 10.0, 10.0), {"sleep": tool})
+    )
+    assert not results[0].get("is_error")
+    assert all(r["is_error"] for r in results[1:])
+    assert "turn deadline" in results[1]["content"]
+
+
+def test_calls_waiting_on_a_tool_limit_leave_global_slots_free():
+    slow, fast = SleepTool("slow"), SleepTool("fast")
+    scheduler = ToolScheduler(max_concurrency=2, tool_limits={"slow": 1})
+    calls = _calls("slow", *[0.05] * 5) + [
+        SimpleNamespace(id="toolu_fast", name="fast", input={"seconds": 0})
+    ]
+
+    async def run():
+        tools = {"slow": slow, "fast": fast}
+        tasks = [scheduler.submit(call, tools) for call in calls]
+        await asyncio.wait_for(asyncio.shield(tasks[-1]), 0.04)
+        return await scheduler.gather(calls, tasks)
+
+    results = asyncio.run(run())
+    assert not any(r.get("is_error") for r in results)
+    assert slow.peak == 1
+
+
+def test_cancel_reports_cancelled_calls():
+    tool = SleepTool()
+    calls = _calls("sleep", 10.0, 10.0)
+    other = SleepTool()
+    scheduler = ToolScheduler()
+
+    async def run():
+        dispatcher = ToolDispatcher({"sleep": tool}, scheduler)
+        # Another agent's call on the same scheduler
+        untouched = scheduler.submit(_calls("sleep", 0.05)[0], {"sleep": other})
+        for call in calls:
+            dispatcher.submit(call)
+        await asyncio.sleep(0.01)
+        dispatcher.cancel()
+        return await dispatcher.results(calls), await untouched
+
+    results, other_result = asyncio.run(run())
+    assert all("cancelled" in r["content"] for r in results)
+    assert tool.running == 0
+    assert other_result["content"] == "slept 0.05"
+
+
+def test_dispatcher_starts_each_call_once_and_fills_in_missed_ones():
+    tool = SleepTool()
+    calls = _calls("sleep", 0.05, 0.01, 0.01)
+
+    async def run():
+        dispatcher = ToolDispatcher({"sleep": tool})
+        dispatcher.submit(calls[0])
+        dispatcher.submit(calls[0])
+        await asyncio.sleep(0.01)
+        assert (dispatcher.dispatched, tool.running) == (1, 1)
+        return await dispatcher.results(calls)
+
+    results = asyncio.run(run())
+    assert [r["tool_use_id"] for r in results] == ["toolu_0", "toolu_1", "toolu_2"]
+    assert [r["content"] for r in results] == ["slept 0.05", "slept 0.01", "slept 0.01"]
+
+class CountingTool(Tool):
+    def __init__(self):
+        super().__init__(
+            name="double",
+            description="Double a number.",
+            input_schema={"type": "object"},
+        )
+        self.calls = 0
+
+    async def execute(self, x: int, **kwargs) -> str:
+        self.calls += 1
+        return str(2 * x)
+
+
+def _call(name: str, **tool_input) -> SimpleNamespace:
+    return SimpleNamespace(id="toolu_0", name=name, input=tool_input)
+
+
+def test_result_cache_is_opt_in():
+    tool = CountingTool()
+    for _ in range(2):
+        asyncio.run(execute_tools([_call("double", x=2)], {"double": tool}))
+    assert tool.calls == 2
+
+
+def test_result_cache_hits_on_equal_input():
+    tool = CountingTool()
+    cache = tool.enable_result_cache()
+    tools = {"double": tool}
+    first = _call("double", x=2, note={"a": 1, "b": 2})
+    asyncio.run(execute_tools([first], tools))
+    results = asyncio.run(
+        execute_tools([_call("double", note={"b": 2, "a": 1}, x=2)], tools)
+    )
+    assert results[0]["content"] == "4"
+    assert tool.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_result_cache_lru_and_ttl():
+    tool = CountingTool()
+    cache = tool.enable_result_cache(max_entries=2)
+    tools = {"double": tool}
+    for x in (1, 2, 3, 1):
+        asyncio.run(execute_tools([_call("double", x=x)], tools))
+    assert tool.calls == 4
+    assert cache.evictions == 2
+
+    expiring = CountingTool()
+    expiring.enable_result_cache(ttl=0)
+    for _ in range(2):
+        asyncio.run(
+            execute_tools([_call("double", x=1)], {"double": expiring})
+        )
+    assert expiring.calls == 2
+
+
+def test_result_cache_hits_skip_the_tool_queue():
+    tool = SleepTool()
+    tool.max_concurrency = 1
+    cache = tool.enable_result_cache()
+    scheduler = ToolScheduler()
+    tools = {"sleep": tool}
+    asyncio.run(scheduler.run(_calls("sleep", 0.01), tools))
+
+    async def run():
+        slow, cached = _calls("sleep", 0.5, 0.01)
+        tasks = [scheduler.submit(slow, tools), scheduler.submit(cached, tools)]
+        hit = await asyncio.wait_for(asyncio.shield(tasks[1]), 0.2)
+        await asyncio.wait(tasks)
+        return hit
+
+    assert asyncio.run(run())["content"] == "slept 0.01"
+    assert cache.hits == 1
+
+
+def test_result_cache_skips_only_failed_calls():
+    cache = ToolResultCache()
+    key = ("tool", "{}", ())
+    cache.store(key, "Errors found: 0")
+    cache.store(("tool", "[]", ()), "boom", is_error=True)
+    tool = SimpleNamespace(name="tool", cache_dependencies=lambda **kwargs: [])
+    assert cache.lookup(tool, {}) == (key, "Errors found: 0")
+    assert len(cache) == 1
+
+
+def test_file_read_cache_invalidated_by_mtime(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("first")
+    tool = FileReadTool()
+    cache = tool.enable_result_cache()
+    tools = {"file_read": tool}
+    call = _call("file_read", operation="read", path=str(path))
+
+    assert asyncio.run(execute_tools([call], tools))[0]["content"] == "first"
+    assert asyncio.run(execute_tools([call], tools))[0]["content"] == "first"
+    assert cache.hits == 1
+
+    path.write_text("second, longer")
+    assert asyncio.run(execute_tools([call], tools))[0]["content"] == (
+        "second, longer"
+    )
+    assert cache.invalidations == 1
+
+
+class EffectTool(Tool):
+    """Sleeps, declaring the effect given in its input."""
+
+    def __init__(self, log: list[str]):
+        super().__init__(
+            name="touch",
+            description="Touch a resource.",
+            input_schema={"type": "object"},
+        )
+        self.log = log
+
+    def effects(self, mode: str, key: str, **kwargs) -> list[tuple]:
+        return [(mode, key)]
+
+    async def execute(self, mode: str, key: str, label: str) -> str:
+        self.log.append(f"start {label}")
+        await asyncio.sleep(0.02)
+        self.log.append(f"end {label}")
+        return label
+
+
+def _touch(label: str, mode: str, key: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=f"toolu_{label}",
+        name="touch",
+        input={"mode": mode, "key": key, "label": label},
+    )
+
+
+def test_conflicting_calls_run_in_order():
+    log = []
+    calls = [
+        _touch("write", "write", "file:/a/b.txt"),
+        _touch("read", "read", "file:/a/b.txt"),
+        _touch("other", "read", "file:/c.txt"),
+        _touch("list", "read", "file:/a"),
+    ]
+    asyncio.run(execute_tools(calls, {"touch": EffectTool(log)}))
+    assert log.index("end write") < log.index("start read")
+    assert log.index("end write") < log.index("start list")
+    # Unrelated and read-only calls still overlap
+    assert log.index("start other") < log.index("end write")
+    assert log.index("start list") < log.index("end read")
+
+
+def test_write_then_read_same_file(tmp_path):
+    path = str(tmp_path / "out.txt")
+    calls = [
+        SimpleNamespace(
+            id="toolu_0",
+            name="file_write",
+            input={"operation": "write", "path": path, "content": "hello"},
+        ),
+        SimpleNamespace(
+            id="toolu_1",
+            name="file_read",
+            input={"operation": "read", "path": path},
+        ),
+    ]
+    tools = {"file_write": FileWriteTool(), "file_read": FileReadTool()}
+    results = asyncio.run(execute_tools(calls, tools))
+    assert results[1]["content"] == "hello"
@@ -0,0 +1,128 @@
+"""Offline tests for agent tracing."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from anthropic import AsyncAnthropic
+from anthropic.types import Message
+
+from agents.agent import Agent
+from agents.benchmarks.mock_api import (
+    MockAPIServer,
+    text_response,
+    tool_round_trip,
+    tool_use_response,
+)
+from agents.tools.think import ThinkTool
+from agents.utils.tracing import (
+    JSONLExporter,
+    RingBufferExporter,
+    Tracer,
+    current_span,
+    span,
+)
+
+
+class ScriptedMessages:
+    """Sync messages API returning one tool call, then a final answer."""
+
+    def __init__(self):
+        self.requests = 0
+
+    def create(self, **request):
+        self.requests += 1
+        if self.requests == 1:
+            calls = [("think", {"thought": "a"}), ("think", {"thought": "b"})]
+            response = tool_use_response(request, calls)
+        else:
+            response = text_response(request, "done")
+        response["usage"]["cache_read_input_tokens"] = 30
+        return Message.model_validate(response)
+
+
+def test_agent_run_emits_nested_spans(tmp_path):
+    ring = RingBufferExporter()
+    path = tmp_path / "trace.jsonl"
+    tracer = Tracer([ring, JSONLExporter(str(path))])
+    agent = Agent(
+        name="traced",
+        system="test",
+        tools=[ThinkTool()],
+        client=SimpleNamespace(messages=ScriptedMessages()),
+        tracer=tracer,
+    )
+    agent.run("hello")
+    tracer.shutdown()
+
+    (run,) = ring.spans("agent.run")
+    turns = ring.spans("agent.turn")
+    requests = ring.spans("llm.request")
+    tools = ring.spans("tool.execute")
+    assert [t.attributes["turn"] for t in turns] == [1, 2]
+    assert all(t.parent_id == run.span_id for t in turns)
+    assert {s.trace_id for s in ring.spans()} == {run.trace_id}
+
+    assert requests[0].parent_id == turns[0].span_id
+    assert requests[0].attributes["tool_calls"] == 2
+    assert requests[0].attributes["cache_read_input_tokens"] == 30
+    assert requests[1].attributes["stop_reason"] == "end_turn"
+    assert len(tools) == 2
+    assert all(t.parent_id == turns[0].span_id for t in tools)
+    assert all(t.attributes["is_error"] is False for t in tools)
+    assert all(s.duration >= 0 for s in ring.spans())
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(lines) == len(ring.spans())
+    assert lines[-1]["name"] == "agent.run"
+    assert lines[-1]["parent_span_id"] is None
+
+
+def test_streamed_tool_spans_belong_to_the_turn():
+    ring = RingBufferExporter()
+    calls = [("think", {"thought": "a"}), ("think", {"thought": "b"})]
+    with MockAPIServer(
+        latency=0.0, responder=tool_round_trip(calls), block_delay=0.05
+    ) as server:
+        agent = Agent(
+            name="streamed",
+            system="test",
+            tools=[ThinkTool()],
+            client=AsyncAnthropic(base_url=server.base_url, api_key="x"),
+            stream=True,
+            tracer=Tracer([ring]),
+        )
+        agent.run("hello")
+        agent.close()
+
+    assert agent.stream_metrics[0].tools_dispatched_early == 2
+    first_turn = ring.spans("agent.turn")[0]
+    tools = ring.spans("tool.execute")
+    assert len(tools) == 2
+    assert all(t.parent_id == first_turn.span_id for t in tools)
+
+def test_spans_record_errors_and_noop_without_tracer():
+    with span("ignored") as noop:
+        noop.set("key", "value")
+    assert current_span().set("key", "value") is None
+
+    ring = RingBufferExporter(capacity=2)
+    tracer = Tracer([ring])
+
+    async def fail():
+        with tracer.span("outer"):
+            with span("inner"):
+                raise ValueError("boom")
+
+    try:
+        asyncio.run(fail())
+    except ValueError:
+        pass
+    inner, outer = ring.spans()
+    assert inner.parent_id == outer.span_id
+    assert inner.status == "error"
+    assert inner.attributes["error"] == "ValueError: boom"
+
+    with tracer.span("third"):
+        pass
+    assert [s.name for s in ring.spans()] == ["outer", "third"]
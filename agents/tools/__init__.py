@@ -2,6 +2,7 @@
 
 from .base import Tool
 from .code_execution import CodeExecutionServerTool
+from .file_search import FileSearchTool
 from .file_tools import FileReadTool, FileWriteTool
 from .think import ThinkTool
 from .web_search import WebSearchServerTool
@@ -10,6 +11,7 @@ __all__ = [
     "Tool",
     "CodeExecutionServerTool",
     "FileReadTool",
+    "FileSearchTool",
     "FileWriteTool",
     "ThinkTool",
     "WebSearchServerTool",
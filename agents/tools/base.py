@@ -1,7 +1,19 @@
 """Base tool definitions for the agent framework."""
 
 from dataclasses import dataclass
-from typing import Any
+from typing import TYPE_CHECKING, Any, ClassVar
+
+if TYPE_CHECKING:
+    from ..utils.result_cache import ToolResultCache
+
+# Effect modes; calls conflict when they touch overlapping resources and
+# at least one of them writes. Keys are hierarchical: "file:/a" overlaps
+# "file:/a/b.txt". The key "*" overlaps every key.
+READ = "read"
+WRITE = "write"
+ALL_RESOURCES = "*"
+
+Effect = tuple[str, str]
 
 
 @dataclass
@@ -12,6 +24,12 @@ class Tool:
     description: str
     input_schema: dict[str, Any]
 
+    # Scheduling hints for ToolScheduler; None uses the scheduler defaults
+    timeout: ClassVar[float | None] = None
+    max_concurrency: ClassVar[int | None] = None
+    # Set by enable_result_cache; results are memoized only when present
+    result_cache: ClassVar["ToolResultCache | None"] = None
+
     def to_dict(self) -> dict[str, Any]:
         """Convert tool to Claude API format."""
         return {
@@ -20,6 +38,42 @@ class Tool:
             "input_schema": self.input_schema,
         }
 
+    def enable_result_cache(
+        self,
+        cache: "ToolResultCache | None" = None,
+        ttl: float | None = None,
+        max_entries: int = 256,
+    ) -> "ToolResultCache":
+        """Memoize this tool's results.
+
+        Only enable this for tools whose result depends solely on their
+        input and on the files named by cache_dependencies.
+
+        Args:
+            cache: Cache to use, e.g. one shared with other tools
+            ttl: Seconds a result stays valid when creating a new cache
+            max_entries: Size of a newly created cache
+        """
+        if cache is None:
+            from ..utils.result_cache import ToolResultCache
+
+            cache = ToolResultCache(max_entries=max_entries, ttl=ttl)
+        self.result_cache = cache
+        return cache
+
+    def effects(self, **kwargs) -> list[Effect]:
+        """Resources this call reads or writes, as (mode, key) pairs.
+
+        Conflicting calls in one turn run in the order the model made
+        them; the rest run concurrently. Tools that declare nothing are
+        treated as independent of every other call.
+        """
+        return []
+
+    def cache_dependencies(self, **kwargs) -> list[str]:
+        """Files whose changes invalidate a cached result for this input."""
+        return []
+
     async def execute(self, **kwargs) -> str:
         """Execute the tool with provided parameters."""
         raise NotImplementedError(
@@ -0,0 +1,186 @@
+"""Content search tool backed by a trigram index."""
+
+import asyncio
+import re
+from pathlib import Path
+
+from ..utils.listing import translate_pattern
+from ..utils.search_index import (
+    Match,
+    default_index_dir,
+    get_search_index,
+    required_literals,
+)
+from .base import READ, Effect, Tool
+from .file_tools import _file_key
+
+# Longest line shown in results
+MAX_LINE_CHARS = 300
+
+
+class FileSearchTool(Tool):
+    """Tool for searching file contents under a directory."""
+
+    def __init__(self, index_dir: str | None = None):
+        """Initialize the tool.
+
+        Args:
+            index_dir: Where search indexes are persisted between runs;
+                       defaults to ~/.cache/agents/search
+        """
+        super().__init__(
+            name="file_search",
+            description="""
+            Search the contents of every file under a directory, like grep.
+            Returns matching lines with their line numbers and surrounding
+            context, files with the most matches first. Files excluded by
+            .gitignore are not searched.
+            """,
+            input_schema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Text or regular expression to find",
+                    },
+                    "path": {
+                        "type": "string",
+                        "description": "Directory to search",
+                    },
+                    "regex": {
+                        "type": "boolean",
+                        "description": "Treat query as a regular expression",
+                    },
+                    "ignore_case": {
+                        "type": "boolean",
+                        "description": "Match case-insensitively",
+                    },
+                    "include": {
+                        "type": "string",
+                        "description": "Only search files matching this "
+                        "pattern, e.g. **/*.py",
+                    },
+                    "context": {
+                        "type": "integer",
+                        "description": "Lines of context around each match",
+                    },
+                    "max_results": {
+                        "type": "integer",
+                        "description": "Maximum matching lines to return",
+                    },
+                },
+                "required": ["query", "path"],
+            },
+        )
+        self.index_dir = index_dir or default_index_dir()
+
+    def effects(self, path: str = "", **kwargs) -> list[Effect]:
+        return [(READ, _file_key(path))]
+
+    async def execute(
+        self,
+        query: str,
+        path: str,
+        regex: bool = False,
+        ignore_case: bool = False,
+        include: str | None = None,
+        context: int = 2,
+        max_results: int = 50,
+    ) -> str:
+        """Search file contents.
+
+        Args:
+            query: Text or regular expression to find
+            path: Directory to search
+            regex: Whether query is a regular expression
+            ignore_case: Match case-insensitively
+            include: Glob pattern limiting the files searched
+            context: Lines of context around each match
+            max_results: Maximum matching lines to return
+
+        Returns:
+            Matches grouped by file, as string
+        """
+        try:
+            root = Path(path)
+            if not root.exists():
+                return f"Error: Directory not found at {path}"
+            if not root.is_dir():
+                return f"Error: {path} is not a directory"
+            if not query:
+                return "Error: query must not be empty"
+
+            pattern = query if regex else re.escape(query)
+            # Matched line by line; MULTILINE keeps ^ and $ meaning the same
+            # when a whole file is checked first
+            flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+            try:
+                compiled = re.compile(pattern, flags)
+            except re.error as e:
+                return f"Error: Invalid regular expression: {e}"
+            literals = required_literals(query) if regex else [query]
+            if ignore_case:
+                # The index only folds ASCII case
+                literals = [lit for lit in literals if lit.isascii()]
+            include_regex = None
+            if include:
+                include_regex = re.compile(translate_pattern(include) + "$")
+
+            index = get_search_index(path, self.index_dir)
+            await asyncio.to_thread(index.update)
+            matches = await asyncio.to_thread(
+                index.search, compiled, literals, include_regex, context
+            )
+            return self._format(
+                query, path, compiled, matches, context, max_results
+            )
+        except Exception as e:
+            return f"Error searching {path}: {str(e)}"
+
+    def _format(
+        self,
+        query: str,
+        path: str,
+        compiled: re.Pattern,
+        matches: list[Match],
+        context: int,
+        max_results: int,
+    ) -> str:
+        if not matches:
+            return f"No matches for {query!r} in {path}"
+
+        # Files whose name matches rank first, then by number of matches
+        matches.sort(
+            key=lambda m: (
+                not compiled.search(Path(m.path).name),
+                -len(m.lines),
+                m.path,
+            )
+        )
+        total = sum(len(m.lines) for m in matches)
+        shown = 0
+        output = []
+        for match in matches:
+            if shown >= max_results:
+                break
+            lines = match.lines[: max_results - shown]
+            shown += len(lines)
+            output.append(match.path)
+            wanted = set(lines)
+            previous = None
+            for number in sorted(match.text):
+                # Skip the context of matches cut off by max_results
+                if not any(abs(number - line) <= context for line in lines):
+                    continue
+                if previous is not None and number > previous + 1:
+                    output.append("  --")
+                separator = ":" if number in wanted else "-"
+                text = match.text[number][:MAX_LINE_CHARS]
+                output.append(f"  {number}{separator} {text}")
+                previous = number
+            output.append("")
+
+        summary = f"{total} matches in {len(matches)} files"
+        if shown < total:
+            summary += f" (showing {shown})"
+        return summary + "\n\n" + "\n".join(output).rstrip()
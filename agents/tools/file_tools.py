@@ -1,11 +1,46 @@
 """File operation tools for reading and writing files."""
 
 import asyncio
-import glob
 import os
 from pathlib import Path
 
-from .base import Tool
+from ..utils.file_util import (
+    atomic_writer,
+    open_text,
+    read_range,
+    sniff,
+    stream_edit,
+)
+from ..utils.listing import default_cache, list_directory
+from .base import READ, WRITE, Effect, Tool
+
+
+# Entries returned by one list call unless a limit is given
+LIST_LIMIT = 500
+# Match positions reported per edit
+MAX_REPORTED_LINES = 20
+
+
+def _file_key(path: str) -> str:
+    return f"file:{os.path.abspath(path)}"
+
+
+def _encode_like(path: str, content: str) -> bytes:
+    """Encode content for a file, keeping an existing text file's encoding.
+
+    New files, binary files being replaced, and content the existing
+    encoding cannot represent are written as UTF-8.
+    """
+    try:
+        kind = sniff(path)
+    except OSError:
+        return content.encode("utf-8")
+    if kind.binary or kind.encoding is None:
+        return content.encode("utf-8")
+    try:
+        return kind.bom + content.encode(kind.encoding)
+    except UnicodeEncodeError:
+        return content.encode("utf-8")
 
 
 class FileReadTool(Tool):
@@ -18,8 +53,13 @@ class FileReadTool(Tool):
             Read files or list directory contents.
 
             Operations:
-            - read: Read the contents of a file
-            - list: List files in a directory
+            - read: Read the contents of a file, optionally only a line
+              range (start_line/end_line), the last lines (tail) or a
+              byte range (offset/length) of a large file. Binary files
+              are summarized instead; a byte range of one is hex dumped
+            - list: List files in a directory. Patterns may use ** to
+              recurse; entries excluded by .gitignore are skipped and
+              long listings are paged with cursor
             """,
             input_schema={
                 "type": "object",
@@ -37,21 +77,81 @@ class FileReadTool(Tool):
                         "type": "integer",
                         "description": "Maximum lines to read (0 means no limit)",
                     },
+                    "start_line": {
+                        "type": "integer",
+                        "description": "First line to read, starting at 1",
+                    },
+                    "end_line": {
+                        "type": "integer",
+                        "description": "Last line to read (inclusive)",
+                    },
+                    "tail": {
+                        "type": "integer",
+                        "description": "Read only the last N lines",
+                    },
+                    "offset": {
+                        "type": "integer",
+                        "description": "Byte offset to start reading at",
+                    },
+                    "length": {
+                        "type": "integer",
+                        "description": "Number of bytes to read from offset",
+                    },
                     "pattern": {
                         "type": "string",
-                        "description": "File pattern to match",
+                        "description": "File pattern to match, e.g. **/*.py",
+                    },
+                    "max_depth": {
+                        "type": "integer",
+                        "description": "Deepest directory level to list",
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum entries to list",
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": "Cursor from a previous listing",
+                    },
+                    "include_ignored": {
+                        "type": "boolean",
+                        "description": "Also list entries ignored by git",
                     },
                 },
                 "required": ["operation", "path"],
             },
         )
 
+    def effects(self, path: str = "", **kwargs) -> list[Effect]:
+        # A listing reads the directory and so everything below it
+        return [(READ, _file_key(path))]
+
+    def cache_dependencies(
+        self, path: str = "", operation: str = "read", **kwargs
+    ) -> list[str]:
+        if operation == "list":
+            # Entries changing updates a directory's mtime; recursive
+            # listings also depend on the subdirectories they walked
+            root = os.path.abspath(path)
+            below = default_cache.directories_under(root)
+            return [root, *(d for d in below if d != root)]
+        return [path]
+
     async def execute(
         self,
         operation: str,
         path: str,
         max_lines: int = 0,
         pattern: str = "*",
+        start_line: int | None = None,
+        end_line: int | None = None,
+        tail: int | None = None,
+        offset: int | None = None,
+        length: int | None = None,
+        max_depth: int | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        include_ignored: bool = False,
     ) -> str:
         """Execute a file read operation.
 
@@ -60,14 +160,30 @@ class FileReadTool(Tool):
             path: The file or directory path
             max_lines: Maximum lines to read (for read operation, 0 means no limit)
             pattern: File pattern to match (for list operation)
+            start_line: First line to read, 1-based (for read operation)
+            end_line: Last line to read, inclusive (for read operation)
+            tail: Read the last N lines (for read operation)
+            offset: Byte offset to start at (for read operation)
+            length: Bytes to read from offset (for read operation)
+            max_depth: Deepest directory level to list (for list operation)
+            limit: Maximum entries to list (for list operation)
+            cursor: Resume after this entry (for list operation)
+            include_ignored: List git-ignored entries (for list operation)
 
         Returns:
             Result of the operation as string
         """
         if operation == "read":
+            ranged = (start_line, end_line, tail, offset, length)
+            if any(value is not None for value in ranged):
+                return await self._read_range(
+                    path, max_lines, start_line, end_line, tail, offset, length
+                )
             return await self._read_file(path, max_lines)
         elif operation == "list":
-            return await self._list_files(path, pattern)
+            return await self._list_files(
+                path, pattern, max_depth, limit, cursor, include_ignored
+            )
         else:
             return f"Error: Unsupported operation '{operation}'"
 
@@ -87,7 +203,10 @@ class FileReadTool(Tool):
                 return f"Error: {path} is not a file"
 
             def read_sync():
-                with open(file_path, encoding="utf-8", errors="replace") as f:
+                kind = sniff(path)
+                if kind.binary:
+                    return kind.summary(path)
+                with open_text(path, kind) as f:
                     if max_lines > 0:
                         lines = []
                         for i, line in enumerate(f):
@@ -101,7 +220,52 @@ class FileReadTool(Tool):
         except Exception as e:
             return f"Error reading {path}: {str(e)}"
 
-    async def _list_files(self, directory: str, pattern: str = "*") -> str:
+    async def _read_range(
+        self,
+        path: str,
+        max_lines: int,
+        start_line: int | None,
+        end_line: int | None,
+        tail: int | None,
+        offset: int | None,
+        length: int | None,
+    ) -> str:
+        """Read part of a file through a memory map.
+
+        Line ranges use a per-file line index kept between calls, so
+        paging through a large file does not rescan it from the start.
+        """
+        try:
+            file_path = Path(path)
+
+            if not file_path.exists():
+                return f"Error: File not found at {path}"
+            if not file_path.is_file():
+                return f"Error: {path} is not a file"
+            if start_line is not None and max_lines > 0 and end_line is None:
+                end_line = start_line + max_lines - 1
+
+            return await asyncio.to_thread(
+                read_range,
+                path,
+                offset=offset,
+                length=length,
+                start_line=start_line,
+                end_line=end_line,
+                tail=tail,
+            )
+        except Exception as e:
+            return f"Error reading {path}: {str(e)}"
+
+    async def _list_files(
+        self,
+        directory: str,
+        pattern: str = "*",
+        max_depth: int | None = None,
+        limit: int | None = None,
+        cursor: str | None = None,
+        include_ignored: bool = False,
+    ) -> str:
         """List files in a directory."""
         try:
             dir_path = Path(directory)
@@ -112,22 +276,28 @@ class FileReadTool(Tool):
                 return f"Error: {directory} is not a directory"
 
             def list_sync():
-                search_pattern = f"{directory}/{pattern}"
-                files = glob.glob(search_pattern)
+                listing = list_directory(
+                    directory,
+                    pattern,
+                    max_depth=max_depth,
+                    respect_gitignore=not include_ignored,
+                    limit=LIST_LIMIT if limit is None else limit,
+                    cursor=cursor,
+                )
 
-                if not files:
+                if not listing.entries:
                     return f"No files found matching {directory}/{pattern}"
 
-                file_list = []
-                for file_path in sorted(files):
-                    path_obj = Path(file_path)
-                    rel_path = str(file_path).replace(str(dir_path) + "/", "")
-
-                    if path_obj.is_dir():
-                        file_list.append(f"📁 {rel_path}/")
-                    else:
-                        file_list.append(f"📄 {rel_path}")
-
+                file_list = [
+                    f"📁 {rel_path}/" if is_dir else f"📄 {rel_path}"
+                    for rel_path, is_dir in listing.entries
+                ]
+                if listing.next_cursor is not None:
+                    file_list.append(
+                        f"[Showing {len(listing.entries)} of {listing.total} "
+                        f'entries; pass cursor="{listing.next_cursor}" '
+                        "for more]"
+                    )
                 return "\n".join(file_list)
 
             return await asyncio.to_thread(list_sync)
@@ -146,7 +316,9 @@ class FileWriteTool(Tool):
 
             Operations:
             - write: Create or completely replace a file
-            - edit: Make targeted changes to parts of a file
+            - edit: Make targeted changes to parts of a file. Several
+              changes to one file can be passed together as edits; they
+              are applied all at once or not at all
             """,
             input_schema={
                 "type": "object",
@@ -170,20 +342,39 @@ class FileWriteTool(Tool):
                     },
                     "new_text": {
                         "type": "string",
-                        "description": "Replacement text (for edit operation)",
+                        "description": "Replacement text, empty to delete "
+                        "(for edit operation)",
+                    },
+                    "edits": {
+                        "type": "array",
+                        "description": "Several replacements to apply "
+                        "together (for edit operation)",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "old_text": {"type": "string"},
+                                "new_text": {"type": "string"},
+                            },
+                            "required": ["old_text", "new_text"],
+                        },
                     },
                 },
                 "required": ["operation", "path"],
             },
         )
 
+    def effects(self, path: str = "", **kwargs) -> list[Effect]:
+        # Also orders the write against listings of enclosing directories
+        return [(WRITE, _file_key(path))]
+
     async def execute(
         self,
         operation: str,
         path: str,
         content: str = "",
         old_text: str = "",
-        new_text: str = "",
+        new_text: str | None = None,
+        edits: list[dict[str, str]] | None = None,
     ) -> str:
         """Execute a file write operation.
 
@@ -192,7 +383,9 @@ class FileWriteTool(Tool):
             path: The file path
             content: Content to write (for write operation)
             old_text: Text to replace (for edit operation)
-            new_text: Replacement text (for edit operation)
+            new_text: Replacement text, empty to delete (for edit operation)
+            edits: old_text/new_text pairs applied in one transaction
+                   (for edit operation)
 
         Returns:
             Result of the operation as string
@@ -202,12 +395,20 @@ class FileWriteTool(Tool):
                 return "Error: content parameter is required"
             return await self._write_file(path, content)
         elif operation == "edit":
-            if not old_text or not new_text:
+            if not edits:
+                edits = [{"old_text": old_text, "new_text": new_text}]
+            # Same rule for one edit and a batch: old_text must be
+            # non-empty, new_text must be given but may be empty
+            if not all(
+                edit.get("old_text") and edit.get("new_text") is not None
+                for edit in edits
+            ):
                 return (
-                    "Error: both old_text and new_text parameters "
-                    "are required for edit operation"
+                    "Error: both old_text and new_text parameters are "
+                    "required for edit operation (old_text non-empty)"
                 )
-            return await self._edit_file(path, old_text, new_text)
+            pairs = [(edit["old_text"], edit["new_text"]) for edit in edits]
+            return await self._edit_file(path, pairs)
         else:
             return f"Error: Unsupported operation '{operation}'"
 
@@ -218,8 +419,8 @@ class FileWriteTool(Tool):
             os.makedirs(file_path.parent, exist_ok=True)
 
             def write_sync():
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
+                with atomic_writer(str(file_path)) as f:
+                    f.write(_encode_like(path, content))
                 return (
                     f"Successfully wrote {len(content)} "
                     f"characters to {path}"
@@ -229,8 +430,15 @@ class FileWriteTool(Tool):
         except Exception as e:
             return f"Error writing to {path}: {str(e)}"
 
-    async def _edit_file(self, path: str, old_text: str, new_text: str) -> str:
-        """Make targeted changes to a file."""
+    async def _edit_file(
+        self, path: str, edits: list[tuple[str, str]]
+    ) -> str:
+        """Make targeted changes to a file.
+
+        The file is streamed through a temp file that atomically replaces
+        it, so large files are never held in memory and a failed or
+        interrupted edit leaves the original untouched.
+        """
         try:
             file_path = Path(path)
 
@@ -239,39 +447,37 @@ class FileWriteTool(Tool):
             if not file_path.is_file():
                 return f"Error: {path} is not a file"
 
-            def edit_sync():
-                try:
-                    with open(
-                        file_path, encoding="utf-8", errors="replace"
-                    ) as f:
-                        content = f.read()
-
-                    if old_text not in content:
-                        return (
-                            f"Error: The specified text was not "
-                            f"found in {path}"
-                        )
-
-                    # Count occurrences to warn about multiple matches
-                    count = content.count(old_text)
-                    if count > 1:
-                        # Edit with warning about multiple occurrences
-                        new_content = content.replace(old_text, new_text)
-                        with open(file_path, "w", encoding="utf-8") as f:
-                            f.write(new_content)
-                        return (
-                            f"Warning: Found {count} occurrences. "
-                            f"All were replaced in {path}"
-                        )
-                    else:
-                        # One occurrence, straightforward replacement
-                        new_content = content.replace(old_text, new_text)
-                        with open(file_path, "w", encoding="utf-8") as f:
-                            f.write(new_content)
-                        return f"Successfully edited {path}"
-                except UnicodeDecodeError:
-                    return f"Error: {path} appears to be a binary file"
-
-            return await asyncio.to_thread(edit_sync)
+            kind = await asyncio.to_thread(sniff, path)
+            if kind.binary:
+                return f"Error: {path} appears to be a binary file"
+            positions = await asyncio.to_thread(
+                stream_edit, path, edits, encoding=kind.encoding
+            )
+
+            missing = [i for i, lines in enumerate(positions) if not lines]
+            if missing:
+                if len(edits) == 1:
+                    return f"Error: The specified text was not found in {path}"
+                numbers = ", ".join(str(i + 1) for i in missing)
+                return (
+                    f"Error: The text of edit {numbers} was not found in "
+                    f"{path}; no changes were made"
+                )
+
+            reports = []
+            for lines in positions:
+                shown = ", ".join(map(str, lines[:MAX_REPORTED_LINES]))
+                if len(lines) > MAX_REPORTED_LINES:
+                    shown += ", ..."
+                if len(lines) > 1:
+                    reports.append(
+                        f"Warning: Found {len(lines)} occurrences. "
+                        f"All were replaced in {path} (lines {shown})"
+                    )
+                else:
+                    reports.append(
+                        f"Successfully edited {path} (line {shown})"
+                    )
+            return "\n".join(reports)
         except Exception as e:
             return f"Error editing {path}: {str(e)}"
@@ -1,6 +1,39 @@
 """Agent utility modules."""
 
+from .compaction import (
+    BlockClipping,
+    CompactionStrategy,
+    Compactor,
+    DropOldest,
+    Summarization,
+    ToolResultElision,
+)
 from .history_util import MessageHistory
-from .tool_util import execute_tools
+from .result_cache import ToolResultCache
+from .tool_util import ToolDispatcher, ToolScheduler, execute_tools
+from .tracing import (
+    JSONLExporter,
+    OpenTelemetryExporter,
+    RingBufferExporter,
+    SpanExporter,
+    Tracer,
+)
 
-__all__ = ["MessageHistory", "execute_tools"]
+__all__ = [
+    "BlockClipping",
+    "CompactionStrategy",
+    "Compactor",
+    "DropOldest",
+    "JSONLExporter",
+    "MessageHistory",
+    "OpenTelemetryExporter",
+    "RingBufferExporter",
+    "SpanExporter",
+    "Summarization",
+    "ToolDispatcher",
+    "ToolResultCache",
+    "ToolResultElision",
+    "ToolScheduler",
+    "Tracer",
+    "execute_tools",
+]
@@ -0,0 +1,166 @@
+"""Prompt cache breakpoint planning and hit-rate accounting."""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import Any
+
+# The API accepts at most four cache_control markers per request
+MAX_CACHE_BREAKPOINTS = 4
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+@dataclass
+class CachePlan:
+    """Where the cache_control markers of one request go."""
+
+    tools: bool = False
+    system: bool = False
+    messages: tuple[int, ...] = ()
+
+
+class CacheBreakpointPlanner:
+    """Decide where cache_control markers go in a request.
+
+    The prompt is cached in order: tools, system, then messages. Markers
+    are handed out by priority:
+
+    1. The end of the static prefix (the system prompt, or the last tool
+       without one), which stays cached across compactions.
+    2. The newest message, writing this turn's prefix.
+    3. The end of the previous request, the prefix written last turn. The
+       API only looks back 20 blocks from a marker, so turns that add many
+       tool results need this one. Right after a compaction that prefix is
+       gone, and the end of the previously compacted region is read
+       instead.
+    4. The end of the compacted region. Compaction resumes after it, so
+       the prefix up to it survives the next compaction.
+    5. The tool definitions on their own, then older request ends.
+    """
+
+    def __init__(
+        self,
+        max_breakpoints: int = MAX_CACHE_BREAKPOINTS,
+        cache_tools: bool = True,
+        cache_system: bool = True,
+    ):
+        """Initialize the planner.
+
+        Args:
+            max_breakpoints: Total cache_control markers per request
+            cache_tools: Allow a marker on the tool definitions
+            cache_system: Allow a marker on the system prompt
+        """
+        self.max_breakpoints = max_breakpoints
+        self.cache_tools = cache_tools
+        self.cache_system = cache_system
+
+    @staticmethod
+    def request_ends(messages: list[dict[str, Any]]) -> Iterator[int]:
+        """Indices of messages that ended an earlier request, newest first.
+
+        A user message directly followed by an assistant message was the
+        last message of the request that produced that response.
+        """
+        for index in range(len(messages) - 2, -1, -1):
+            if (
+                messages[index]["role"] == "user"
+                and messages[index + 1]["role"] == "assistant"
+            ):
+                yield index
+
+    def plan(
+        self,
+        has_tools: bool,
+        has_system: bool,
+        messages: list[dict[str, Any]],
+        compaction_boundary: int | None = None,
+        previous_boundary: int | None = None,
+    ) -> CachePlan:
+        """Assign markers by priority until the budget is spent."""
+        budget = self.max_breakpoints
+        plan = CachePlan()
+        chosen: list[int] = []
+
+        def take_message(index: int | None) -> None:
+            nonlocal budget
+            if budget and index is not None and index not in chosen:
+                chosen.append(index)
+                budget -= 1
+
+        if budget and self.cache_system and has_system:
+            plan.system = True
+            budget -= 1
+        elif budget and self.cache_tools and has_tools:
+            plan.tools = True
+            budget -= 1
+
+        ends = self.request_ends(messages)
+        if messages:
+            take_message(len(messages) - 1)
+            if previous_boundary is not None:
+                take_message(previous_boundary)
+            else:
+                take_message(next(ends, None))
+            if compaction_boundary is not None:
+                take_message(min(compaction_boundary, len(messages) - 1))
+        if budget and self.cache_tools and has_tools and not plan.tools:
+            plan.tools = True
+            budget -= 1
+        for index in ends:
+            if not budget:
+                break
+            take_message(index)
+
+        plan.messages = tuple(chosen)
+        return plan
+
+
+def with_cache_control(content: Any) -> list[dict[str, Any]]:
+    """Copy content, marking its last block as a cache breakpoint."""
+    if isinstance(content, str):
+        content = [{"type": "text", "text": content}]
+    blocks = [
+        block.model_dump() if hasattr(block, "model_dump") else block
+        for block in content
+    ]
+    if not blocks:
+        return blocks
+    return [*blocks[:-1], {**blocks[-1], "cache_control": EPHEMERAL}]
+
+
+@dataclass
+class CacheStats:
+    """Running totals of cached and uncached input tokens."""
+
+    requests: int = 0
+    input_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    last_hit_rate: float = 0.0
+
+    def record(self, usage: Any) -> None:
+        """Add one response's usage to the totals."""
+        uncached = usage.input_tokens or 0
+        read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        created = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        self.requests += 1
+        self.input_tokens += uncached
+        self.cache_read_input_tokens += read
+        self.cache_creation_input_tokens += created
+        total = uncached + read + created
+        self.last_hit_rate = read / total if total else 0.0
+
+    @property
+    def total_input_tokens(self) -> int:
+        return (
+            self.input_tokens
+            + self.cache_read_input_tokens
+            + self.cache_creation_input_tokens
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of all input tokens that were read from the cache."""
+        total = self.total_input_tokens
+        return self.cache_read_input_tokens / total if total else 0.0
@@ -0,0 +1,374 @@
+"""Token-budget-aware compaction of message history."""
+
+import asyncio
+import json
+import re
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from anthropic import AsyncAnthropic
+
+if TYPE_CHECKING:
+    from .history_util import MessageHistory
+
+ELIDED_PREFIX = "[Tool result elided"
+CLIPPED_MARKER = "\n[... {tokens} tokens clipped ...]\n"
+_CLIPPED_RE = re.compile(r"\n\[\.\.\. \d+ tokens clipped \.\.\.\]\n")
+
+SUMMARY_PROMPT = (
+    "Summarize the conversation below for the assistant that will continue "
+    "it. Keep the user's goals, decisions made, facts discovered, file "
+    "names, identifiers and open tasks. Omit pleasantries. Reply with the "
+    "summary only."
+)
+
+
+def _copy_message(message: dict[str, Any]) -> dict[str, Any]:
+    content = message["content"]
+    if isinstance(content, list):
+        content = [
+            block.model_dump() if hasattr(block, "model_dump") else dict(block)
+            for block in content
+        ]
+    return {"role": message["role"], "content": content}
+
+
+class CompactionStrategy(ABC):
+    """One way of shrinking a history.
+
+    Strategies edit the history in place through replace_message and
+    remove_messages so the token ledger stays consistent, and stop as soon
+    as the history fits `target_tokens`. They leave the newest
+    `keep_recent` messages alone.
+    """
+
+    keep_recent: int = 0
+
+    @abstractmethod
+    async def apply(self, history: "MessageHistory", target_tokens: int) -> int:
+        """Compact the history towards the target. Returns tokens saved."""
+
+    def _candidates(self, history: "MessageHistory") -> range:
+        return range(max(0, len(history.messages) - self.keep_recent))
+
+
+class ToolResultElision(CompactionStrategy):
+    """Replace the content of old tool results with a short placeholder.
+
+    The tool_result blocks and their tool_use_id are kept, so every
+    tool_use still has a matching result.
+    """
+
+    def __init__(self, keep_recent: int = 4, min_tokens: int = 50):
+        """Initialize the strategy.
+
+        Args:
+            keep_recent: Number of newest messages to leave untouched
+            min_tokens: Only elide results estimated above this size
+        """
+        self.keep_recent = keep_recent
+        self.min_tokens = min_tokens
+
+    async def apply(self, history: "MessageHistory", target_tokens: int) -> int:
+        saved = 0
+        estimator = history.token_estimator
+        for index in self._candidates(history):
+            if history.estimated_total_tokens <= target_tokens:
+                break
+            message = history.messages[index]
+            if message["role"] != "user" or isinstance(message["content"], str):
+                continue
+
+            changed = False
+            compacted = _copy_message(message)
+            for block in compacted["content"]:
+                if block.get("type") != "tool_result":
+                    continue
+                content = block.get("content", "")
+                tokens = estimator.estimate_content(content)
+                if tokens < self.min_tokens:
+                    continue
+                if isinstance(content, str) and content.startswith(
+                    ELIDED_PREFIX
+                ):
+                    continue
+                block["content"] = (
+                    f"{ELIDED_PREFIX} to save context: ~{tokens} tokens]"
+                )
+                changed = True
+            if changed:
+                saved += history.replace_message(index, compacted)
+        return saved
+
+
+class BlockClipping(CompactionStrategy):
+    """Clip large text blocks, keeping their beginning and end."""
+
+    def __init__(
+        self,
+        max_block_tokens: int = 2000,
+        keep_recent: int = 2,
+        head_fraction: float = 0.7,
+    ):
+        """Initialize the strategy.
+
+        Args:
+            max_block_tokens: Size a text block is clipped down to
+            keep_recent: Number of newest messages to leave untouched
+            head_fraction: Share of the kept text taken from the start
+        """
+        self.max_block_tokens = max_block_tokens
+        self.keep_recent = keep_recent
+        self.head_fraction = head_fraction
+
+    def _clip(self, text: str, tokens: int, estimator) -> str:
+        # Leave room for the marker (and rounding), so the clipped block
+        # is within the limit and is not clipped again
+        marker = CLIPPED_MARKER.format(tokens=tokens)
+        reserved = estimator.estimate_text(marker) + 1
+        keep_tokens = max(self.max_block_tokens - reserved, 0)
+        keep_chars = int(len(text) * keep_tokens / tokens)
+        head = int(keep_chars * self.head_fraction)
+        tail = keep_chars - head
+        marker = CLIPPED_MARKER.format(tokens=tokens - keep_tokens)
+        return text[:head] + marker + (text[-tail:] if tail else "")
+
+    def _clip_blocks(self, blocks: list[dict[str, Any]], estimator) -> bool:
+        changed = False
+        for block in blocks:
+            if block.get("type") == "tool_result":
+                content = block.get("content")
+                if isinstance(content, list):
+                    changed |= self._clip_blocks(content, estimator)
+                    continue
+                field = "content"
+            elif block.get("type") == "text":
+                field = "text"
+            else:
+                continue
+            text = block.get(field)
+            if not isinstance(text, str) or _CLIPPED_RE.search(text):
+                # Clipping again would only lose more of the same block
+                continue
+            tokens = estimator.estimate_text(text)
+            if tokens > self.max_block_tokens:
+                block[field] = self._clip(text, tokens, estimator)
+                changed = True
+        return changed
+
+    async def apply(self, history: "MessageHistory", target_tokens: int) -> int:
+        saved = 0
+        for index in self._candidates(history):
+            if history.estimated_total_tokens <= target_tokens:
+                break
+            message = history.messages[index]
+            if isinstance(message["content"], str):
+                continue
+            compacted = _copy_message(message)
+            for block in compacted["content"]:
+                content = block.get("content")
+                if isinstance(content, list):
+                    block["content"] = [dict(b) for b in content]
+            if self._clip_blocks(compacted["content"], history.token_estimator):
+                saved += history.replace_message(index, compacted)
+        return saved
+
+
+class Summarization(CompactionStrategy):
+    """Fold the oldest messages into a summary written by a cheaper model.
+
+    The summary becomes the first user message and is followed by an
+    assistant message, so alternation and tool_use/tool_result pairing are
+    preserved.
+    """
+
+    def __init__(
+        self,
+        client: Any = None,
+        model: str = "claude-haiku-4-5-20251001",
+        max_tokens: int = 1024,
+        keep_recent: int = 6,
+    ):
+        """Initialize the strategy.
+
+        Args:
+            client: Anthropic or AsyncAnthropic client (defaults to the
+                    history's client)
+            model: Model used to write summaries
+            max_tokens: Maximum length of a summary
+            keep_recent: Number of newest messages to leave untouched
+        """
+        self.client = client
+        self.model = model
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+
+    def _split_point(
+        self, history: "MessageHistory", target_tokens: int
+    ) -> int:
+        """Smallest prefix whose removal reaches the target.
+
+        The prefix always ends right before an assistant message.
+        """
+        excess = history.estimated_total_tokens - target_tokens
+        removed = 0
+        split = 0
+        for index in self._candidates(history):
+            removed += history.token_ledger[index]
+            following = history.messages[index + 1 : index + 2]
+            if following and following[0]["role"] == "assistant":
+                split = index + 1
+                if removed >= excess:
+                    break
+        return split
+
+    @staticmethod
+    def _transcript(messages: list[dict[str, Any]]) -> str:
+        lines = []
+        for message in messages:
+            content = message["content"]
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            for block in content:
+                if hasattr(block, "model_dump"):
+                    block = block.model_dump()
+                block_type = block.get("type")
+                if block_type == "text":
+                    text = block.get("text", "")
+                elif block_type == "tool_use":
+                    text = (
+                        f"[called {block.get('name')} with "
+                        f"{json.dumps(block.get('input', {}))}]"
+                    )
+                elif block_type == "tool_result":
+                    result = block.get("content", "")
+                    if not isinstance(result, str):
+                        result = " ".join(
+                            b.get("text", "") for b in result
+                            if isinstance(b, dict)
+                        )
+                    text = f"[tool result: {result}]"
+                else:
+                    text = f"[{block_type}]"
+                lines.append(f"{message['role']}: {text}")
+        return "\n".join(lines)
+
+    async def _summarize(self, client: Any, transcript: str) -> str:
+        params = {
+            "model": self.model,
+            "max_tokens": self.max_tokens,
+            "system": SUMMARY_PROMPT,
+            "messages": [{"role": "user", "content": transcript}],
+        }
+        if isinstance(client, AsyncAnthropic):
+            response = await client.messages.create(**params)
+        else:
+            response = await asyncio.to_thread(
+                client.messages.create, **params
+            )
+        return "".join(
+            block.text for block in response.content if block.type == "text"
+        )
+
+    async def apply(self, history: "MessageHistory", target_tokens: int) -> int:
+        split = self._split_point(history, target_tokens)
+        if split == 0:
+            return 0
+
+        client = self.client or history.client
+        try:
+            summary = await self._summarize(
+                client, self._transcript(history.messages[:split])
+            )
+        except Exception as e:
+            print(f"Error summarizing history: {e}")
+            return 0
+
+        message = {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"[Summary of earlier conversation]\n{summary}",
+                }
+            ],
+        }
+        saved = history.remove_messages(1, split)
+        saved += history.replace_message(0, message)
+        return saved
+
+
+class DropOldest(CompactionStrategy):
+    """Last resort: drop the oldest message pairs (MessageHistory.truncate)."""
+
+    async def apply(self, history: "MessageHistory", target_tokens: int) -> int:
+        before = history.estimated_total_tokens
+        history.truncate(target_tokens)
+        return before - history.estimated_total_tokens
+
+
+@dataclass
+class CompactionEvent:
+    """Record of one strategy run during a compaction."""
+
+    strategy: str
+    tokens_before: int
+    tokens_after: int
+    messages_before: int
+    messages_after: int
+
+
+class Compactor:
+    """Run compaction strategies in order until the history fits.
+
+    Compaction starts only once the history exceeds the context window and
+    then shrinks it to `target_ratio` of the window. The headroom means the
+    rewritten prefix stays unchanged, and therefore cacheable, for many
+    turns instead of being rewritten on every request.
+    """
+
+    def __init__(
+        self,
+        strategies: list[CompactionStrategy] | None = None,
+        target_ratio: float = 0.75,
+    ):
+        """Initialize the compactor.
+
+        Args:
+            strategies: Strategies to try, cheapest first (defaults to
+                        tool result elision, block clipping, then dropping
+                        the oldest messages)
+            target_ratio: Fraction of the context window to compact down to
+        """
+        if strategies is None:
+            strategies = [ToolResultElision(), BlockClipping(), DropOldest()]
+        self.strategies = strategies
+        self.target_ratio = target_ratio
+        self.events: list[CompactionEvent] = []
+
+    async def compact(self, history: "MessageHistory") -> list[CompactionEvent]:
+        """Compact the history if it exceeds its context window."""
+        if history.estimated_total_tokens <= history.context_window_tokens:
+            return []
+
+        target = int(history.context_window_tokens * self.target_ratio)
+        events = []
+        for strategy in self.strategies:
+            tokens_before = history.estimated_total_tokens
+            messages_before = len(history.messages)
+            await strategy.apply(history, target)
+            if history.estimated_total_tokens < tokens_before:
+                events.append(
+                    CompactionEvent(
+                        strategy=type(strategy).__name__,
+                        tokens_before=tokens_before,
+                        tokens_after=history.estimated_total_tokens,
+                        messages_before=messages_before,
+                        messages_after=len(history.messages),
+                    )
+                )
+            if history.estimated_total_tokens <= target:
+                break
+        self.events.extend(events)
+        return events
@@ -1,6 +1,10 @@
 """Connection handling for MCP servers."""
 
+import asyncio
+import json
+import time
 from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable
 from contextlib import AsyncExitStack
 from typing import Any
 
@@ -9,6 +13,7 @@ from mcp.client.sse import sse_client
 from mcp.client.stdio import stdio_client
 
 from ..tools.mcp_tool import MCPTool
+from .schema_cache import ToolSchemaCache
 
 
 class MCPConnection(ABC):
@@ -16,8 +21,12 @@ class MCPConnection(ABC):
 
     def __init__(self):
         self.session = None
+        self.server_info = None
         self._rw_ctx = None
         self._session_ctx = None
+        self._host_task: asyncio.Task | None = None
+        self._ready: asyncio.Future | None = None
+        self._stop_event: asyncio.Event | None = None
 
     @abstractmethod
     async def _create_rw_context(self):
@@ -25,12 +34,20 @@ class MCPConnection(ABC):
 
     async def __aenter__(self):
         """Initialize MCP server connection."""
-        self._rw_ctx = await self._create_rw_context()
-        read_write = await self._rw_ctx.__aenter__()
-        read, write = read_write
-        self._session_ctx = ClientSession(read, write)
-        self.session = await self._session_ctx.__aenter__()
-        await self.session.initialize()
+        try:
+            self._rw_ctx = await self._create_rw_context()
+            read_write = await self._rw_ctx.__aenter__()
+            read, write = read_write
+            self._session_ctx = ClientSession(read, write)
+            self.session = await self._session_ctx.__aenter__()
+            initialize_result = await self.session.initialize()
+            self.server_info = initialize_result.serverInfo
+        except BaseException:
+            # Unwind partially entered contexts in the task that entered
+            # them. They are closed normally: throwing a cancellation into
+            # the stdio client's generator leaves its cancel scope open.
+            await self.__aexit__(None, None, None)
+            raise
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
@@ -47,6 +64,77 @@ class MCPConnection(ABC):
             self._session_ctx = None
             self._rw_ctx = None
 
+    @property
+    def is_connecting(self) -> bool:
+        """Whether a background connect is still in progress."""
+        return self._ready is not None and not self._ready.done()
+
+    @property
+    def is_connected(self) -> bool:
+        """Whether a started connection is still open."""
+        return (
+            self._host_task is not None
+            and not self._host_task.done()
+            and self.session is not None
+        )
+
+    def connect_in_background(self) -> None:
+        """Begin connecting in a background task that owns the connection.
+
+        The stdio and SSE clients use anyio cancel scopes, which must be
+        exited by the same task that entered them. Hosting the connection
+        in its own task lets it outlive the caller and be stopped from any
+        task on the same event loop.
+        """
+        if self._host_task is not None:
+            return
+
+        ready = self._ready = asyncio.get_running_loop().create_future()
+        self._stop_event = asyncio.Event()
+
+        async def host():
+            try:
+                async with self:
+                    ready.set_result(None)
+                    await self._stop_event.wait()
+            except Exception as e:
+                if not ready.done():
+                    ready.set_exception(e)
+                else:
+                    print(f"MCP connection closed with error: {e}")
+            finally:
+                if not ready.done():
+                    ready.cancel()
+
+        self._host_task = asyncio.create_task(host())
+
+    async def start(self) -> "MCPConnection":
+        """Connect in a background task and wait until it is ready."""
+        launched = self._host_task is None
+        self.connect_in_background()
+        try:
+            # Shielded so a cancelled caller doesn't cancel the shared future
+            await asyncio.shield(self._ready)
+        except BaseException:
+            if launched:
+                await self.stop()
+            raise
+        return self
+
+    async def stop(self) -> None:
+        """Close a connection opened with start()."""
+        task, self._host_task = self._host_task, None
+        if task is None:
+            return
+        if not self._ready.done():
+            # Still connecting, so nothing is waiting on the stop event
+            task.cancel()
+        self._stop_event.set()
+        await asyncio.gather(task, return_exceptions=True)
+        if not self._ready.cancelled():
+            # Mark a connect error as retrieved; start() already raised it
+            self._ready.exception()
+
     async def list_tools(self) -> Any:
         """Retrieve available tools from the MCP server."""
         response = await self.session.list_tools()
@@ -56,6 +144,9 @@ class MCPConnection(ABC):
         self, tool_name: str, arguments: dict[str, Any]
     ) -> Any:
         """Call a tool on the MCP server with provided arguments."""
+        if self.session is None and self._ready is not None:
+            # Connecting in the background, e.g. after a schema cache hit
+            await asyncio.shield(self._ready)
         return await self.session.call_tool(tool_name, arguments=arguments)
 
 
@@ -99,7 +190,7 @@ def create_mcp_connection(config: dict[str, Any]) -> MCPConnection:
             raise ValueError("Command is required for STDIO connections")
         return MCPConnectionStdio(
             command=config["command"],
-            args=config.get("args"),
+            args=config.get("args") or [],
             env=config.get("env"),
         )
 
@@ -114,37 +205,330 @@ def create_mcp_connection(config: dict[str, Any]) -> MCPConnection:
         raise ValueError(f"Unsupported connection type: {conn_type}")
 
 
+def _create_tools(
+    connection: MCPConnection, tool_definitions: list[Any]
+) -> list[MCPTool]:
+    """Wrap a server's tool definitions as MCPTool instances."""
+    return [
+        MCPTool(
+            name=tool_info.name,
+            description=tool_info.description
+            or f"MCP tool: {tool_info.name}",
+            input_schema=tool_info.inputSchema,
+            connection=connection,
+        )
+        for tool_info in tool_definitions
+    ]
+
+
+async def _connect_all(
+    mcp_servers: list[dict[str, Any]],
+    connect: Callable[[dict[str, Any]], Awaitable[list[MCPTool]]],
+    timeout: float | None,
+) -> list[MCPTool]:
+    """Connect to every server concurrently, keeping config order.
+
+    Each server gets its own timeout (a per-server "timeout" key overrides
+    the default), and a failing or slow server is reported without
+    holding up the others.
+    """
+
+    async def attempt(config: dict[str, Any]) -> list[MCPTool]:
+        server_timeout = config.get("timeout", timeout)
+        try:
+            return await asyncio.wait_for(connect(config), server_timeout)
+        except asyncio.TimeoutError:
+            print(
+                f"Error setting up MCP server {config}: "
+                f"timed out after {server_timeout}s"
+            )
+        except Exception as e:
+            print(f"Error setting up MCP server {config}: {e}")
+        return []
+
+    results = await asyncio.gather(*(attempt(c) for c in mcp_servers))
+    return [tool for server_tools in results for tool in server_tools]
+
+
+def _server_version(connection: MCPConnection) -> str | None:
+    return getattr(connection.server_info, "version", None)
+
+
+async def _revalidate(
+    connection: MCPConnection,
+    config: dict[str, Any],
+    schema_cache: ToolSchemaCache,
+) -> list[Any] | None:
+    """Connect, list tools and refresh the cache.
+
+    Returns the fresh tool definitions if they differ from the cached ones.
+    """
+    try:
+        await connection.start()
+        tool_definitions = await connection.list_tools()
+    except Exception as e:
+        print(f"Error revalidating MCP server {config}: {e}")
+        return None
+    if schema_cache.put(config, tool_definitions, _server_version(connection)):
+        return tool_definitions
+    return None
+
+
 async def setup_mcp_connections(
     mcp_servers: list[dict[str, Any]] | None,
     stack: AsyncExitStack,
+    timeout: float | None = 30.0,
+    schema_cache: ToolSchemaCache | None = None,
+    on_tools_changed: (
+        Callable[[list[MCPTool], list[MCPTool]], None] | None
+    ) = None,
 ) -> list[MCPTool]:
-    """Set up MCP server connections and create tool interfaces."""
+    """Set up MCP server connections and create tool interfaces.
+
+    Servers are started concurrently, each with its own timeout in
+    seconds. Tools are returned in the order the servers are configured.
+
+    With a schema cache, servers whose schemas are cached return their
+    tools immediately and connect in the background; tool calls wait for
+    the connection. Changed schemas are written to the cache, and
+    on_tools_changed(old_tools, new_tools) is called so the caller can
+    swap the fresh tools in.
+    """
     if not mcp_servers:
         return []
 
-    mcp_tools = []
+    async def connect(config: dict[str, Any]) -> list[MCPTool]:
+        connection = create_mcp_connection(config)
+        cached = schema_cache.get(config) if schema_cache else None
+        if cached is not None:
+            connection.connect_in_background()
+            tools = _create_tools(connection, cached)
 
-    for config in mcp_servers:
-        try:
-            connection = create_mcp_connection(config)
-            await stack.enter_async_context(connection)
-            tool_definitions = await connection.list_tools()
-
-            for tool_info in tool_definitions:
-                mcp_tools.append(
-                    MCPTool(
-                        name=tool_info.name,
-                        description=tool_info.description
-                        or f"MCP tool: {tool_info.name}",
-                        input_schema=tool_info.inputSchema,
-                        connection=connection,
-                    )
-                )
+            async def revalidate() -> None:
+                fresh = await _revalidate(connection, config, schema_cache)
+                if fresh is not None and on_tools_changed is not None:
+                    on_tools_changed(tools, _create_tools(connection, fresh))
 
-        except Exception as e:
-            print(f"Error setting up MCP server {config}: {e}")
+            revalidation = asyncio.create_task(revalidate())
+            stack.push_async_callback(connection.stop)
+            stack.callback(revalidation.cancel)
+            return tools
+
+        await connection.start()
+        stack.push_async_callback(connection.stop)
+        tool_definitions = await connection.list_tools()
+        if schema_cache is not None:
+            schema_cache.put(
+                config, tool_definitions, _server_version(connection)
+            )
+        return _create_tools(connection, tool_definitions)
+
+    mcp_tools = await _connect_all(mcp_servers, connect, timeout)
 
     print(
         f"Loaded {len(mcp_tools)} MCP tools from {len(mcp_servers)} servers."
     )
     return mcp_tools
+
+
+async def _stop_on_loop(
+    loop: asyncio.AbstractEventLoop,
+    connections: list[MCPConnection],
+    tasks: list[asyncio.Task],
+) -> None:
+    """Stop connections owned by another event loop, on that loop.
+
+    Their host tasks can only be resumed by their own loop: a loop running
+    in another thread is handed the work, and an idle one is run in a
+    worker thread until the connections are closed.
+    """
+
+    async def stop_all() -> None:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(
+            *(connection.stop() for connection in connections),
+            return_exceptions=True,
+        )
+
+    if loop.is_closed():
+        print(
+            f"Cannot close {len(connections)} MCP connections: "
+            "the event loop that opened them is closed"
+        )
+    elif loop.is_running():
+        future = asyncio.run_coroutine_threadsafe(stop_all(), loop)
+        await asyncio.wrap_future(future)
+    else:
+        await asyncio.to_thread(loop.run_until_complete, stop_all())
+
+
+class MCPConnectionPool:
+    """Keep MCP server connections alive across agent runs.
+
+    Connections are keyed by their configuration, opened lazily on first
+    use, health-checked with a ping before reuse and reconnected if they
+    have died. With a schema cache, a server's cached tools are returned
+    at once while it connects in the background; if its schemas turn out
+    to have changed, the pooled tool list is swapped for the fresh one.
+    All connections belong to the event loop that opened them. When the
+    pool is used from a different loop (e.g. by another Agent.run), the
+    old connections are stopped on their own loop and reopened on the
+    new one.
+
+    Usage:
+        pool = get_mcp_pool()
+        agent = Agent(..., mcp_servers=servers, mcp_pool=pool)
+        ...
+        await pool.aclose()
+    """
+
+    def __init__(
+        self,
+        health_check_timeout: float = 5.0,
+        health_check_interval: float = 30.0,
+        schema_cache: ToolSchemaCache | None = None,
+    ):
+        """Initialize the pool.
+
+        Args:
+            health_check_timeout: Seconds to wait for a ping reply
+            health_check_interval: Seconds a successful ping stays valid
+            schema_cache: Serve cached tool schemas while connecting
+        """
+        self.health_check_timeout = health_check_timeout
+        self.health_check_interval = health_check_interval
+        self.schema_cache = schema_cache
+        self._revalidations: dict[str, asyncio.Task] = {}
+        self._connections: dict[str, MCPConnection] = {}
+        self._tools: dict[str, list[MCPTool]] = {}
+        self._last_checked: dict[str, float] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop | None:
+        """The event loop the pooled connections belong to."""
+        return self._loop
+
+    async def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        old_loop, self._loop = self._loop, loop
+        connections = list(self._connections.values())
+        revalidations = list(self._revalidations.values())
+        self._connections.clear()
+        self._revalidations.clear()
+        self._tools.clear()
+        self._last_checked.clear()
+        self._locks.clear()
+        if old_loop is not None and connections:
+            await _stop_on_loop(old_loop, connections, revalidations)
+
+    async def _is_healthy(self, key: str, connection: MCPConnection) -> bool:
+        if not connection.is_connected:
+            return False
+        now = time.monotonic()
+        if now - self._last_checked.get(key, 0.0) < self.health_check_interval:
+            return True
+        try:
+            await asyncio.wait_for(
+                connection.session.send_ping(), self.health_check_timeout
+            )
+        except Exception:
+            return False
+        self._last_checked[key] = now
+        return True
+
+    async def acquire(self, config: dict[str, Any]) -> list[MCPTool]:
+        """Get the tools of a pooled server, connecting if needed."""
+        await self._bind_loop()
+        key = json.dumps(config, sort_keys=True, default=str)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+
+        async with lock:
+            connection = self._connections.get(key)
+            if connection is not None:
+                if connection.is_connecting or await self._is_healthy(
+                    key, connection
+                ):
+                    return self._tools[key]
+                await self._discard(key)
+
+            connection = create_mcp_connection(config)
+            cached = self.schema_cache.get(config) if self.schema_cache else None
+            if cached is not None:
+                connection.connect_in_background()
+                self._connections[key] = connection
+                self._tools[key] = _create_tools(connection, cached)
+                self._revalidations[key] = asyncio.create_task(
+                    self._revalidate(key, config, connection)
+                )
+                return self._tools[key]
+
+            await connection.start()
+            try:
+                tool_definitions = await connection.list_tools()
+            except BaseException:
+                await connection.stop()
+                raise
+            if self.schema_cache is not None:
+                self.schema_cache.put(
+                    config, tool_definitions, _server_version(connection)
+                )
+            self._connections[key] = connection
+            self._tools[key] = _create_tools(connection, tool_definitions)
+            self._last_checked[key] = time.monotonic()
+            return self._tools[key]
+
+    async def _revalidate(
+        self, key: str, config: dict[str, Any], connection: MCPConnection
+    ) -> None:
+        tool_definitions = await _revalidate(
+            connection, config, self.schema_cache
+        )
+        self._last_checked[key] = time.monotonic()
+        if (
+            tool_definitions is not None
+            and self._connections.get(key) is connection
+        ):
+            # Replace the whole list so readers see old or new, never a mix
+            self._tools[key] = _create_tools(connection, tool_definitions)
+
+    async def _discard(self, key: str) -> None:
+        connection = self._connections.pop(key, None)
+        revalidation = self._revalidations.pop(key, None)
+        if revalidation is not None:
+            revalidation.cancel()
+        self._tools.pop(key, None)
+        self._last_checked.pop(key, None)
+        if connection is not None:
+            await connection.stop()
+
+    async def get_tools(
+        self,
+        mcp_servers: list[dict[str, Any]] | None,
+        timeout: float | None = 30.0,
+    ) -> list[MCPTool]:
+        """Get tools for every configured server, reusing connections."""
+        if not mcp_servers:
+            return []
+        return await _connect_all(mcp_servers, self.acquire, timeout)
+
+    async def aclose(self) -> None:
+        """Close every pooled connection, whichever loop opened it."""
+        await self._bind_loop()
+        for key in list(self._connections):
+            await self._discard(key)
+
+
+_default_pool: MCPConnectionPool | None = None
+
+
+def get_mcp_pool() -> MCPConnectionPool:
+    """Return the process-wide MCP connection pool."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = MCPConnectionPool()
+    return _default_pool
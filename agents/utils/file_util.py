@@ -0,0 +1,592 @@
+"""File type sniffing, ranged reads and atomic edits for the file tools."""
+
+import codecs
+import contextlib
+import hashlib
+import io
+import mmap
+import os
+import stat
+import struct
+import tempfile
+import threading
+from array import array
+from collections import OrderedDict
+from collections.abc import Iterator
+from dataclasses import dataclass
+from typing import BinaryIO, TextIO
+
+# Record the offset of every Nth line; finding any line then scans at
+# most N - 1 newlines from the nearest checkpoint.
+LINE_INDEX_STRIDE = 64
+# Bytes at the end of the indexed region used to detect appends
+_APPEND_CHECK_BYTES = 4096
+_MAX_INDEXES = 32
+# Bytes read from the start of a file to tell text from binary
+SNIFF_BYTES = 8192
+# Bytes shown by default when dumping part of a binary file
+HEX_DUMP_BYTES = 256
+
+# Longer BOMs first: the UTF-32-LE BOM starts with the UTF-16-LE one
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+_MAGIC = [
+    (b"\x89PNG\r\n\x1a\n", "PNG image"),
+    (b"\xff\xd8\xff", "JPEG image"),
+    (b"GIF87a", "GIF image"),
+    (b"GIF89a", "GIF image"),
+    (b"%PDF-", "PDF document"),
+    (b"PK\x03\x04", "ZIP archive"),
+    (b"\x1f\x8b", "gzip archive"),
+    (b"BZh", "bzip2 archive"),
+    (b"\xfd7zXZ\x00", "xz archive"),
+    (b"7z\xbc\xaf\x27\x1c", "7-Zip archive"),
+    (b"\x7fELF", "ELF executable"),
+    (b"MZ", "Windows executable"),
+    (b"\xca\xfe\xba\xbe", "Java class or Mach-O binary"),
+    (b"\xcf\xfa\xed\xfe", "Mach-O binary"),
+    (b"SQLite format 3\x00", "SQLite database"),
+    (b"\x00asm", "WebAssembly module"),
+    (b"RIFF", "RIFF media"),
+    (b"OggS", "Ogg media"),
+    (b"ID3", "MP3 audio"),
+    (b"fLaC", "FLAC audio"),
+    (b"wOFF", "WOFF font"),
+    (b"wOF2", "WOFF2 font"),
+]
+# Control bytes that do not occur in text; more than a few means binary
+_CONTROL = bytes(set(range(32)) - set(b"\t\n\r\f\b\x1b")) + b"\x7f"
+
+
+class LineIndex:
+    """Sparse index of line start offsets for one file.
+
+    The index grows lazily, only as far as the lines requested so far,
+    and survives appends: when a file grows but the indexed region is
+    unchanged it is extended rather than rebuilt.
+    """
+
+    def __init__(self, path: str, stride: int = LINE_INDEX_STRIDE):
+        self.path = path
+        self.stride = stride
+        # Reads run in worker threads; one of them updates the index
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # checkpoints[i] is the byte offset of line i * stride (0-based)
+        self.checkpoints = array("Q", [0])
+        self.lines_scanned = 0
+        self.scanned_to = 0
+        self.complete = False
+        self.size = 0
+        self.mtime_ns = 0
+        self._check_digest = b""
+
+    def _region_digest(self, mm: mmap.mmap, end: int) -> bytes:
+        start = max(0, end - _APPEND_CHECK_BYTES)
+        return hashlib.blake2b(mm[start:end], digest_size=16).digest()
+
+    def sync(self, mm: mmap.mmap, stat: os.stat_result) -> None:
+        """Validate the index against the file's current state."""
+        if stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size:
+            return
+        appended = (
+            stat.st_size >= self.size
+            and self.scanned_to <= stat.st_size
+            and self._region_digest(mm, self.scanned_to) == self._check_digest
+        )
+        if not appended:
+            self._reset()
+        self.complete = False
+        self.size = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+
+    def _scan(self, mm: mmap.mmap, target_line: int | None) -> None:
+        """Index lines until target_line starts or the file ends."""
+        pos = self.scanned_to
+        lines = self.lines_scanned
+        size = self.size
+        while pos < size and (target_line is None or lines < target_line):
+            newline = mm.find(b"\n", pos, size)
+            if newline == -1:
+                pos = size
+                break
+            pos = newline + 1
+            lines += 1
+            if lines % self.stride == 0:
+                self.checkpoints.append(pos)
+        # A final line without a trailing newline still counts as a line
+        self.complete = pos >= size
+        self.scanned_to = pos
+        self.lines_scanned = lines
+        self._check_digest = self._region_digest(mm, pos)
+
+    def line_offset(self, mm: mmap.mmap, line: int) -> int:
+        """Byte offset where a 0-based line starts (file size if past EOF)."""
+        if line >= self.lines_scanned and not self.complete:
+            self._scan(mm, line)
+        if line > self.lines_scanned:
+            return self.size
+        checkpoint = min(line // self.stride, len(self.checkpoints) - 1)
+        pos = self.checkpoints[checkpoint]
+        for _ in range(line - checkpoint * self.stride):
+            newline = mm.find(b"\n", pos, self.size)
+            if newline == -1:
+                return self.size
+            pos = newline + 1
+        return pos
+
+
+_indexes: OrderedDict[str, LineIndex] = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def get_line_index(path: str) -> LineIndex:
+    """Line index for a file, kept across calls for recently used files."""
+    key = os.path.realpath(path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = LineIndex(key)
+            while len(_indexes) > _MAX_INDEXES:
+                _indexes.popitem(last=False)
+        _indexes.move_to_end(key)
+        return index
+
+
+@dataclass
+class FileKind:
+    """What a file holds, judged from its first bytes."""
+
+    size: int
+    binary: bool
+    # e.g. "UTF-8 text" or "PNG image, 640x480"
+    description: str
+    # Codec for text files, without the BOM
+    encoding: str | None = None
+    bom: bytes = b""
+
+    @property
+    def ascii_compatible(self) -> bool:
+        """Whether newlines are single b"\\n" bytes in this encoding."""
+        return not (self.encoding or "").startswith(("utf-16", "utf-32"))
+
+    def summary(self, path: str) -> str:
+        """One-line description used instead of a binary file's content."""
+        return (
+            f"Binary file: {path} ({self.description}, "
+            f"{format_size(self.size)}). Its content was not decoded; "
+            "read a byte range (offset/length) for a hex dump."
+        )
+
+
+def format_size(size: int) -> str:
+    """Human-readable byte count."""
+    value = float(size)
+    for unit in ("bytes", "KB", "MB", "GB"):
+        if value < 1024 or unit == "GB":
+            break
+        value /= 1024
+    return f"{size} bytes" if unit == "bytes" else f"{value:.1f} {unit}"
+
+
+def _image_size(probe: bytes, description: str) -> str:
+    if description == "PNG image" and probe[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", probe[16:24])
+        return f", {width}x{height}"
+    if description == "GIF image" and len(probe) >= 10:
+        width, height = struct.unpack("<HH", probe[6:10])
+        return f", {width}x{height}"
+    return ""
+
+
+def sniff_bytes(probe: bytes, size: int) -> FileKind:
+    """Classify a file from its first bytes.
+
+    Args:
+        probe: The start of the file (SNIFF_BYTES is plenty)
+        size: Size of the whole file
+    """
+    for bom, encoding in _BOMS:
+        if probe.startswith(bom):
+            name = encoding.upper().replace("-LE", "").replace("-BE", "")
+            return FileKind(size, False, f"{name} text", encoding, bom)
+    for magic, description in _MAGIC:
+        if probe.startswith(magic):
+            description += _image_size(probe, description)
+            return FileKind(size, True, description)
+    if probe[4:8] == b"ftyp":
+        return FileKind(size, True, "MP4/QuickTime media")
+    if b"\0" in probe:
+        return FileKind(size, True, "binary data")
+    control = len(probe) - len(probe.translate(None, _CONTROL))
+    if control > max(len(probe) // 100, 2):
+        return FileKind(size, True, "binary data")
+
+    if probe.isascii():
+        return FileKind(size, False, "ASCII text", "utf-8")
+    try:
+        # A multi-byte character may be cut off at the end of the probe
+        codecs.getincrementaldecoder("utf-8")().decode(
+            probe, final=len(probe) >= size
+        )
+        return FileKind(size, False, "UTF-8 text", "utf-8")
+    except UnicodeDecodeError:
+        pass
+    try:
+        probe.decode("cp1252")
+        return FileKind(size, False, "Windows-1252 text", "cp1252")
+    except UnicodeDecodeError:
+        return FileKind(size, False, "ISO-8859-1 text", "latin-1")
+
+
+def sniff(path: str) -> FileKind:
+    """Classify a file by reading only its first SNIFF_BYTES bytes."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        return sniff_bytes(f.read(SNIFF_BYTES), size)
+
+
+def open_text(path: str, kind: FileKind | None = None) -> TextIO:
+    """Open a text file in its detected encoding, past any BOM."""
+    kind = kind or sniff(path)
+    raw = open(path, "rb")
+    raw.seek(len(kind.bom))
+    return io.TextIOWrapper(
+        raw, encoding=kind.encoding or "utf-8", errors="replace"
+    )
+
+
+def hex_dump(data: memoryview | bytes, offset: int = 0) -> str:
+    """Format bytes like `hexdump -C`, 16 per line."""
+    lines = []
+    view = memoryview(data)
+    for pos in range(0, len(view), 16):
+        row = view[pos : pos + 16]
+        text = "".join(chr(b) if 32 <= b < 127 else "." for b in row)
+        lines.append(f"{offset + pos:08x}  {row.hex(' '):<47}  |{text}|")
+    return "\n".join(lines)
+
+
+def _decode(data: memoryview, encoding: str) -> str:
+    # str() decodes straight from the buffer, without copying it to bytes
+    return str(data, encoding, "replace")
+
+
+def read_range(
+    path: str,
+    offset: int | None = None,
+    length: int | None = None,
+    start_line: int | None = None,
+    end_line: int | None = None,
+    tail: int | None = None,
+    kind: FileKind | None = None,
+) -> str:
+    """Read part of a file without loading the rest of it.
+
+    Exactly one kind of range is used: `tail` (last N lines), a byte
+    range (`offset`, `length`) or a 1-based inclusive line range
+    (`start_line`, `end_line`). Text is decoded in the file's detected
+    encoding directly from the memory map; byte ranges of binary files
+    are returned as a hex dump.
+
+    Args:
+        kind: The file's sniffed type, if already known
+    """
+    kind = kind or sniff(path)
+    if kind.size == 0:
+        return ""
+    if not kind.binary and not kind.ascii_compatible and (
+        offset is None and length is None
+    ):
+        return _read_lines_decoded(path, kind, start_line, end_line, tail)
+
+    with open(path, "rb") as f:
+        stat = os.fstat(f.fileno())
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                return _read_mapped(
+                    path,
+                    mm,
+                    view,
+                    stat,
+                    kind,
+                    offset,
+                    length,
+                    start_line,
+                    end_line,
+                    tail,
+                )
+
+
+def _read_mapped(
+    path: str,
+    mm: mmap.mmap,
+    view: memoryview,
+    stat: os.stat_result,
+    kind: FileKind,
+    offset: int | None,
+    length: int | None,
+    start_line: int | None,
+    end_line: int | None,
+    tail: int | None,
+) -> str:
+    size = len(mm)
+    encoding = kind.encoding or "utf-8"
+    if kind.binary:
+        if offset is None and length is None:
+            return kind.summary(path)
+        start = min(max(offset or 0, 0), size)
+        end = min(start + (HEX_DUMP_BYTES if length is None else length), size)
+        return hex_dump(view[start:end], start)
+
+    if tail is not None:
+        start = max(_tail_offset(mm, size, tail), len(kind.bom))
+        return _decode(view[start:size], encoding)
+
+    if offset is not None or length is not None:
+        start = min(max(offset or 0, 0), size)
+        end = size if length is None else min(start + length, size)
+        return _decode(view[start:end], encoding)
+
+    index = get_line_index(path)
+    first = max((start_line or 1) - 1, 0)
+    with index.lock:
+        index.sync(mm, stat)
+        start = max(index.line_offset(mm, first), len(kind.bom))
+        end = size
+        if end_line is not None:
+            end = index.line_offset(mm, max(end_line, first))
+    return _decode(view[start:end], encoding)
+
+
+def _read_lines_decoded(
+    path: str,
+    kind: FileKind,
+    start_line: int | None,
+    end_line: int | None,
+    tail: int | None,
+) -> str:
+    """Line ranges of UTF-16/32 files, whose newlines span several bytes."""
+    with open_text(path, kind) as f:
+        lines = f.read().splitlines(keepends=True)
+    if tail is not None:
+        return "".join(lines[len(lines) - tail :] if tail > 0 else [])
+    first = max((start_line or 1) - 1, 0)
+    return "".join(lines[first:end_line])
+
+
+def _tail_offset(mm: mmap.mmap, size: int, lines: int) -> int:
+    """Offset where the last `lines` lines start, scanning backwards."""
+    if lines <= 0:
+        return size
+    # A trailing newline ends the last line rather than starting a new one
+    pos = size - 1 if mm[size - 1 : size] == b"\n" else size
+    for _ in range(lines):
+        newline = mm.rfind(b"\n", 0, pos)
+        if newline == -1:
+            return 0
+        pos = newline
+    return pos + 1
+
+
+# Bytes read per step when streaming a file through an edit
+EDIT_CHUNK_SIZE = 1 << 20
+
+
+class _Unmatched(Exception):
+    """An edit found nothing to replace; the edit is abandoned."""
+
+
+@contextlib.contextmanager
+def atomic_writer(path: str) -> Iterator[BinaryIO]:
+    """Write a file through a temp file that replaces it atomically.
+
+    The temp file is created next to the target, fsynced and renamed over
+    it, then the directory is fsynced, so a crash leaves either the old
+    or the new file, never a truncated one. Symlinks are followed and the
+    target's permissions are kept; a new file gets the usual 0666 minus
+    the umask rather than mkstemp's 0600. Nothing is written if the block
+    raises.
+    """
+    target = os.path.realpath(path)
+    directory = os.path.dirname(target)
+    fd, temp_path = tempfile.mkstemp(
+        dir=directory, prefix=f".{os.path.basename(target)}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            mode = stat.S_IMODE(os.stat(target).st_mode)
+        except FileNotFoundError:
+            mode = 0o666 & ~_umask()
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, target)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(temp_path)
+        raise
+    _fsync_directory(directory)
+
+
+_umask_lock = threading.Lock()
+
+
+def _umask() -> int:
+    """The process umask, read from /proc where possible.
+
+    os.umask can only be read by setting it, which briefly affects files
+    created by other threads, so that is the fallback.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    with _umask_lock:
+        mask = os.umask(0o022)
+        os.umask(mask)
+    return mask
+
+
+def _fsync_directory(directory: str) -> None:
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # Not supported for directories on every platform
+    finally:
+        os.close(fd)
+
+
+def stream_edit(
+    path: str,
+    edits: list[tuple[str, str]],
+    chunk_size: int = EDIT_CHUNK_SIZE,
+    encoding: str = "utf-8",
+) -> list[list[int]]:
+    """Apply several replacements to a file in one streaming pass.
+
+    Every (old, new) pair replaces all occurrences of `old` in the
+    original content; where matches of different edits would overlap,
+    the leftmost wins (the earlier edit on a tie). The file is read in
+    chunks, with enough carried over between them that matches spanning
+    a chunk boundary are found, and written through atomic_writer. It
+    is replaced only if every edit matched at least once.
+
+    Matching is done on the encoded bytes, so `encoding` must be the
+    file's own (see sniff). In UTF-16 and UTF-32, only matches that
+    start on a code unit boundary count.
+
+    Returns:
+        The 1-based line numbers of each edit's matches, in edit order
+    """
+    patterns = [
+        (old.encode(encoding), new.encode(encoding)) for old, new in edits
+    ]
+    if not patterns or not all(old for old, _ in patterns):
+        raise ValueError("every edit needs non-empty old text")
+    # A match starting this far from the end of the buffer may continue
+    # into the next chunk
+    overlap = max(len(old) for old, _ in patterns) - 1
+    positions: list[list[int]] = [[] for _ in patterns]
+
+    newline = "\n".encode(encoding)
+    try:
+        _stream_edit(path, patterns, positions, overlap, chunk_size, newline)
+    except _Unmatched:
+        pass
+    return positions
+
+
+def _find(buf: bytes, sub: bytes, start: int, end: int, unit: int) -> int:
+    """buf.find for a sub starting on a multiple of unit (buf is aligned)."""
+    found = buf.find(sub, start, end)
+    while found != -1 and found % unit:
+        found = buf.find(sub, found + 1, end)
+    return found
+
+
+def _count(buf: bytes, sub: bytes, start: int, end: int, unit: int) -> int:
+    """buf.count for a sub starting on a multiple of unit (buf is aligned)."""
+    if unit == 1:
+        return buf.count(sub, start, end)
+    count = 0
+    found = _find(buf, sub, start, end, unit)
+    while found != -1:
+        count += 1
+        found = _find(buf, sub, found + len(sub), end, unit)
+    return count
+
+
+def _stream_edit(
+    path: str,
+    patterns: list[tuple[bytes, bytes]],
+    positions: list[list[int]],
+    overlap: int,
+    chunk_size: int,
+    newline: bytes,
+) -> None:
+    # Bytes per code unit: matches straddling two units would corrupt
+    # UTF-16/32 text, so the buffer is kept aligned to it
+    unit = len(newline)
+    with open(path, "rb") as src, atomic_writer(path) as out:
+        buf = b""
+        line = 1
+        while True:
+            chunk = src.read(chunk_size)
+            eof = not chunk
+            buf += chunk
+            limit = len(buf) if eof else len(buf) - overlap
+            limit -= limit % unit
+            # Unchanged runs are written from the buffer without copies
+            view = memoryview(buf)
+            # Next match of each pattern at or after pos (-1 for none)
+            end = len(buf)
+            upcoming = [_find(buf, old, 0, end, unit) for old, _ in patterns]
+            pos = 0
+            while True:
+                best = -1
+                for k, start in enumerate(upcoming):
+                    if start != -1 and start < pos:
+                        start = upcoming[k] = _find(
+                            buf, patterns[k][0], pos, end, unit
+                        )
+                    if start != -1 and start < limit:
+                        if best == -1 or start < upcoming[best]:
+                            best = k
+                if best == -1:
+                    break
+                start = upcoming[best]
+                line += _count(buf, newline, pos, start, unit)
+                positions[best].append(line)
+                old, new = patterns[best]
+                out.write(view[pos:start])
+                out.write(new)
+                line += _count(old, newline, 0, len(old), unit)
+                pos = start + len(old)
+            flush = max(pos, limit)
+            out.write(view[pos:flush])
+            line += _count(buf, newline, pos, flush, unit)
+            view.release()
+            buf = buf[flush:]
+            if eof:
+                break
+
+        if not all(positions):
+            # Leaving the block with an error discards the temp file
+            raise _Unmatched
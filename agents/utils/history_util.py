@@ -2,9 +2,29 @@
 
 from typing import Any
 
+from .cache_util import (
+    CacheBreakpointPlanner,
+    CachePlan,
+    CacheStats,
+    with_cache_control,
+)
+from .compaction import CompactionEvent, Compactor
+from .token_util import HeuristicTokenEstimator, TokenEstimator
+
+# Only calibrate on samples large enough for the ratio to be meaningful
+MIN_CALIBRATION_TOKENS = 32
+
+TRUNCATION_NOTICE_TOKENS = 25
+
 
 class MessageHistory:
-    """Manages chat history with token tracking and context management."""
+    """Manages chat history with token tracking and context management.
+
+    Every message has an entry in a token ledger: a local estimate until
+    the API reports usage for it, then its share of the observed tokens.
+    Compaction strategies edit messages through replace_message and
+    remove_messages, which keep the ledger and totals consistent.
+    """
 
     def __init__(
         self,
@@ -13,33 +33,49 @@ class MessageHistory:
         context_window_tokens: int,
         client: Any,
         enable_caching: bool = True,
+        token_estimator: TokenEstimator | None = None,
+        compactor: Compactor | None = None,
+        cache_planner: CacheBreakpointPlanner | None = None,
     ):
         self.model = model
         self.system = system
         self.context_window_tokens = context_window_tokens
         self.messages: list[dict[str, Any]] = []
+        # API view of messages, updated in place as messages change; only
+        # the entries carrying a cache breakpoint are copies
+        self._formatted: list[dict[str, Any]] = []
+        self._marked: tuple[int, ...] = ()
+        self._formatted_system: list[dict[str, Any]] | None = None
+        self._formatted_tools: tuple[Any, bool, list[Any]] | None = None
         self.total_tokens = 0
         self.enable_caching = enable_caching
-        self.message_tokens: list[tuple[int, int]] = (
-            []
-        )  # List of (input_tokens, output_tokens) tuples
         self.client = client
+        self.token_estimator = token_estimator or HeuristicTokenEstimator()
+        # Local estimate and ledger tokens per message, parallel to messages
+        self.message_estimates: list[int] = []
+        self.token_ledger: list[int] = []
+        # Leading messages whose tokens were covered by a usage report
+        self.counted_messages = 0
+        # Ledger tokens of messages not yet covered by a usage report
+        self.uncounted_tokens = 0
+        self.compactor = compactor or Compactor()
+        self.cache_planner = cache_planner or CacheBreakpointPlanner()
+        self.cache_stats = CacheStats()
+        # Last message rewritten by compaction; the prefix up to it stays
+        # unchanged until the next compaction
+        self.compaction_boundary: int | None = None
+        # Boundary before the latest compaction, still cached until the
+        # next request has been sent
+        self.previous_boundary: int | None = None
 
-        # set initial total tokens to system prompt
-        try:
-            system_token = (
-                self.client.messages.count_tokens(
-                    model=self.model,
-                    system=self.system,
-                    messages=[{"role": "user", "content": "test"}],
-                ).input_tokens
-                - 1
-            )
+        # set initial total tokens to system prompt, locally so that
+        # constructing a history never blocks on the network
+        self.total_tokens = self.token_estimator.estimate_text(self.system)
 
-        except Exception:
-            system_token = len(self.system) / 4
-
-        self.total_tokens = system_token
+    @property
+    def estimated_total_tokens(self) -> int:
+        """Observed tokens plus estimates for messages not yet sent."""
+        return self.total_tokens + self.uncounted_tokens
 
     async def add_message(
         self,
@@ -53,25 +89,150 @@ class MessageHistory:
 
         message = {"role": role, "content": content}
         self.messages.append(message)
+        self._formatted.append({"role": role, "content": content})
+        estimate = self.token_estimator.estimate_message(message)
+        self.message_estimates.append(estimate)
+        self.token_ledger.append(estimate)
+        self.uncounted_tokens += estimate
 
         if role == "assistant" and usage:
-            total_input = (
-                usage.input_tokens
-                + getattr(usage, "cache_read_input_tokens", 0)
-                + getattr(usage, "cache_creation_input_tokens", 0)
+            self._record_usage(usage)
+            self.cache_stats.record(usage)
+
+    def _record_usage(self, usage: Any) -> None:
+        """Attribute a usage report to the messages it covers."""
+        total_input = (
+            usage.input_tokens
+            + (getattr(usage, "cache_read_input_tokens", 0) or 0)
+            + (getattr(usage, "cache_creation_input_tokens", 0) or 0)
+        )
+        output_tokens = usage.output_tokens
+        current_turn_input = total_input - self.total_tokens
+
+        # Messages sent as input this turn, followed by the response
+        pending = range(self.counted_messages, len(self.messages) - 1)
+        pending_estimate = sum(self.token_ledger[i] for i in pending)
+        response_index = len(self.messages) - 1
+
+        self._calibrate(
+            self.message_estimates[response_index],
+            output_tokens,
+            pending_estimate,
+            current_turn_input,
+        )
+
+        # The first turn's input also covers tool definitions, which are
+        # not part of the history, so keep the estimates for its messages
+        if self.counted_messages and pending_estimate > 0:
+            for i in pending:
+                self.token_ledger[i] = round(
+                    current_turn_input * self.token_ledger[i] / pending_estimate
+                )
+        self.token_ledger[response_index] = output_tokens
+
+        self.total_tokens += current_turn_input + output_tokens
+        self.counted_messages = len(self.messages)
+        self.uncounted_tokens = 0
+        self.previous_boundary = None
+
+    def _calibrate(
+        self,
+        output_estimate: int,
+        output_tokens: int,
+        input_estimate: int,
+        turn_input: int,
+    ) -> None:
+        """Feed observed usage back into the token estimator."""
+        if output_tokens >= MIN_CALIBRATION_TOKENS:
+            self.token_estimator.calibrate(output_estimate, output_tokens)
+        if self.counted_messages and input_estimate >= MIN_CALIBRATION_TOKENS:
+            self.token_estimator.calibrate(input_estimate, turn_input)
+
+    def _adjust_total(self, index: int, delta: int) -> None:
+        if index < self.counted_messages:
+            self.total_tokens += delta
+        else:
+            self.uncounted_tokens += delta
+
+    def replace_message(
+        self,
+        index: int,
+        message: dict[str, Any],
+        tokens: int | None = None,
+    ) -> int:
+        """Replace a message, updating the ledger. Returns tokens saved.
+
+        Unless `tokens` is given, the new ledger entry keeps the old ratio
+        of observed to estimated tokens.
+        """
+        old_estimate = self.message_estimates[index]
+        old_tokens = self.token_ledger[index]
+        estimate = self.token_estimator.estimate_message(message)
+        if tokens is None:
+            tokens = (
+                round(old_tokens * estimate / old_estimate)
+                if old_estimate
+                else estimate
             )
-            output_tokens = usage.output_tokens
 
-            current_turn_input = total_input - self.total_tokens
-            self.message_tokens.append((current_turn_input, output_tokens))
-            self.total_tokens += current_turn_input + output_tokens
+        self._unmark()
+        self.messages[index] = message
+        self._formatted[index] = {
+            "role": message["role"],
+            "content": message["content"],
+        }
+        self.message_estimates[index] = estimate
+        self.token_ledger[index] = tokens
+        self._adjust_total(index, tokens - old_tokens)
+        self.compaction_boundary = max(self.compaction_boundary or 0, index)
+        return old_tokens - tokens
+
+    def remove_messages(self, start: int, stop: int) -> int:
+        """Remove messages[start:stop]. Returns tokens saved."""
+        saved = 0
+        for index in range(start, stop):
+            self._adjust_total(index, -self.token_ledger[index])
+            saved += self.token_ledger[index]
+        counted = self.counted_messages
+        counted_removed = max(0, min(stop, counted) - min(start, counted))
+        self._unmark()
+        del self.messages[start:stop]
+        del self._formatted[start:stop]
+        del self.message_estimates[start:stop]
+        del self.token_ledger[start:stop]
+        self.counted_messages -= counted_removed
+        self.compaction_boundary = _shift_index(
+            self.compaction_boundary, start, stop
+        )
+        self.previous_boundary = _shift_index(
+            self.previous_boundary, start, stop
+        )
+        return saved
+
+    async def compact(self) -> list[CompactionEvent]:
+        """Run the compactor if the history exceeds the context window.
+
+        Returns:
+            One event per strategy that removed tokens
+        """
+        previous = self.previous_boundary
+        # Set before compacting so removals during compaction shift it
+        self.previous_boundary = self.compaction_boundary
+        events = await self.compactor.compact(self)
+        if not events:
+            self.previous_boundary = previous
+        return events
+
+    def truncate(self, target_tokens: int | None = None) -> None:
+        """Remove oldest messages until the history fits the target.
 
-    def truncate(self) -> None:
-        """Remove oldest messages when context window limit is exceeded."""
-        if self.total_tokens <= self.context_window_tokens:
+        The target defaults to the context window.
+        """
+        if target_tokens is None:
+            target_tokens = self.context_window_tokens
+        if self.estimated_total_tokens <= target_tokens:
             return
 
-        TRUNCATION_NOTICE_TOKENS = 25
         TRUNCATION_MESSAGE = {
             "role": "user",
             "content": [
@@ -82,43 +243,90 @@ class MessageHistory:
             ],
         }
 
-        def remove_message_pair():
-            self.messages.pop(0)
-            self.messages.pop(0)
-
-            if self.message_tokens:
-                input_tokens, output_tokens = self.message_tokens.pop(0)
-                self.total_tokens -= input_tokens + output_tokens
-
         while (
-            self.message_tokens
+            self.counted_messages >= 2
             and len(self.messages) >= 2
-            and self.total_tokens > self.context_window_tokens
+            and self.estimated_total_tokens > target_tokens
         ):
-            remove_message_pair()
+            self.remove_messages(0, 2)
 
-            if self.messages and self.message_tokens:
-                original_input_tokens, original_output_tokens = (
-                    self.message_tokens[0]
-                )
-                self.messages[0] = TRUNCATION_MESSAGE
-                self.message_tokens[0] = (
-                    TRUNCATION_NOTICE_TOKENS,
-                    original_output_tokens,
-                )
-                self.total_tokens += (
-                    TRUNCATION_NOTICE_TOKENS - original_input_tokens
+            if self.messages and self.counted_messages:
+                self.replace_message(
+                    0, TRUNCATION_MESSAGE, tokens=TRUNCATION_NOTICE_TOKENS
                 )
 
-    def format_for_api(self) -> list[dict[str, Any]]:
-        """Format messages for Claude API with optional caching."""
-        result = [
-            {"role": m["role"], "content": m["content"]} for m in self.messages
-        ]
-
-        if self.enable_caching and self.messages:
-            result[-1]["content"] = [
-                {**block, "cache_control": {"type": "ephemeral"}}
-                for block in self.messages[-1]["content"]
-            ]
-        return result
+    def _cache_plan(self, has_tools: bool) -> CachePlan:
+        if not self.enable_caching:
+            return CachePlan()
+        return self.cache_planner.plan(
+            has_tools,
+            bool(self.system),
+            self.messages,
+            self.compaction_boundary,
+            self.previous_boundary,
+        )
+
+    def format_system(
+        self, has_tools: bool = False
+    ) -> str | list[dict[str, Any]]:
+        """Format the system prompt, with a cache breakpoint if planned."""
+        if not self._cache_plan(has_tools).system:
+            return self.system
+        cached = self._formatted_system
+        if cached is None or cached[0]["text"] is not self.system:
+            cached = self._formatted_system = with_cache_control(self.system)
+        return cached
+
+    def format_tools(self, tools: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Format tool definitions, with a cache breakpoint if planned.
+
+        The result is reused for as long as the same `tools` list is
+        passed in, so callers should build a new list when tools change.
+        """
+        marked = self._cache_plan(bool(tools)).tools
+        cached = self._formatted_tools
+        if cached and cached[0] is tools and cached[1] == marked:
+            return cached[2]
+        formatted = with_cache_control(tools) if marked else tools
+        self._formatted_tools = (tools, marked, formatted)
+        return formatted
+
+    def _unmark(self) -> None:
+        """Swap marked copies back for the plain message entries."""
+        for index in self._marked:
+            message = self.messages[index]
+            self._formatted[index] = {
+                "role": message["role"],
+                "content": message["content"],
+            }
+        self._marked = ()
+
+    def format_for_api(self, has_tools: bool = False) -> list[dict[str, Any]]:
+        """Format messages for Claude API with optional caching.
+
+        Cache breakpoints go where the planner puts them: the newest
+        message, the end of the previous request and the end of the
+        compacted region. The returned list is a view kept up to date as
+        messages are added, so each call costs O(1) rather than a copy of
+        the whole history. Treat it as read-only.
+        """
+        plan = self._cache_plan(has_tools).messages
+        if plan != self._marked:
+            self._unmark()
+            for index in plan:
+                message = self.messages[index]
+                self._formatted[index] = {
+                    "role": message["role"],
+                    "content": with_cache_control(message["content"]),
+                }
+            self._marked = plan
+        return self._formatted
+
+
+def _shift_index(index: int | None, start: int, stop: int) -> int | None:
+    """Where a message index ends up after messages[start:stop] is removed."""
+    if index is None or index < start:
+        return index
+    if index >= stop:
+        return index - (stop - start)
+    return start - 1 if start else None
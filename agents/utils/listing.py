@@ -0,0 +1,296 @@
+"""Directory listing with scandir, glob patterns and .gitignore rules."""
+
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+_MAX_SNAPSHOTS = 4096
+
+
+def translate_pattern(pattern: str, match_hidden: bool = False) -> str:
+    """Translate a glob pattern with `**` support into a regex.
+
+    `*` and `?` never cross a `/`, while a `**` segment matches any number
+    of directories. Unless `match_hidden` is set, wildcards do not match a
+    leading dot, as in glob.
+    """
+    parts = []
+    segments = pattern.strip("/").split("/")
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            if last:
+                parts.append(
+                    ".*" if match_hidden else r"(?:[^/.][^/]*(?:/|$))*"
+                )
+            else:
+                parts.append(
+                    "(?:.*/)?" if match_hidden else r"(?:[^/.][^/]*/)*"
+                )
+            continue
+        regex = ""
+        if not match_hidden and segment[:1] in ("*", "?", "["):
+            regex = r"(?!\.)"
+        j = 0
+        while j < len(segment):
+            char = segment[j]
+            if char == "*":
+                regex += "[^/]*"
+            elif char == "?":
+                regex += "[^/]"
+            elif char == "[":
+                end = segment.find("]", j + 2)
+                if end == -1:
+                    regex += re.escape(char)
+                else:
+                    body = segment[j + 1 : end].replace("\\", "\\\\")
+                    if body.startswith("!"):
+                        body = "^" + body[1:]
+                    regex += f"[{body}]"
+                    j = end
+            else:
+                regex += re.escape(char)
+            j += 1
+        parts.append(regex + ("" if last else "/"))
+    return "".join(parts)
+
+
+@dataclass
+class _IgnoreRule:
+    regex: re.Pattern
+    negate: bool
+    dir_only: bool
+
+
+def _parse_gitignore(text: str) -> list[_IgnoreRule]:
+    rules = []
+    for line in text.splitlines():
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        line = line.replace("\\", "")
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        if not line:
+            continue
+        # A pattern with a slash (leading or inner) is anchored to the
+        # .gitignore's directory; one without matches at any depth
+        anchored = "/" in line
+        line = line.lstrip("/")
+        if not anchored:
+            line = "**/" + line
+        regex = translate_pattern(line, match_hidden=True)
+        rules.append(_IgnoreRule(re.compile(regex + "$"), negate, dir_only))
+    return rules
+
+
+class DirectoryCache:
+    """Snapshots of directory entries, invalidated by directory mtime.
+
+    A directory's mtime changes whenever an entry is added, removed or
+    renamed, so an unchanged mtime means the cached (name, is_dir) pairs
+    are still valid and listing it again costs a single stat. Symlinks
+    are recorded too, so walks can avoid following them.
+    """
+
+    def __init__(self, max_entries: int = _MAX_SNAPSHOTS):
+        self.max_entries = max_entries
+        self._snapshots: OrderedDict[str, tuple] = OrderedDict()
+        self._ignores: dict[str, tuple[int, list[_IgnoreRule]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def entries(self, path: str) -> list[tuple[str, bool]]:
+        """Sorted (name, is_dir) pairs for a directory."""
+        return self.scan(path)[0]
+
+    def scan(self, path: str) -> tuple[list[tuple[str, bool]], frozenset[str]]:
+        """Sorted (name, is_dir) pairs, and the names that are symlinks."""
+        mtime = os.stat(path).st_mtime_ns
+        with self._lock:
+            cached = self._snapshots.get(path)
+            if cached is not None and cached[0] == mtime:
+                self._snapshots.move_to_end(path)
+                self.hits += 1
+                return cached[1], cached[2]
+        entries = []
+        links = set()
+        with os.scandir(path) as it:
+            # DirEntry caches the type from readdir, avoiding a stat each
+            # (except to resolve symlinks)
+            for entry in it:
+                entries.append((entry.name, entry.is_dir()))
+                if entry.is_symlink():
+                    links.add(entry.name)
+        entries.sort()
+        with self._lock:
+            self.misses += 1
+            self._snapshots[path] = (mtime, entries, frozenset(links))
+            self._snapshots.move_to_end(path)
+            while len(self._snapshots) > self.max_entries:
+                self._snapshots.popitem(last=False)
+        return entries, frozenset(links)
+
+    def directories_under(self, root: str) -> list[str]:
+        """Snapshotted directories at or below root."""
+        prefix = os.path.join(root, "")
+        with self._lock:
+            return sorted(
+                path
+                for path in self._snapshots
+                if path == root or path.startswith(prefix)
+            )
+
+    def ignore_rules(self, directory: str) -> list[_IgnoreRule]:
+        """Rules from a directory's .gitignore, reparsed when it changes."""
+        path = os.path.join(directory, ".gitignore")
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._ignores.get(path)
+        if cached is None or cached[0] != mtime:
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    rules = _parse_gitignore(f.read())
+            except OSError:
+                rules = []
+            cached = self._ignores[path] = (mtime, rules)
+        return cached[1]
+
+
+default_cache = DirectoryCache()
+
+
+def _git_root(directory: str) -> str | None:
+    current = directory
+    while True:
+        if os.path.isdir(os.path.join(current, ".git")):
+            return current
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+@dataclass
+class Listing:
+    """One page of a directory listing."""
+
+    entries: list[tuple[str, bool]]
+    total: int
+    next_cursor: str | None
+
+
+def list_directory(
+    directory: str,
+    pattern: str = "*",
+    max_depth: int | None = None,
+    respect_gitignore: bool = True,
+    limit: int | None = None,
+    cursor: str | None = None,
+    cache: DirectoryCache | None = None,
+) -> Listing:
+    """List entries under a directory whose relative path matches pattern.
+
+    Args:
+        directory: Directory to list
+        pattern: Glob pattern relative to the directory; `**` recurses
+        max_depth: Deepest level to descend to (1 lists direct children);
+                   defaults to the depth of a pattern without `**`
+        respect_gitignore: Skip entries excluded by .gitignore files
+                           (and .git itself)
+        limit: Maximum entries to return
+        cursor: Relative path of the last entry of the previous page
+        cache: Directory snapshot cache to use
+
+    Returns:
+        The page of sorted (relative path, is_dir) entries, the total
+        number of matches and the cursor for the next page
+
+    Symlinks to directories are listed but not descended into, so a link
+    back to an ancestor cannot make the walk loop.
+    """
+    cache = cache or default_cache
+    root = os.path.abspath(directory)
+    matcher = re.compile(translate_pattern(pattern) + "$")
+    segments = pattern.strip("/").split("/")
+    if max_depth is None and "**" not in segments:
+        max_depth = len(segments)
+    # Wildcards skip dot entries, so only descend into hidden directories
+    # when the pattern names one explicitly
+    descend_hidden = any(segment.startswith(".") for segment in segments)
+
+    # (rules, path of the directory being walked relative to the rules')
+    rule_sets: list[tuple[list[_IgnoreRule], str]] = []
+    if respect_gitignore:
+        git_root = _git_root(root)
+        if git_root is not None and git_root != root:
+            ancestor = os.path.dirname(root)
+            while True:
+                rules = cache.ignore_rules(ancestor)
+                if rules:
+                    prefix = os.path.relpath(root, ancestor)
+                    rule_sets.append((rules, prefix.replace(os.sep, "/")))
+                if ancestor == git_root:
+                    break
+                ancestor = os.path.dirname(ancestor)
+            rule_sets.reverse()
+
+    def ignored(name: str, is_dir: bool, rules_stack) -> bool:
+        # Later rules, and deeper .gitignore files, take precedence
+        result = False
+        for rules, prefix in rules_stack:
+            path = f"{prefix}/{name}" if prefix else name
+            for rule in rules:
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.regex.match(path):
+                    result = not rule.negate
+        return result
+
+    matches: list[tuple[str, bool]] = []
+
+    def walk(path: str, rel_dir: str, depth: int, rules_stack) -> None:
+        if respect_gitignore:
+            rules = cache.ignore_rules(path)
+            if rules:
+                rules_stack = [*rules_stack, (rules, "")]
+        try:
+            entries, links = cache.scan(path)
+        except OSError:
+            return
+        for name, is_dir in entries:
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if respect_gitignore and (
+                name == ".git" or ignored(name, is_dir, rules_stack)
+            ):
+                continue
+            if matcher.match(rel_path):
+                matches.append((rel_path, is_dir))
+            if name.startswith(".") and not descend_hidden:
+                continue
+            if name in links:
+                continue
+            if is_dir and (max_depth is None or depth < max_depth):
+                child_stack = [
+                    (rules, f"{prefix}/{name}" if prefix else name)
+                    for rules, prefix in rules_stack
+                ]
+                child = os.path.join(path, name)
+                walk(child, rel_path, depth + 1, child_stack)
+
+    walk(root, "", 1, rule_sets)
+    matches.sort()
+    if cursor is not None:
+        matches = [m for m in matches if m[0] > cursor]
+    total = len(matches)
+    page = matches if limit is None else matches[:limit]
+    next_cursor = page[-1][0] if page and len(page) < total else None
+    return Listing(entries=page, total=total, next_cursor=next_cursor)
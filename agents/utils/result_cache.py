@@ -0,0 +1,112 @@
+"""Memoization of deterministic tool results."""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any
+
+# (tool name, canonical input, fingerprint of the files it depends on)
+CacheKey = tuple[str, str, tuple]
+
+
+def canonical_input(tool_input: dict[str, Any]) -> str:
+    """Serialize tool input so equal inputs always produce equal keys."""
+    return json.dumps(
+        tool_input, sort_keys=True, separators=(",", ":"), default=str
+    )
+
+
+def _file_fingerprint(paths: list[str]) -> tuple:
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stats.append((path, None, None))
+    return tuple(stats)
+
+
+class ToolResultCache:
+    """LRU cache of tool results with optional expiry.
+
+    Entries are keyed by tool name and canonicalized input. Tools that
+    read files report them through Tool.cache_dependencies; their mtime
+    and size are stored with the entry, and a lookup after any of them
+    changed is a miss. Results of failed calls are not cached.
+
+    One cache can be shared by several tools.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float | None = None):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Entries kept before the least recently used is
+                         evicted
+            ttl: Seconds an entry stays valid (None keeps it until evicted)
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # (name, input) -> (fingerprint, expiry time, result)
+        self._entries: OrderedDict[tuple[str, str], tuple] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(
+        self, tool: Any, tool_input: dict[str, Any]
+    ) -> tuple[CacheKey, str | None]:
+        """Return the key to store under and the cached result, if fresh.
+
+        The key captures the dependencies' state before the tool runs, so
+        a file modified during execution is not cached as unchanged.
+        """
+        entry_key = (tool.name, canonical_input(tool_input))
+        fingerprint = _file_fingerprint(tool.cache_dependencies(**tool_input))
+        key = (*entry_key, fingerprint)
+
+        entry = self._entries.get(entry_key)
+        if entry is not None:
+            stored_fingerprint, expires, result = entry
+            fresh = expires > time.monotonic()
+            if fresh and stored_fingerprint == fingerprint:
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return key, result
+            del self._entries[entry_key]
+            self.invalidations += 1
+        self.misses += 1
+        return key, None
+
+    def store(self, key: CacheKey, result: str, is_error: bool = False) -> None:
+        """Cache a result under a key returned by lookup, unless it is an error."""
+        if is_error:
+            return
+        name, tool_input, fingerprint = key
+        expires = float("inf")
+        if self.ttl is not None:
+            expires = time.monotonic() + self.ttl
+        self._entries[(name, tool_input)] = (fingerprint, expires, result)
+        self._entries.move_to_end((name, tool_input))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, tool_name: str | None = None) -> None:
+        """Drop the entries of one tool, or all entries."""
+        if tool_name is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == tool_name]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,155 @@
+"""On-disk cache of MCP tool schemas."""
+
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any
+
+from mcp.types import Tool as MCPToolDefinition
+
+from .file_util import atomic_writer
+
+CACHE_FORMAT_VERSION = 1
+
+
+def _default_cache_path() -> Path:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "agents" / "mcp_tool_schemas.json"
+
+
+def _digest(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, default=str).encode()
+    return hashlib.sha256(data).hexdigest()
+
+
+def server_key(config: dict[str, Any]) -> str:
+    """Identify a server by how it is reached, not by its tools."""
+    conn_type = config.get("type", "stdio").lower()
+    if conn_type == "sse":
+        return _digest({"type": "sse", "url": config.get("url")})
+    return _digest(
+        {
+            "type": conn_type,
+            "command": config.get("command"),
+            "args": config.get("args") or [],
+            "env": config.get("env") or {},
+        }
+    )
+
+
+def _module_paths(args: list[Any]) -> list[str]:
+    """Files behind a `-m module` argument, looked up in this environment.
+
+    Only the top-level package is resolved, which doesn't import it; its
+    __init__ and directory change when the package is upgraded.
+    """
+    if "-m" not in args or args.index("-m") + 1 >= len(args):
+        return []
+    name = str(args[args.index("-m") + 1]).partition(".")[0]
+    try:
+        spec = importlib.util.find_spec(name)
+    except (ImportError, ValueError):
+        return []
+    if spec is None:
+        return []
+    return [
+        path
+        for path in [spec.origin, *(spec.submodule_search_locations or [])]
+        if path and os.path.isabs(path)
+    ]
+
+
+def server_fingerprint(config: dict[str, Any]) -> str:
+    """Cheap local fingerprint of a server's version.
+
+    For stdio servers this covers the size and mtime of the command, of
+    any arguments that are files and of the package run with `-m`, so
+    editing or upgrading the server invalidates its cached schemas
+    without starting it.
+    """
+    stats = []
+    if config.get("type", "stdio").lower() == "stdio":
+        command = config.get("command") or ""
+        args = config.get("args") or []
+        paths = [shutil.which(command) or command, *args, *_module_paths(args)]
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except (OSError, TypeError, ValueError):
+                continue
+            stats.append([str(path), stat.st_size, stat.st_mtime_ns])
+    return _digest([CACHE_FORMAT_VERSION, stats])
+
+
+class ToolSchemaCache:
+    """Persist MCP tool schemas keyed by server identity and fingerprint.
+
+    Entries are loaded once and written back with atomic_writer, so
+    concurrent readers never see a partial file.
+    """
+
+    def __init__(self, path: str | Path | None = None):
+        self.path = Path(path) if path else _default_cache_path()
+        self._entries: dict[str, dict[str, Any]] | None = None
+
+    def _load(self) -> dict[str, dict[str, Any]]:
+        if self._entries is None:
+            try:
+                data = json.loads(self.path.read_text())
+                if data.get("version") != CACHE_FORMAT_VERSION:
+                    raise ValueError("stale cache format")
+                self._entries = data["servers"]
+            except (OSError, ValueError, KeyError, AttributeError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        data = {"version": CACHE_FORMAT_VERSION, "servers": self._load()}
+        with atomic_writer(str(self.path)) as f:
+            f.write(json.dumps(data).encode())
+
+    def get(self, config: dict[str, Any]) -> list[MCPToolDefinition] | None:
+        """Return cached tool definitions if the fingerprint still matches."""
+        entry = self._load().get(server_key(config))
+        if not entry or entry.get("fingerprint") != server_fingerprint(config):
+            return None
+        try:
+            return [
+                MCPToolDefinition.model_validate(tool)
+                for tool in entry["tools"]
+            ]
+        except Exception:
+            return None
+
+    def put(
+        self,
+        config: dict[str, Any],
+        tool_definitions: list[Any],
+        server_version: str | None = None,
+    ) -> bool:
+        """Store fresh tool definitions. Returns True if the tools changed."""
+        tools = [
+            tool.model_dump(mode="json", by_alias=True, exclude_none=True)
+            for tool in tool_definitions
+        ]
+        entry = {
+            "fingerprint": server_fingerprint(config),
+            "server_version": server_version,
+            "tools": tools,
+        }
+        entries = self._load()
+        key = server_key(config)
+        previous = entries.get(key) or {}
+        if previous != entry:
+            entries[key] = entry
+            self._save()
+        return previous.get("tools") != tools
+
+    def invalidate(self, config: dict[str, Any]) -> None:
+        """Drop the cached schemas for a server."""
+        if self._load().pop(server_key(config), None) is not None:
+            self._save()
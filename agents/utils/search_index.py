@@ -0,0 +1,349 @@
+"""Trigram index for fast content search over a directory tree."""
+
+import hashlib
+import marshal
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .file_util import SNIFF_BYTES, atomic_writer, sniff_bytes
+from .listing import DirectoryCache, list_directory
+
+# Files larger than this are searched but not indexed
+MAX_INDEXED_BYTES = 4 << 20
+_INDEX_VERSION = 1
+_REGEX_META = set(".^$*+?{}[]\\|()")
+
+
+def default_index_dir() -> str:
+    """Directory where search indexes are persisted between runs."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "agents", "search")
+
+
+def trigrams(data: bytes) -> set[tuple[int, int, int]]:
+    """Case-folded (ASCII) 3-byte substrings of the lines of data.
+
+    Searches match line by line, so trigrams spanning a newline are not
+    needed, and repeated lines are only scanned once.
+    """
+    grams: set[tuple[int, int, int]] = set()
+    for line in set(data.lower().splitlines()):
+        grams.update(zip(line, line[1:], line[2:]))
+    return grams
+
+
+def signature(grams: set[tuple[int, int, int]], bits: int) -> int:
+    """Bitmap of 2**bits bits with one bit set per trigram.
+
+    A file can only contain a trigram whose bit is set in its signature,
+    so testing a query is a single AND of two integers.
+    """
+    shift = 32 - bits
+    bitmap = bytearray(1 << max(bits - 3, 0))
+    for a, b, c in grams:
+        # Fibonacci hashing spreads the 24-bit trigram over the bitmap
+        h = (((a << 16 | b << 8 | c) * 0x9E3779B1) & 0xFFFFFFFF) >> shift
+        bitmap[h >> 3] |= 1 << (h & 7)
+    return int.from_bytes(bitmap, "little")
+
+
+def _signature_bits(count: int) -> int:
+    # About four bits per trigram keeps false positives rare
+    return min(max((4 * count).bit_length(), 8), 20)
+
+
+def required_literals(pattern: str) -> list[str]:
+    """Literal runs every match of a regex must contain.
+
+    This is deliberately conservative: alternation gives up entirely,
+    groups and character classes are skipped, and a character made
+    optional by a quantifier ends the run before it.
+    """
+    runs: list[str] = []
+    current = ""
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "\\" and i + 1 < len(pattern):
+            escaped = pattern[i + 1]
+            i += 2
+            if depth:
+                continue
+            if escaped.isalnum():
+                # \d, \w, \b, backreferences and the like
+                runs.append(current)
+                current = ""
+            else:
+                current += escaped
+            continue
+        i += 1
+        if char == "|":
+            return []
+        if char == "(":
+            depth += 1
+            runs.append(current)
+            current = ""
+        elif char == ")":
+            depth = max(depth - 1, 0)
+        elif depth:
+            continue
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            i = len(pattern) if end == -1 else end + 1
+            runs.append(current)
+            current = ""
+        elif char in "?*{":
+            runs.append(current[:-1])
+            current = ""
+            if char == "{":
+                end = pattern.find("}", i)
+                i = len(pattern) if end == -1 else end + 1
+        elif char in _REGEX_META:
+            runs.append(current)
+            current = ""
+        else:
+            current += char
+    runs.append(current)
+    return [run for run in runs if len(run) >= 3]
+
+
+@dataclass
+class _FileEntry:
+    mtime_ns: int
+    size: int
+    binary: bool
+    # log2 of the signature size
+    bits: int
+    # None for binary files and text files too large to index
+    signature: int | None
+
+
+@dataclass
+class Match:
+    """Lines of one file that matched a search."""
+
+    path: str
+    # 1-based numbers of the matching lines
+    lines: list[int] = field(default_factory=list)
+    # Text of the matching lines and the context around them
+    text: dict[int, str] = field(default_factory=dict)
+
+
+class TrigramIndex:
+    """Trigram index of the text files under a root directory.
+
+    `update` brings the index up to date by comparing every file's mtime
+    and size with the indexed ones, so only new or changed files are
+    read. Each file is summarized by a signature of its trigrams, and a
+    query only searches files whose signature contains every trigram of
+    the literals a match requires. The index is saved to `index_dir` after each
+    update that changed it and reloaded from there by the next process
+    that searches the same root.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        index_dir: str | None = None,
+        workers: int | None = None,
+    ):
+        self.root = os.path.abspath(root)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.path = None
+        if index_dir is not None:
+            digest = hashlib.sha1(self.root.encode()).hexdigest()[:16]
+            self.path = os.path.join(index_dir, f"{digest}.idx")
+        self.files: dict[str, _FileEntry] = {}
+        self._listing_cache = DirectoryCache()
+        self._lock = threading.Lock()
+        self.indexed = 0
+        self._load()
+
+    def _load(self) -> None:
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                version, root, files = marshal.load(f)
+        except Exception:
+            return  # A stale or corrupt index is rebuilt
+        if version != _INDEX_VERSION or root != self.root:
+            return
+        for rel_path, (mtime_ns, size, binary, bits, sig) in files.items():
+            if sig is not None:
+                sig = int.from_bytes(sig, "little")
+            entry = _FileEntry(mtime_ns, size, binary, bits, sig)
+            self.files[rel_path] = entry
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        # Signatures are stored as bytes, which marshal far faster than
+        # large integers
+        files = {}
+        for rel_path, e in self.files.items():
+            sig = None
+            if e.signature is not None:
+                sig = e.signature.to_bytes(1 << max(e.bits - 3, 0), "little")
+            files[rel_path] = (e.mtime_ns, e.size, e.binary, e.bits, sig)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with atomic_writer(self.path) as f:
+            marshal.dump((_INDEX_VERSION, self.root, files), f)
+
+    def _index_file(self, rel_path: str) -> tuple[str, _FileEntry | None]:
+        path = os.path.join(self.root, rel_path)
+        try:
+            with open(path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                kind = sniff_bytes(f.read(SNIFF_BYTES), stat.st_size)
+                binary = kind.binary
+                bits, sig = 0, None
+                # Trigrams are of UTF-8 text; other encodings stay unindexed
+                indexable = kind.encoding == "utf-8"
+                if indexable and stat.st_size <= MAX_INDEXED_BYTES:
+                    f.seek(0)
+                    grams = trigrams(f.read())
+                    bits = _signature_bits(len(grams))
+                    sig = signature(grams, bits)
+        except OSError:
+            return rel_path, None
+        entry = _FileEntry(stat.st_mtime_ns, stat.st_size, binary, bits, sig)
+        return rel_path, entry
+
+    def update(self) -> bool:
+        """Reindex new and changed files and drop deleted ones.
+
+        Returns:
+            Whether the index changed
+        """
+        with self._lock:
+            listing = list_directory(
+                self.root, "**", cache=self._listing_cache
+            )
+            stale = []
+            current = set()
+            for rel_path, is_dir in listing.entries:
+                if is_dir:
+                    continue
+                current.add(rel_path)
+                entry = self.files.get(rel_path)
+                try:
+                    stat = os.stat(os.path.join(self.root, rel_path))
+                except OSError:
+                    continue
+                if entry is None or (entry.mtime_ns, entry.size) != (
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                ):
+                    stale.append(rel_path)
+
+            removed = [p for p in self.files if p not in current]
+            for rel_path in removed:
+                del self.files[rel_path]
+            with ThreadPoolExecutor(self.workers) as pool:
+                for rel_path, entry in pool.map(self._index_file, stale):
+                    if entry is None:
+                        self.files.pop(rel_path, None)
+                    else:
+                        self.files[rel_path] = entry
+            self.indexed += len(stale)
+
+            changed = bool(stale or removed)
+            if changed:
+                self._save()
+            return changed
+
+    def candidates(self, literals: list[str]) -> list[str]:
+        """Text files that may contain every literal, sorted by path.
+
+        Text files too large to index are always included; binary files
+        never are.
+        """
+        required: set[tuple[int, int, int]] = set()
+        for literal in literals:
+            required |= trigrams(literal.encode("utf-8"))
+        # Query signature per signature size
+        masks: dict[int, int] = {}
+        paths = []
+        with self._lock:
+            for rel_path, entry in self.files.items():
+                if entry.binary:
+                    continue
+                if entry.signature is not None:
+                    mask = masks.get(entry.bits)
+                    if mask is None:
+                        mask = masks[entry.bits] = signature(
+                            required, entry.bits
+                        )
+                    if entry.signature & mask != mask:
+                        continue
+                paths.append(rel_path)
+        return sorted(paths)
+
+    def search(
+        self,
+        regex: re.Pattern,
+        literals: list[str],
+        include: re.Pattern | None = None,
+        context: int = 0,
+    ) -> list[Match]:
+        """Search the candidate files in parallel.
+
+        Args:
+            regex: Compiled pattern, matched line by line
+            literals: Text every match contains, used to pick candidates
+            include: Only search relative paths matching this
+            context: Lines of context to keep around each match
+
+        Returns:
+            Files with at least one matching line, in path order
+        """
+        paths = self.candidates(literals)
+        if include is not None:
+            paths = [p for p in paths if include.match(p)]
+
+        def scan(rel_path: str) -> Match | None:
+            try:
+                with open(os.path.join(self.root, rel_path), "rb") as f:
+                    data = f.read()
+            except OSError:
+                return None
+            kind = sniff_bytes(data[:SNIFF_BYTES], len(data))
+            if kind.binary:
+                return None
+            text = str(data[len(kind.bom) :], kind.encoding, "replace")
+            if not regex.search(text):
+                return None
+            match = Match(rel_path)
+            lines = text.splitlines()
+            for number, line in enumerate(lines, 1):
+                if regex.search(line):
+                    match.lines.append(number)
+                    start = max(number - context, 1)
+                    end = min(number + context, len(lines))
+                    for near in range(start, end + 1):
+                        match.text[near] = lines[near - 1]
+            return match if match.lines else None
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            return [m for m in pool.map(scan, paths) if m is not None]
+
+
+_indexes: dict[tuple[str, str | None], TrigramIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index(root: str, index_dir: str | None) -> TrigramIndex:
+    """Index for a root, shared by every search in this process."""
+    key = (os.path.abspath(root), index_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = TrigramIndex(root, index_dir)
+        return index
@@ -0,0 +1,135 @@
+"""Local token estimation for message history bookkeeping."""
+
+import functools
+import json
+import math
+import re
+from abc import ABC, abstractmethod
+from typing import Any
+
+_CJK = "\u3040-\u30ff\u3400-\u9fff\uac00-\ud7af"
+# CJK characters, word runs, digit runs and single punctuation marks
+_PIECE_RE = re.compile(rf"[{_CJK}]|[^\W\d_{_CJK}]+|\d+|[^\w\s]")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+
+MESSAGE_OVERHEAD_TOKENS = 4
+IMAGE_TOKENS = 1600
+DOCUMENT_TOKENS = 2000
+
+
+class TokenEstimator(ABC):
+    """Base class for local token estimators.
+
+    Subclasses implement estimate_text; message and content estimates are
+    built from it. Estimates may be calibrated against the token counts
+    the API reports in `usage`.
+    """
+
+    @abstractmethod
+    def estimate_text(self, text: str) -> int:
+        """Estimate the number of tokens in a string."""
+
+    def calibrate(self, estimated: int, actual: int) -> None:
+        """Adjust future estimates given an estimate and the real count."""
+
+    def estimate_content(self, content: Any) -> int:
+        """Estimate tokens for message content (a string or block list)."""
+        if isinstance(content, str):
+            return self.estimate_text(content)
+        total = 0
+        for block in content or []:
+            if hasattr(block, "model_dump"):
+                block = block.model_dump()
+            total += self._estimate_block(block)
+        return total
+
+    def _estimate_block(self, block: dict[str, Any]) -> int:
+        block_type = block.get("type")
+        if block_type == "text":
+            return self.estimate_text(block.get("text", ""))
+        if block_type == "image":
+            return IMAGE_TOKENS
+        if block_type == "document":
+            return DOCUMENT_TOKENS
+        if block_type == "tool_use":
+            arguments = json.dumps(block.get("input", {}), sort_keys=True)
+            return self.estimate_text(block.get("name", "")) + (
+                self.estimate_text(arguments)
+            )
+        if block_type == "tool_result":
+            return self.estimate_content(block.get("content", ""))
+        if block_type == "thinking":
+            return self.estimate_text(block.get("thinking", ""))
+        fields = {k: v for k, v in block.items() if k != "cache_control"}
+        return self.estimate_text(json.dumps(fields, default=str))
+
+    def estimate_message(self, message: dict[str, Any]) -> int:
+        """Estimate tokens for one message, including role overhead."""
+        return MESSAGE_OVERHEAD_TOKENS + self.estimate_content(
+            message.get("content", "")
+        )
+
+
+class HeuristicTokenEstimator(TokenEstimator):
+    """Fast lexical estimate, memoized per string and calibrated online.
+
+    Text is split into word, digit, CJK and punctuation pieces; long words
+    cost roughly one token per `chars_per_token` characters. A scale factor
+    learned from observed usage corrects for the real tokenizer.
+    """
+
+    def __init__(
+        self,
+        chars_per_token: float = 4.0,
+        cache_size: int = 4096,
+        smoothing: float = 0.2,
+        min_scale: float = 0.5,
+        max_scale: float = 2.0,
+    ):
+        """Initialize the estimator.
+
+        Args:
+            chars_per_token: Characters per token within a word
+            cache_size: Number of distinct strings to memoize
+            smoothing: Weight given to each new calibration sample
+            min_scale: Lower bound for the calibrated scale
+            max_scale: Upper bound for the calibrated scale
+        """
+        self.chars_per_token = chars_per_token
+        self.smoothing = smoothing
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.scale = 1.0
+        self.samples = 0
+        self._count = functools.lru_cache(maxsize=cache_size)(self._count_raw)
+
+    def _count_raw(self, text: str) -> int:
+        count = 0
+        for piece in _PIECE_RE.findall(text):
+            if len(piece) == 1 or _CJK_RE.match(piece):
+                count += 1
+            elif piece.isdigit():
+                count += math.ceil(len(piece) / 3)
+            else:
+                count += math.ceil(len(piece) / self.chars_per_token)
+        return count
+
+    def estimate_text(self, text: str) -> int:
+        if not text:
+            return 0
+        return max(1, round(self._count(text) * self.scale))
+
+    def calibrate(self, estimated: int, actual: int) -> None:
+        if estimated <= 0 or actual <= 0:
+            return
+        ratio = actual / estimated
+        # Plain average over the first few samples, then an EMA
+        weight = max(self.smoothing, 1 / (self.samples + 1))
+        scale = self.scale * (1 - weight + weight * ratio)
+        self.scale = min(self.max_scale, max(self.min_scale, scale))
+        self.samples += 1
+
+    @property
+    def cache_info(self) -> Any:
+        """Hit and miss statistics of the per-string cache."""
+        return self._count.cache_info()
@@ -1,8 +1,15 @@
 """Tool execution utility with parallel execution support."""
 
 import asyncio
+import contextlib
+import contextvars
+import time
+import weakref
 from typing import Any
 
+from ..tools.base import ALL_RESOURCES, WRITE, Effect
+from . import tracing
+
 
 async def _execute_single_tool(
     call: Any, tool_dict: dict[str, Any]
@@ -11,8 +18,8 @@ async def _execute_single_tool(
     response = {"type": "tool_result", "tool_use_id": call.id}
 
     try:
-        # Execute the tool directly
-        result = await tool_dict[call.name].execute(**call.input)
+        tool = tool_dict[call.name]
+        result = await tool.execute(**call.input)
         response["content"] = str(result)
     except KeyError:
         response["content"] = f"Tool '{call.name}' not found"
@@ -24,16 +31,333 @@ async def _execute_single_tool(
     return response
 
 
+def _error_result(call: Any, message: str) -> dict[str, Any]:
+    return {
+        "type": "tool_result",
+        "tool_use_id": call.id,
+        "content": message,
+        "is_error": True,
+    }
+
+
+def _overlaps(a: str, b: str) -> bool:
+    if ALL_RESOURCES in (a, b) or a == b:
+        return True
+    return a.startswith(b + "/") or b.startswith(a + "/")
+
+
+def _conflicts(first: list[Effect], second: list[Effect]) -> bool:
+    """Whether two calls must not run concurrently."""
+    return any(
+        WRITE in (mode_a, mode_b) and _overlaps(key_a, key_b)
+        for mode_a, key_a in first
+        for mode_b, key_b in second
+    )
+
+
+class _EffectGraph:
+    """Orders each submitted call after earlier calls it conflicts with."""
+
+    def __init__(self, scheduler: "ToolScheduler", tool_dict: dict[str, Any]):
+        self.scheduler = scheduler
+        self.tool_dict = tool_dict
+        self._submitted: list[tuple[list[Effect], asyncio.Task]] = []
+
+    def _effects(self, call: Any) -> list[Effect]:
+        tool = self.tool_dict.get(call.name)
+        try:
+            return list(tool.effects(**call.input))
+        except Exception:
+            # Unknown tool or bad input; the call itself reports the error
+            return []
+
+    def submit(self, call: Any) -> asyncio.Task:
+        effects = self._effects(call)
+        after = [
+            task
+            for earlier, task in self._submitted
+            if _conflicts(earlier, effects)
+        ]
+        task = self.scheduler.submit(call, self.tool_dict, after)
+        self._submitted.append((effects, task))
+        return task
+
+
+class ToolScheduler:
+    """Run tool calls under concurrency limits and deadlines.
+
+    A global semaphore caps how many calls run at once and per-tool
+    semaphores protect individual backends. Each call gets a timeout, and
+    a whole batch can be given a deadline; calls that time out, miss the
+    deadline or are cancelled come back as is_error results instead of
+    holding up the turn.
+
+    Limits and timeouts are looked up by tool name in `tool_limits` and
+    `tool_timeouts`, then on the tool's own `max_concurrency` and
+    `timeout` attributes, then fall back to the scheduler defaults.
+    One scheduler can be shared by many agents to cap load across them.
+
+    Within a batch, a call waits for earlier calls whose declared effects
+    (Tool.effects) conflict with its own, so a read of a file follows a
+    write to it in the same turn while independent calls overlap.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int | None = 16,
+        timeout: float | None = 300.0,
+        turn_timeout: float | None = None,
+        tool_limits: dict[str, int] | None = None,
+        tool_timeouts: dict[str, float] | None = None,
+    ):
+        """Initialize the scheduler.
+
+        Args:
+            max_concurrency: Calls running at once across all tools
+                             (None for no limit)
+            timeout: Default seconds a single call may run
+            turn_timeout: Seconds a whole batch of calls may take
+            tool_limits: Concurrent calls allowed per tool name
+            tool_timeouts: Timeout per tool name
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.turn_timeout = turn_timeout
+        self.tool_limits = dict(tool_limits or {})
+        self.tool_timeouts = dict(tool_timeouts or {})
+        # Semaphores bind to the loop they are first used on, so each loop
+        # (e.g. every Agent.run) gets its own set, created on first use
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str | None, asyncio.Semaphore | None]
+        ] = weakref.WeakKeyDictionary()
+
+    def _semaphore(
+        self, name: str | None, tool: Any = None
+    ) -> asyncio.Semaphore | None:
+        """The running loop's semaphore for a tool, or the global one for None."""
+        semaphores = self._semaphores.setdefault(
+            asyncio.get_running_loop(), {}
+        )
+        if name not in semaphores:
+            if name is None:
+                limit = self.max_concurrency
+            else:
+                limit = self.tool_limits.get(
+                    name, getattr(tool, "max_concurrency", None)
+                )
+            semaphores[name] = asyncio.Semaphore(limit) if limit else None
+        return semaphores[name]
+
+    def _timeout_for(self, name: str, tool: Any) -> float | None:
+        if name in self.tool_timeouts:
+            return self.tool_timeouts[name]
+        timeout = getattr(tool, "timeout", None)
+        return self.timeout if timeout is None else timeout
+
+    async def _run(
+        self,
+        call: Any,
+        tool_dict: dict[str, Any],
+        after: list[asyncio.Task],
+    ) -> Any:
+        with tracing.span(
+            "tool.execute", tool=call.name, tool_use_id=call.id
+        ) as span:
+            queued = time.perf_counter()
+            if after:
+                await asyncio.wait(after)
+            tool = tool_dict.get(call.name)
+            cache, key = getattr(tool, "result_cache", None), None
+            if cache is not None:
+                # Cache hits don't queue behind slow calls of the same tool
+                try:
+                    key, cached = cache.lookup(tool, call.input)
+                except Exception:
+                    # Bad input; the call itself reports the error
+                    cache = None
+                else:
+                    span.set("cache_hit", cached is not None)
+                    if cached is not None:
+                        span.set("is_error", False)
+                        return {
+                            "type": "tool_result",
+                            "tool_use_id": call.id,
+                            "content": cached,
+                        }
+            per_tool = self._semaphore(call.name, tool)
+            # Calls queued behind their tool's limit hold no global slot
+            async with per_tool or contextlib.nullcontext():
+                async with self._semaphore(None) or contextlib.nullcontext():
+                    # Time spent waiting on earlier calls and free slots
+                    span.set("queue_ms", (time.perf_counter() - queued) * 1000)
+                    timeout = self._timeout_for(call.name, tool)
+                    try:
+                        result = await asyncio.wait_for(
+                            _execute_single_tool(call, tool_dict), timeout
+                        )
+                    except asyncio.TimeoutError:
+                        span.set("timed_out", True)
+                        result = _error_result(
+                            call,
+                            f"Tool '{call.name}' timed out after {timeout:g}s",
+                        )
+            is_error = bool(result.get("is_error"))
+            if cache is not None:
+                cache.store(key, result["content"], is_error)
+            span.set("is_error", is_error)
+            return result
+
+    def submit(
+        self,
+        call: Any,
+        tool_dict: dict[str, Any],
+        after: list[asyncio.Task] | None = None,
+    ) -> asyncio.Task:
+        """Start a call; it waits for free slots before executing.
+
+        Args:
+            call: The tool_use block to execute
+            tool_dict: Tools by name
+            after: Tasks that must finish before this call starts
+        """
+        return asyncio.create_task(self._run(call, tool_dict, after or []))
+
+    async def gather(
+        self,
+        tool_calls: list[Any],
+        tasks: list[asyncio.Task],
+        turn_timeout: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """Wait for submitted calls, turning stragglers into errors.
+
+        Calls still running when the turn deadline passes are cancelled,
+        as are all of them if the wait itself is cancelled.
+        """
+        if turn_timeout is None:
+            turn_timeout = self.turn_timeout
+        try:
+            if tasks:
+                await asyncio.wait(tasks, timeout=turn_timeout)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        results = []
+        for call, task in zip(tool_calls, tasks):
+            if not task.done():
+                results.append(
+                    _error_result(
+                        call,
+                        f"Tool '{call.name}' did not finish within the "
+                        f"{turn_timeout:g}s turn deadline",
+                    )
+                )
+            elif task.cancelled():
+                results.append(
+                    _error_result(call, f"Tool '{call.name}' was cancelled")
+                )
+            elif task.exception() is not None:
+                results.append(
+                    _error_result(
+                        call, f"Error executing tool: {task.exception()}"
+                    )
+                )
+            else:
+                results.append(task.result())
+        return results
+
+    async def run(
+        self,
+        tool_calls: list[Any],
+        tool_dict: dict[str, Any],
+        parallel: bool = True,
+        turn_timeout: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """Execute calls and return one tool_result per call, in order.
+
+        In parallel mode, calls whose declared effects conflict run in
+        the order given while the others run concurrently.
+        """
+        if parallel:
+            graph = _EffectGraph(self, tool_dict)
+            tasks = [graph.submit(call) for call in tool_calls]
+            return await self.gather(tool_calls, tasks, turn_timeout)
+
+        if turn_timeout is None:
+            turn_timeout = self.turn_timeout
+        loop = asyncio.get_running_loop()
+        deadline = None if turn_timeout is None else loop.time() + turn_timeout
+        results = []
+        for call in tool_calls:
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                results.append(
+                    _error_result(
+                        call,
+                        f"Tool '{call.name}' did not start within the "
+                        f"{turn_timeout:g}s turn deadline",
+                    )
+                )
+                continue
+            task = self.submit(call, tool_dict)
+            results += await self.gather([call], [task], remaining)
+        return results
+
+
 async def execute_tools(
-    tool_calls: list[Any], tool_dict: dict[str, Any], parallel: bool = True
+    tool_calls: list[Any],
+    tool_dict: dict[str, Any],
+    parallel: bool = True,
+    scheduler: ToolScheduler | None = None,
 ) -> list[dict[str, Any]]:
-    """Execute multiple tools sequentially or in parallel."""
+    """Execute multiple tools sequentially or in parallel.
+
+    Calls run through `scheduler`, or a default ToolScheduler, so they
+    are subject to its concurrency limits and timeouts.
+    """
+    scheduler = scheduler or ToolScheduler()
+    return await scheduler.run(tool_calls, tool_dict, parallel)
+
+
+class ToolDispatcher:
+    """Start tool calls as soon as they arrive and collect them in order.
+
+    Used while streaming: each tool_use block is submitted the moment its
+    input is complete, so tools run while the model is still generating.
+    Calls start in the context the dispatcher was created in, so their
+    spans belong to the turn rather than to the streaming API call.
+    """
 
-    if parallel:
-        return await asyncio.gather(
-            *[_execute_single_tool(call, tool_dict) for call in tool_calls]
+    def __init__(
+        self,
+        tool_dict: dict[str, Any],
+        scheduler: ToolScheduler | None = None,
+    ):
+        self.tool_dict = tool_dict
+        self.scheduler = scheduler or ToolScheduler()
+        self._graph = _EffectGraph(self.scheduler, tool_dict)
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._context = contextvars.copy_context()
+
+    def submit(self, call: Any) -> None:
+        """Start executing a tool call if it hasn't been started yet."""
+        if call.id not in self._tasks:
+            self._tasks[call.id] = self._context.run(self._graph.submit, call)
+
+    @property
+    def dispatched(self) -> int:
+        """Number of tool calls started so far."""
+        return len(self._tasks)
+
+    async def results(self, tool_calls: list[Any]) -> list[dict[str, Any]]:
+        """Wait for the given calls, starting any that were missed."""
+        for call in tool_calls:
+            self.submit(call)
+        return await self.scheduler.gather(
+            tool_calls, [self._tasks[call.id] for call in tool_calls]
         )
-    else:
-        return [
-            await _execute_single_tool(call, tool_dict) for call in tool_calls
-        ]
+
+    def cancel(self) -> None:
+        """Cancel every tool call still running."""
+        for task in self._tasks.values():
+            task.cancel()
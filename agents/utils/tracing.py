@@ -0,0 +1,289 @@
+"""Structured tracing of agent turns, API calls and tool executions."""
+
+import asyncio
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+_current_span: contextvars.ContextVar["Span | None"] = (
+    contextvars.ContextVar("current_span", default=None)
+)
+_current_tracer: contextvars.ContextVar["Tracer | None"] = (
+    contextvars.ContextVar("current_tracer", default=None)
+)
+
+
+@dataclass
+class Span:
+    """One timed operation, with OpenTelemetry-style ids and fields."""
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None = None
+    start_time_unix_nano: int = 0
+    end_time_unix_nano: int | None = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    events: list[dict[str, Any]] = field(default_factory=list)
+    # "ok", "error" or "cancelled"
+    status: str = "ok"
+    _start: float = field(default=0.0, repr=False)
+    _end: float | None = field(default=None, repr=False)
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        self.events.append(
+            {
+                "name": name,
+                "time_unix_nano": time.time_ns(),
+                "attributes": attributes,
+            }
+        )
+
+    @property
+    def duration(self) -> float | None:
+        """Seconds the span lasted, once it has ended."""
+        if self._end is None:
+            return None
+        return self._end - self._start
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_time_unix_nano,
+            "end_time_unix_nano": self.end_time_unix_nano,
+            "duration_ms": (
+                None if self.duration is None else self.duration * 1000
+            ),
+            "attributes": self.attributes,
+            "events": self.events,
+            "status": self.status,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when no tracer is active."""
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, **attributes: Any) -> None:
+        pass
+
+    def add_event(self, name: str, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter:
+    """Receives spans as they start and end."""
+
+    def on_start(self, span: Span) -> None:
+        """Called when a span starts; most exporters only need export."""
+
+    def export(self, span: Span) -> None:
+        """Called once a span has ended."""
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        """Flush and release resources."""
+
+
+class RingBufferExporter(SpanExporter):
+    """Keep the most recent spans in memory."""
+
+    def __init__(self, capacity: int = 1000):
+        self._spans: deque[Span] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, name: str | None = None) -> list[Span]:
+        """Buffered spans, oldest first, optionally only those named name."""
+        with self._lock:
+            return [s for s in self._spans if name is None or s.name == name]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class JSONLExporter(SpanExporter):
+    """Append each finished span to a file as one JSON object per line."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class OpenTelemetryExporter(SpanExporter):
+    """Mirror spans into an OpenTelemetry tracer.
+
+    Requires the opentelemetry-api package; configure the SDK and its
+    exporters (OTLP, Jaeger, ...) as usual and pass a tracer from it, or
+    let this use the global tracer provider.
+    """
+
+    def __init__(self, tracer: Any = None):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryExporter requires the opentelemetry-api "
+                "package: pip install opentelemetry-api opentelemetry-sdk"
+            ) from e
+        self._trace = trace
+        self._tracer = tracer or trace.get_tracer("agents")
+        # span_id -> OpenTelemetry span, while it is open
+        self._open: dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def on_start(self, span: Span) -> None:
+        with self._lock:
+            parent = self._open.get(span.parent_id)
+        context = None
+        if parent is not None:
+            context = self._trace.set_span_in_context(parent)
+        otel_span = self._tracer.start_span(
+            span.name,
+            context=context,
+            start_time=span.start_time_unix_nano,
+        )
+        with self._lock:
+            self._open[span.span_id] = otel_span
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            otel_span = self._open.pop(span.span_id, None)
+        if otel_span is None:
+            return
+        for key, value in span.attributes.items():
+            otel_span.set_attribute(key, _otel_value(value))
+        for event in span.events:
+            otel_span.add_event(
+                event["name"],
+                {k: _otel_value(v) for k, v in event["attributes"].items()},
+                timestamp=event["time_unix_nano"],
+            )
+        if span.status != "ok":
+            from opentelemetry.trace import Status, StatusCode
+
+            otel_span.set_status(Status(StatusCode.ERROR, span.status))
+        otel_span.end(end_time=span.end_time_unix_nano)
+
+
+def _otel_value(value: Any) -> Any:
+    # OpenTelemetry attributes are primitives or lists of them
+    primitive = (bool, int, float, str)
+    if value is None:
+        return ""
+    if isinstance(value, primitive):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [v if isinstance(v, primitive) else str(v) for v in value]
+    return str(value)
+
+
+class Tracer:
+    """Create spans and hand them to exporters.
+
+    Spans opened while another is active become its children, including
+    across asyncio tasks started inside it, so tool executions nest
+    under the turn that requested them. Library code that should not
+    depend on a tracer uses the module-level `span` and `current_span`,
+    which do nothing unless a tracer's span is active.
+    """
+
+    def __init__(self, exporters: list[SpanExporter] | None = None):
+        self.exporters = list(exporters or [])
+
+    @contextlib.contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Span]:
+        """Time the enclosed block as a span."""
+        parent = _current_span.get()
+        span = Span(
+            name=name,
+            trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+            span_id=os.urandom(8).hex(),
+            parent_id=parent.span_id if parent else None,
+            start_time_unix_nano=time.time_ns(),
+            attributes=attributes,
+            _start=time.perf_counter(),
+        )
+        self._notify("on_start", span)
+        span_token = _current_span.set(span)
+        tracer_token = _current_tracer.set(self)
+        try:
+            yield span
+        except BaseException as e:
+            cancelled = isinstance(e, asyncio.CancelledError)
+            span.status = "cancelled" if cancelled else "error"
+            span.set("error", f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_tracer.reset(tracer_token)
+            _current_span.reset(span_token)
+            span._end = time.perf_counter()
+            span.end_time_unix_nano = time.time_ns()
+            self._notify("export", span)
+
+    def _notify(self, method: str, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                getattr(exporter, method)(span)
+            except Exception as e:
+                # Tracing must never break the agent
+                print(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+    def shutdown(self) -> None:
+        """Flush and close every exporter."""
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    """A child span of the active tracer, or a no-op outside any trace."""
+    tracer = _current_tracer.get()
+    if tracer is None:
+        yield NOOP_SPAN
+        return
+    with tracer.span(name, **attributes) as child:
+        yield child
+
+
+def current_span() -> Span | _NoopSpan:
+    """The innermost active span, or a no-op span."""
+    return _current_span.get() or NOOP_SPAN
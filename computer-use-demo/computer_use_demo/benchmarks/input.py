@@ -0,0 +1,66 @@
+"""Benchmark mouse input against the running X display.
+
+Compares moving the pointer through the persistent libxdo channel with
+spawning `xdotool mousemove --sync` for every move. Run inside the
+container, where Xvfb serves $DISPLAY_NUM, with:
+
+    python -m computer_use_demo.benchmarks.input --runs 100
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from ..tools.computer import ComputerTool20250124
+from ..tools.run import run
+from ..tools.xdo import XdoChannel
+
+
+async def _time_xdotool(tool: ComputerTool20250124, runs: int) -> list[float]:
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await run(f"{tool.xdotool} mousemove --sync {i % 100 + 10} 10")
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+async def _time_channel(channel: XdoChannel, runs: int) -> list[float]:
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        await asyncio.to_thread(channel.run, [("mousemove", i % 100 + 10, 20)])
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _describe(name: str, timings: list[float]) -> str:
+    return (
+        f"{name:<9} mean {statistics.mean(timings) * 1000:7.2f}ms  "
+        f"max {max(timings) * 1000:7.2f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=100)
+    args = parser.parse_args()
+
+    tool = ComputerTool20250124()
+    channel = XdoChannel.open(tool.display_num)
+    if channel is None:
+        raise SystemExit(f"cannot open libxdo on display :{tool.display_num}")
+
+    in_process = asyncio.run(_time_channel(channel, args.runs))
+    spawned = asyncio.run(_time_xdotool(tool, args.runs))
+    channel.close()
+
+    print(f"display :{tool.display_num}, {args.runs} moves")
+    print(_describe("libxdo", in_process))
+    print(_describe("xdotool", spawned))
+    print(f"speedup   {statistics.mean(spawned) / statistics.mean(in_process):.0f}x")
+
+
+if __name__ == "__main__":
+    main()
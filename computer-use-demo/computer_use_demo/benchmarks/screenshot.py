@@ -0,0 +1,60 @@
+"""Benchmark screenshots against the running X display.
+
+Compares the in-process capture (XShm/XGetImage, resized and encoded in
+memory) with the gnome-screenshot/scrot and ImageMagick fallback. Run
+inside the container, where Xvfb serves $DISPLAY_NUM, with:
+
+    python -m computer_use_demo.benchmarks.screenshot --runs 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from ..tools.computer import ComputerTool20250124
+from ..tools.screen import ScreenCapture
+
+
+async def _time(screenshot, runs: int) -> tuple[list[float], int]:
+    await screenshot()  # warm up
+    timings = []
+    size = 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await screenshot()
+        timings.append(time.perf_counter() - start)
+        size = len(result.base64_image or "")
+    return timings, size
+
+
+def _describe(name: str, timings: list[float], size: int) -> str:
+    return (
+        f"{name:<12} mean {statistics.mean(timings) * 1000:7.1f}ms  "
+        f"max {max(timings) * 1000:7.1f}ms  {size:>9,} base64 bytes"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    tool = ComputerTool20250124()
+    capture = ScreenCapture.open(tool.display_num)
+    if capture is None:
+        raise SystemExit(f"cannot capture display :{tool.display_num}")
+    backend = "XShm" if capture.uses_shm else "XGetImage"
+    capture.close()
+
+    in_process, in_process_size = asyncio.run(_time(tool.screenshot, args.runs))
+    tools, tools_size = asyncio.run(_time(tool._screenshot_with_tools, args.runs))
+
+    print(f"display :{tool.display_num} {tool.width}x{tool.height}, {args.runs} runs")
+    print(_describe(backend, in_process, in_process_size))
+    print(_describe("external", tools, tools_size))
+    print(f"speedup      {statistics.mean(tools) / statistics.mean(in_process):.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 from .base import CLIResult, ToolResult
 from .bash import BashTool20241022, BashTool20250124
 from .collection import ToolCollection
-from .computer import ComputerTool20241022, ComputerTool20250124
+from .computer import ComputerTool20241022, ComputerTool20250124, ComputerTool20251124
 from .edit import EditTool20241022, EditTool20250124, EditTool20250429, EditTool20250728
 from .groups import TOOL_GROUPS_BY_VERSION, ToolVersion
 
@@ -11,6 +11,7 @@ __ALL__ = [
     CLIResult,
     ComputerTool20241022,
     ComputerTool20250124,
+    ComputerTool20251124,
     EditTool20241022,
     EditTool20250124,
     EditTool20250429,
@@ -1,22 +1,64 @@
 import asyncio
 import base64
+import io
 import os
-import shlex
 import shutil
+import threading
+import time
+from dataclasses import dataclass
 from enum import StrEnum
 from pathlib import Path
 from typing import Literal, TypedDict, cast, get_args
 from uuid import uuid4
 
 from anthropic.types.beta import BetaToolComputerUse20241022Param, BetaToolUnionParam
+from PIL import Image
 
 from .base import BaseAnthropicTool, ToolError, ToolResult
 from .run import run
+from .screen import (
+    CaptureError,
+    ScreenCapture,
+    changed_cells,
+    encode_png,
+    sample,
+)
+from .xdo import (
+    InputError,
+    Step,
+    XdoChannel,
+    xdotool_commands,
+)
 
 OUTPUT_DIR = "/tmp/outputs"
 
-TYPING_DELAY_MS = 12
-TYPING_GROUP_SIZE = 50
+# Sent instead of a follow-up screenshot that matches the last one sent
+SCREEN_UNCHANGED = "The screen has not changed since the last screenshot."
+
+# Tool instances are rebuilt on every turn (see loop.sampling_loop), so the
+# in-process backends belong to the display rather than to a tool: each one
+# holds an X connection, and a capture a full-screen shared memory segment.
+# None marks a display whose backend could not be opened or has failed.
+_captures: dict[int | None, ScreenCapture | None] = {}
+_channels: dict[int | None, XdoChannel | None] = {}
+_backends_lock = threading.Lock()
+
+
+def _shared_backend(backends: dict, display_num: int | None, open_backend):
+    """The display's backend from backends, opened on first use."""
+    with _backends_lock:
+        if display_num not in backends:
+            backends[display_num] = open_backend(display_num)
+        return backends[display_num]
+
+
+def _discard_backend(backends: dict, display_num: int | None, backend) -> None:
+    """Close a failed backend, and stop handing it out for the display."""
+    with _backends_lock:
+        if backends.get(display_num) is backend:
+            backends[display_num] = None
+    backend.close()
+
 
 Action_20241022 = Literal[
     "key",
@@ -43,6 +85,8 @@ Action_20250124 = (
     ]
 )
 
+Action_20251124 = Action_20250124 | Literal["zoom"]
+
 ScrollDirection = Literal["up", "down", "left", "right"]
 
 
@@ -59,12 +103,13 @@ MAX_SCALING_TARGETS: dict[str, Resolution] = {
     "FWXGA": Resolution(width=1366, height=768),  # ~16:9
 }
 
-CLICK_BUTTONS = {
-    "left_click": 1,
-    "right_click": 3,
-    "middle_click": 2,
-    "double_click": "--repeat 2 --delay 10 1",
-    "triple_click": "--repeat 3 --delay 10 1",
+# (button, repeat, milliseconds between clicks) for each click action
+CLICK_BUTTONS: dict[str, tuple[int, int, int | None]] = {
+    "left_click": (1, 1, None),
+    "right_click": (3, 1, None),
+    "middle_click": (2, 1, None),
+    "double_click": (1, 2, 10),
+    "triple_click": (1, 3, 10),
 }
 
 
@@ -79,8 +124,22 @@ class ComputerToolOptions(TypedDict):
     display_number: int | None
 
 
-def chunks(s: str, chunk_size: int) -> list[str]:
-    return [s[i : i + chunk_size] for i in range(0, len(s), chunk_size)]
+@dataclass(frozen=True)
+class ScreenSettle:
+    """How long an action's follow-up screenshot waited for the screen."""
+
+    elapsed: float
+    # False when the maximum wait ran out, or the screen could not be sampled
+    settled: bool
+    samples: int = 0
+    # whether the screen changed at all since before the action
+    changed: bool = False
+
+
+def _with_screenshot(result: ToolResult, screenshot: ToolResult) -> ToolResult:
+    """The action's result with its follow-up screenshot, or the note replacing it."""
+    output = "\n".join(filter(None, [result.output, screenshot.output]))
+    return result.replace(output=output or None, base64_image=screenshot.base64_image)
 
 
 class BaseComputerTool:
@@ -94,8 +153,22 @@ class BaseComputerTool:
     height: int
     display_num: int | None
 
+    # longest to wait for the screen to settle before a follow-up screenshot
     _screenshot_delay = 2.0
+    # the screen has settled once samples stop changing for _settle_quiet
+    _settle_interval = 0.05
+    _settle_quiet = 0.2
+    # sample cells allowed to change between settled frames (e.g. a blinking caret)
+    _settle_tolerance = 4
+    # sample cells allowed to change before a follow-up screenshot is sent again
+    _unchanged_tolerance = 0
+    # magnification of zoomed regions, capped at the size of a full screenshot
+    _zoom_scale = 1.0
     _scaling_enabled = True
+    # Grab frames in-process instead of through gnome-screenshot/scrot
+    _in_process_capture = True
+    # Inject input through a persistent libxdo channel instead of xdotool
+    _in_process_input = True
 
     @property
     def options(self) -> ComputerToolOptions:
@@ -122,6 +195,9 @@ class BaseComputerTool:
             self._display_prefix = ""
 
         self.xdotool = f"{self._display_prefix}xdotool"
+        # sample of the last frame sent to the model
+        self._last_frame: Image.Image | None = None
+        self.last_settle: ScreenSettle | None = None
 
     async def __call__(
         self,
@@ -140,14 +216,11 @@ class BaseComputerTool:
             x, y = self.validate_and_get_coordinates(coordinate)
 
             if action == "mouse_move":
-                command_parts = [self.xdotool, f"mousemove --sync {x} {y}"]
-                return await self.shell(" ".join(command_parts))
+                return await self.input([("mousemove", x, y)])
             elif action == "left_click_drag":
-                command_parts = [
-                    self.xdotool,
-                    f"mousedown 1 mousemove --sync {x} {y} mouseup 1",
-                ]
-                return await self.shell(" ".join(command_parts))
+                return await self.input(
+                    [("mousedown", 1), ("mousemove", x, y), ("mouseup", 1)]
+                )
 
         if action in ("key", "type"):
             if text is None:
@@ -158,24 +231,10 @@ class BaseComputerTool:
                 raise ToolError(output=f"{text} must be a string")
 
             if action == "key":
-                command_parts = [self.xdotool, f"key -- {text}"]
-                return await self.shell(" ".join(command_parts))
+                return await self.input([("key", text)])
             elif action == "type":
-                results: list[ToolResult] = []
-                for chunk in chunks(text, TYPING_GROUP_SIZE):
-                    command_parts = [
-                        self.xdotool,
-                        f"type --delay {TYPING_DELAY_MS} -- {shlex.quote(chunk)}",
-                    ]
-                    results.append(
-                        await self.shell(" ".join(command_parts), take_screenshot=False)
-                    )
-                screenshot_base64 = (await self.screenshot()).base64_image
-                return ToolResult(
-                    output="".join(result.output or "" for result in results),
-                    error="".join(result.error or "" for result in results),
-                    base64_image=screenshot_base64,
-                )
+                result = await self.input([("type", text)], take_screenshot=False)
+                return _with_screenshot(result, await self.screenshot(dedupe=True))
 
         if action in (
             "left_click",
@@ -193,6 +252,12 @@ class BaseComputerTool:
             if action == "screenshot":
                 return await self.screenshot()
             elif action == "cursor_position":
+                if channel := self._input_channel():
+                    x, y = self.scale_coordinates(
+                        ScalingSource.COMPUTER,
+                        *await asyncio.to_thread(channel.mouse_location),
+                    )
+                    return ToolResult(output=f"X={x},Y={y}")
                 command_parts = [self.xdotool, "getmouselocation --shell"]
                 result = await self.shell(
                     " ".join(command_parts),
@@ -206,8 +271,7 @@ class BaseComputerTool:
                 )
                 return result.replace(output=f"X={x},Y={y}")
             else:
-                command_parts = [self.xdotool, f"click {CLICK_BUTTONS[action]}"]
-                return await self.shell(" ".join(command_parts))
+                return await self.input([("click", *CLICK_BUTTONS[action])])
 
         raise ToolError(f"Invalid action: {action}")
 
@@ -219,8 +283,120 @@ class BaseComputerTool:
 
         return self.scale_coordinates(ScalingSource.API, coordinate[0], coordinate[1])
 
-    async def screenshot(self):
-        """Take a screenshot of the current screen and return the base64 encoded image."""
+    def validate_and_get_region(
+        self, region: list[int] | None
+    ) -> tuple[int, int, int, int]:
+        """Map an [x0, y0, x1, y1] region in API coordinates to a screen box."""
+        if not isinstance(region, list) or len(region) != 4:
+            raise ToolError(f"{region=} must be a list of 4 ints [x0, y0, x1, y1]")
+        if not all(isinstance(i, int) and i >= 0 for i in region):
+            raise ToolError(f"{region=} must contain non-negative ints")
+        x0, y0, x1, y1 = region
+        if x1 <= x0 or y1 <= y0:
+            raise ToolError(f"{region=} must have x0 < x1 and y0 < y1")
+        width, height = self.scale_coordinates(
+            ScalingSource.COMPUTER, self.width, self.height
+        )
+        if x1 > width or y1 > height:
+            raise ToolError(f"{region=} is out of bounds")
+        left, top = self.scale_coordinates(ScalingSource.API, x0, y0)
+        right, bottom = self.scale_coordinates(ScalingSource.API, x1, y1)
+        return left, top, min(right, self.width), min(bottom, self.height)
+
+    def _zoom_size(self, box: tuple[int, int, int, int]) -> tuple[int, int]:
+        """Image size for a screen box: native pixels times _zoom_scale, fitting a full screenshot."""
+        width, height = box[2] - box[0], box[3] - box[1]
+        max_width, max_height = self.scale_coordinates(
+            ScalingSource.COMPUTER, self.width, self.height
+        )
+        factor = min(self._zoom_scale, max_width / width, max_height / height)
+        return max(round(width * factor), 1), max(round(height * factor), 1)
+
+    async def screenshot(
+        self,
+        dedupe: bool = False,
+        region: tuple[int, int, int, int] | None = None,
+    ):
+        """Take a screenshot of the current screen and return the base64 encoded image.
+
+        With dedupe, a frame that matches the last one sent (within
+        _unchanged_tolerance) is replaced by the SCREEN_UNCHANGED note,
+        saving its encoding, upload and input tokens.
+
+        With region, a (left, top, right, bottom) box in screen pixels
+        (see validate_and_get_region), only that part of the screen is
+        captured, sized by _zoom_size instead of the scaling targets.
+        """
+        if capture := self._screen_capture():
+            try:
+                base64_image = await asyncio.to_thread(
+                    self._grab_base64, capture, dedupe, region
+                )
+            except CaptureError:
+                # e.g. the X server restarted; use the external tools from now on
+                _discard_backend(_captures, self.display_num, capture)
+            else:
+                if base64_image is None:
+                    return ToolResult(output=SCREEN_UNCHANGED)
+                return ToolResult(base64_image=base64_image)
+
+        result = await self._screenshot_with_tools(region)
+        if region is not None:
+            return result
+        try:
+            image = Image.open(io.BytesIO(base64.b64decode(result.base64_image or "")))
+            changed = await asyncio.to_thread(self._remember_frame, image, dedupe)
+        except (OSError, ValueError):
+            # not an image we can compare; send it as is
+            self._last_frame = None
+            return result
+        return result if changed else ToolResult(output=SCREEN_UNCHANGED)
+
+    def _remember_frame(self, image: Image.Image, dedupe: bool) -> bool:
+        """Record the frame as the last one sent, unless dedupe finds it unchanged."""
+        frame = sample(image)
+        previous = self._last_frame
+        if (
+            dedupe
+            and previous is not None
+            and previous.size == frame.size
+            and changed_cells(previous, frame) <= self._unchanged_tolerance
+        ):
+            return False
+        self._last_frame = frame
+        return True
+
+    def _screen_capture(self) -> ScreenCapture | None:
+        """The display's in-process capture backend, shared between tools."""
+        if not self._in_process_capture:
+            return None
+        return _shared_backend(_captures, self.display_num, ScreenCapture.open)
+
+    def _grab_base64(
+        self,
+        capture: ScreenCapture,
+        dedupe: bool = False,
+        region: tuple[int, int, int, int] | None = None,
+    ) -> str | None:
+        image = capture.grab(region)
+        if region is not None:
+            size = self._zoom_size(region)
+        elif not self._remember_frame(image, dedupe):
+            return None
+        elif self._scaling_enabled:
+            size = self.scale_coordinates(
+                ScalingSource.COMPUTER, self.width, self.height
+            )
+        else:
+            size = image.size
+        if size != image.size:
+            image = image.resize(size, Image.Resampling.LANCZOS)
+        return encode_png(image)
+
+    async def _screenshot_with_tools(
+        self, region: tuple[int, int, int, int] | None = None
+    ):
+        """Take a screenshot with gnome-screenshot or scrot, cropped and resized by ImageMagick."""
         output_dir = Path(OUTPUT_DIR)
         output_dir.mkdir(parents=True, exist_ok=True)
         path = output_dir / f"screenshot_{uuid4().hex}.png"
@@ -233,7 +409,15 @@ class BaseComputerTool:
             screenshot_cmd = f"{self._display_prefix}scrot -p {path}"
 
         result = await self.shell(screenshot_cmd, take_screenshot=False)
-        if self._scaling_enabled:
+        if region is not None:
+            left, top, right, bottom = region
+            x, y = self._zoom_size(region)
+            await self.shell(
+                f"convert {path} -crop {right - left}x{bottom - top}+{left}+{top} "
+                f"+repage -resize {x}x{y}! {path}",
+                take_screenshot=False,
+            )
+        elif self._scaling_enabled:
             x, y = self.scale_coordinates(
                 ScalingSource.COMPUTER, self.width, self.height
             )
@@ -249,15 +433,130 @@ class BaseComputerTool:
 
     async def shell(self, command: str, take_screenshot=True) -> ToolResult:
         """Run a shell command and return the output, error, and optionally a screenshot."""
+        reference = await self._reference_sample() if take_screenshot else None
         _, stdout, stderr = await run(command)
-        base64_image = None
+        return await self._follow_up(
+            ToolResult(output=stdout, error=stderr), take_screenshot, reference
+        )
 
-        if take_screenshot:
-            # delay to let things settle before taking a screenshot
-            await asyncio.sleep(self._screenshot_delay)
-            base64_image = (await self.screenshot()).base64_image
+    async def input(self, steps: list[Step], take_screenshot=True) -> ToolResult:
+        """Run a batch of mouse and keyboard steps (see xdo.Step), then optionally take a screenshot.
+
+        Steps go through the persistent libxdo channel when it is
+        available, and through xdotool processes otherwise.
+        """
+        if channel := self._input_channel():
+            reference = await self._reference_sample() if take_screenshot else None
+            try:
+                error = await asyncio.to_thread(channel.run, steps)
+            except InputError:
+                # e.g. the channel was closed; use xdotool from now on
+                _discard_backend(_channels, self.display_num, channel)
+            else:
+                return await self._follow_up(
+                    ToolResult(error=error or None), take_screenshot, reference
+                )
 
-        return ToolResult(output=stdout, error=stderr, base64_image=base64_image)
+        commands = [f"{self.xdotool} {args}" for args in xdotool_commands(steps)]
+        if len(commands) == 1:
+            if take_screenshot:
+                return await self.shell(commands[0])
+            return await self.shell(commands[0], take_screenshot=False)
+        reference = await self._reference_sample() if take_screenshot else None
+        results = [
+            await self.shell(command, take_screenshot=False) for command in commands
+        ]
+        return await self._follow_up(
+            ToolResult(
+                output="".join(result.output or "" for result in results),
+                error="".join(result.error or "" for result in results),
+            ),
+            take_screenshot,
+            reference,
+        )
+
+    def _input_channel(self) -> XdoChannel | None:
+        """The display's persistent input channel, shared between tools."""
+        if not self._in_process_input:
+            return None
+        return _shared_backend(_channels, self.display_num, XdoChannel.open)
+
+    async def _reference_sample(self) -> Image.Image | None:
+        """A sample of the screen before an action, for wait_for_settle."""
+        if capture := self._screen_capture():
+            try:
+                return await asyncio.to_thread(lambda: sample(capture.grab()))
+            except CaptureError:
+                pass
+        return None
+
+    async def _follow_up(
+        self,
+        result: ToolResult,
+        take_screenshot: bool,
+        reference: Image.Image | None = None,
+    ) -> ToolResult:
+        if not take_screenshot:
+            return result
+        # let things settle before taking a screenshot
+        self.last_settle = await self.wait_for_settle(reference)
+        return _with_screenshot(result, await self.screenshot(dedupe=True))
+
+    async def wait_for_settle(
+        self, reference: Image.Image | None = None
+    ) -> ScreenSettle:
+        """Wait until the screen stops changing, at most _screenshot_delay seconds.
+
+        Compares low resolution samples of the display every
+        _settle_interval seconds, starting from reference, a sample taken
+        before the action, so a redraw that finished before the first
+        sample still counts as a change. The screen has settled once the
+        samples have stayed the same for _settle_quiet. Without in-process
+        capture, sampling would cost a process spawn each time, so this
+        sleeps for the full delay instead.
+        """
+        start = time.monotonic()
+        capture = self._screen_capture()
+        if capture is None:
+            await asyncio.sleep(self._screenshot_delay)
+            return ScreenSettle(elapsed=time.monotonic() - start, settled=False)
+
+        previous = reference
+        stable_since = 0.0
+        samples = 0
+        changed = False
+        while True:
+            try:
+                frame = await asyncio.to_thread(lambda: sample(capture.grab()))
+            except CaptureError:
+                remaining = self._screenshot_delay - (time.monotonic() - start)
+                await asyncio.sleep(max(remaining, 0))
+                return ScreenSettle(
+                    elapsed=time.monotonic() - start,
+                    settled=False,
+                    samples=samples,
+                    changed=changed,
+                )
+            samples += 1
+            elapsed = time.monotonic() - start
+            if previous is None:
+                stable_since = elapsed
+            elif (
+                previous.size != frame.size
+                or changed_cells(previous, frame) > self._settle_tolerance
+            ):
+                changed = True
+                stable_since = elapsed
+            elif elapsed - stable_since >= self._settle_quiet:
+                return ScreenSettle(
+                    elapsed=elapsed, settled=True, samples=samples, changed=changed
+                )
+            if elapsed >= self._screenshot_delay:
+                return ScreenSettle(
+                    elapsed=elapsed, settled=False, samples=samples, changed=changed
+                )
+            previous = frame
+            await asyncio.sleep(self._settle_interval)
 
     def scale_coordinates(self, source: ScalingSource, x: int, y: int):
         """Scale coordinates to a target maximum resolution."""
@@ -316,11 +615,8 @@ class ComputerTool20250124(BaseComputerTool, BaseAnthropicTool):
         if action in ("left_mouse_down", "left_mouse_up"):
             if coordinate is not None:
                 raise ToolError(f"coordinate is not accepted for {action=}.")
-            command_parts = [
-                self.xdotool,
-                f"{'mousedown' if action == 'left_mouse_down' else 'mouseup'} 1",
-            ]
-            return await self.shell(" ".join(command_parts))
+            step = "mousedown" if action == "left_mouse_down" else "mouseup"
+            return await self.input([(step, 1)])
         if action == "scroll":
             if scroll_direction is None or scroll_direction not in get_args(
                 ScrollDirection
@@ -330,10 +626,10 @@ class ComputerTool20250124(BaseComputerTool, BaseAnthropicTool):
                 )
             if not isinstance(scroll_amount, int) or scroll_amount < 0:
                 raise ToolError(f"{scroll_amount=} must be a non-negative int")
-            mouse_move_part = ""
+            steps: list[Step] = []
             if coordinate is not None:
                 x, y = self.validate_and_get_coordinates(coordinate)
-                mouse_move_part = f"mousemove --sync {x} {y}"
+                steps.append(("mousemove", x, y))
             scroll_button = {
                 "up": 4,
                 "down": 5,
@@ -341,14 +637,13 @@ class ComputerTool20250124(BaseComputerTool, BaseAnthropicTool):
                 "right": 7,
             }[scroll_direction]
 
-            command_parts = [self.xdotool, mouse_move_part]
             if text:
-                command_parts.append(f"keydown {text}")
-            command_parts.append(f"click --repeat {scroll_amount} {scroll_button}")
+                steps.append(("keydown", text))
+            steps.append(("click", scroll_button, scroll_amount, None))
             if text:
-                command_parts.append(f"keyup {text}")
+                steps.append(("keyup", text))
 
-            return await self.shell(" ".join(command_parts))
+            return await self.input(steps)
 
         if action in ("hold_key", "wait"):
             if duration is None or not isinstance(duration, (int, float)):
@@ -361,18 +656,13 @@ class ComputerTool20250124(BaseComputerTool, BaseAnthropicTool):
             if action == "hold_key":
                 if text is None:
                     raise ToolError(f"text is required for {action}")
-                escaped_keys = shlex.quote(text)
-                command_parts = [
-                    self.xdotool,
-                    f"keydown {escaped_keys}",
-                    f"sleep {duration}",
-                    f"keyup {escaped_keys}",
-                ]
-                return await self.shell(" ".join(command_parts))
+                return await self.input(
+                    [("keydown", text), ("sleep", duration), ("keyup", text)]
+                )
 
             if action == "wait":
                 await asyncio.sleep(duration)
-                return await self.screenshot()
+                return await self.screenshot(dedupe=True)
 
         if action in (
             "left_click",
@@ -383,20 +673,54 @@ class ComputerTool20250124(BaseComputerTool, BaseAnthropicTool):
         ):
             if text is not None:
                 raise ToolError(f"text is not accepted for {action}")
-            mouse_move_part = ""
+            steps = []
             if coordinate is not None:
                 x, y = self.validate_and_get_coordinates(coordinate)
-                mouse_move_part = f"mousemove --sync {x} {y}"
+                steps.append(("mousemove", x, y))
 
-            command_parts = [self.xdotool, mouse_move_part]
             if key:
-                command_parts.append(f"keydown {key}")
-            command_parts.append(f"click {CLICK_BUTTONS[action]}")
+                steps.append(("keydown", key))
+            steps.append(("click", *CLICK_BUTTONS[action]))
             if key:
-                command_parts.append(f"keyup {key}")
+                steps.append(("keyup", key))
 
-            return await self.shell(" ".join(command_parts))
+            return await self.input(steps)
 
         return await super().__call__(
             action=action, text=text, coordinate=coordinate, key=key, **kwargs
         )
+
+
+class ComputerTool20251124(ComputerTool20250124):
+    api_type: Literal["computer_20251124"] = "computer_20251124"  # pyright: ignore[reportIncompatibleVariableOverride]
+
+    def to_params(self):
+        return cast(
+            BetaToolUnionParam,
+            {
+                "name": self.name,
+                "type": self.api_type,
+                "enable_zoom": True,
+                **self.options,
+            },
+        )
+
+    async def __call__(
+        self,
+        *,
+        action: Action_20251124,
+        region: list[int] | None = None,
+        **kwargs,
+    ):
+        if action == "zoom":
+            if region is None:
+                raise ToolError(f"region is required for {action}")
+            box = self.validate_and_get_region(region)
+            result = await self.screenshot(region=box)
+            return result.replace(
+                output=(
+                    f"Zoomed in on region {region}. Coordinates for other "
+                    "actions still refer to the full screen."
+                )
+            )
+        return await super().__call__(action=action, **kwargs)
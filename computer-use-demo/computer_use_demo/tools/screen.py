@@ -0,0 +1,353 @@
+"""In-process screen capture from the X display.
+
+Frames are read with the MIT-SHM extension when the X server shares
+memory with us (always true for the local Xvfb), and with plain
+XGetImage otherwise, through ctypes bindings to libX11 and libXext.
+Nothing is spawned and nothing touches disk: callers resize and encode
+the returned PIL image in memory.
+"""
+
+import base64
+import ctypes
+import ctypes.util
+import io
+import threading
+
+from PIL import Image, ImageChops
+
+# Each side of a sample frame is this many times smaller than the display
+SAMPLE_REDUCTION = 8
+# Grey levels a sample cell may drift by without counting as a change
+SAMPLE_NOISE = 8
+
+# PNG zlib level: 1 encodes several times faster than the default 6 and
+# the image costs the same number of tokens either way
+PNG_COMPRESS_LEVEL = 1
+
+_ZPIXMAP = 2
+_ALL_PLANES = ctypes.c_ulong(-1).value
+_LSB_FIRST = 0
+_IPC_PRIVATE = 0
+_IPC_CREAT = 0o1000
+_IPC_RMID = 0
+
+
+class CaptureError(Exception):
+    """Raised when the display cannot be captured in-process."""
+
+
+class _XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; the rest is never read through
+    # these bindings
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+        ("red_mask", ctypes.c_ulong),
+        ("green_mask", ctypes.c_ulong),
+        ("blue_mask", ctypes.c_ulong),
+    ]
+
+
+class _ShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class _XErrorEvent(ctypes.Structure):
+    _fields_ = [
+        ("type", ctypes.c_int),
+        ("display", ctypes.c_void_p),
+        ("resourceid", ctypes.c_ulong),
+        ("serial", ctypes.c_ulong),
+        ("error_code", ctypes.c_ubyte),
+        ("request_code", ctypes.c_ubyte),
+        ("minor_code", ctypes.c_ubyte),
+    ]
+
+
+_ErrorHandler = ctypes.CFUNCTYPE(
+    ctypes.c_int, ctypes.c_void_p, ctypes.POINTER(_XErrorEvent)
+)
+
+_libs: dict[str, ctypes.CDLL] = {}
+_libs_lock = threading.Lock()
+_x_errors: list[int] = []
+
+
+@_ErrorHandler
+def _on_x_error(display, event):
+    # Xlib's default handler exits the process; record the error instead
+    # so the failing call can fall back
+    _x_errors.append(event.contents.error_code)
+    return 0
+
+
+def _load(name: str) -> ctypes.CDLL:
+    path = ctypes.util.find_library(name)
+    if path is None:
+        raise CaptureError(f"lib{name} is not installed")
+    return ctypes.CDLL(path)
+
+
+def _bind(lib: ctypes.CDLL, name: str, restype, *argtypes) -> None:
+    function = getattr(lib, name)
+    function.restype = restype
+    function.argtypes = argtypes
+
+
+def _libraries() -> tuple[ctypes.CDLL, ctypes.CDLL | None, ctypes.CDLL]:
+    """libX11, libXext (None without MIT-SHM support) and libc."""
+    with _libs_lock:
+        if not _libs:
+            _libs.update(_load_libraries())
+    return _libs["X11"], _libs.get("Xext"), _libs["c"]
+
+
+def _load_libraries() -> dict[str, ctypes.CDLL]:
+    display, ulong, uint, cint = (
+        ctypes.c_void_p,
+        ctypes.c_ulong,
+        ctypes.c_uint,
+        ctypes.c_int,
+    )
+    ximage = ctypes.POINTER(_XImage)
+    segment = ctypes.POINTER(_ShmSegmentInfo)
+
+    x11 = _load("X11")
+    _bind(x11, "XOpenDisplay", display, ctypes.c_char_p)
+    _bind(x11, "XCloseDisplay", cint, display)
+    _bind(x11, "XDefaultScreen", cint, display)
+    _bind(x11, "XRootWindow", ulong, display, cint)
+    _bind(x11, "XDisplayWidth", cint, display, cint)
+    _bind(x11, "XDisplayHeight", cint, display, cint)
+    _bind(x11, "XDefaultVisual", ctypes.c_void_p, display, cint)
+    _bind(x11, "XDefaultDepth", cint, display, cint)
+    _bind(x11, "XGetImage", ximage, display, ulong, cint, cint, uint, uint, ulong, cint)
+    _bind(x11, "XDestroyImage", cint, ximage)
+    _bind(x11, "XSync", cint, display, cint)
+    _bind(x11, "XSetErrorHandler", ctypes.c_void_p, _ErrorHandler)
+    x11.XSetErrorHandler(_on_x_error)
+
+    libc = _load("c")
+    _bind(libc, "shmget", cint, cint, ctypes.c_size_t, cint)
+    _bind(libc, "shmat", ctypes.c_void_p, cint, ctypes.c_void_p, cint)
+    _bind(libc, "shmdt", cint, ctypes.c_void_p)
+    _bind(libc, "shmctl", cint, cint, cint, ctypes.c_void_p)
+    libs = {"X11": x11, "c": libc}
+
+    try:
+        xext = _load("Xext")
+    except CaptureError:
+        return libs
+    _bind(xext, "XShmQueryExtension", cint, display)
+    _bind(
+        xext,
+        "XShmCreateImage",
+        ximage,
+        display,
+        ctypes.c_void_p,
+        uint,
+        cint,
+        ctypes.c_char_p,
+        segment,
+        uint,
+        uint,
+    )
+    _bind(xext, "XShmAttach", cint, display, segment)
+    _bind(xext, "XShmDetach", cint, display, segment)
+    _bind(xext, "XShmGetImage", cint, display, ulong, ximage, cint, cint, ulong)
+    libs["Xext"] = xext
+    return libs
+
+
+class ScreenCapture:
+    """Grab frames of an X display's root window without spawning processes.
+
+    Calls are serialized, so one instance can be shared between threads.
+    """
+
+    def __init__(self, display_num: int | None = None):
+        self._x11, self._xext, self._libc = _libraries()
+        name = f":{display_num}".encode() if display_num is not None else None
+        self._display = self._x11.XOpenDisplay(name)
+        if not self._display:
+            raise CaptureError(f"cannot open display {name!r}")
+        screen = self._x11.XDefaultScreen(self._display)
+        self._root = self._x11.XRootWindow(self._display, screen)
+        self.width = self._x11.XDisplayWidth(self._display, screen)
+        self.height = self._x11.XDisplayHeight(self._display, screen)
+        self._lock = threading.Lock()
+        self._segment: _ShmSegmentInfo | None = None
+        self._shm_image = None
+        self._shm_attached = False
+        try:
+            self._attach_shm(screen)
+        except CaptureError:
+            self._detach_shm()
+        self.uses_shm = self._shm_image is not None
+
+    @classmethod
+    def open(cls, display_num: int | None = None) -> "ScreenCapture | None":
+        """A capture for the display, or None if it cannot be captured."""
+        try:
+            return cls(display_num)
+        except (CaptureError, OSError):
+            return None
+
+    def _attach_shm(self, screen: int) -> None:
+        if self._xext is None or not self._xext.XShmQueryExtension(self._display):
+            raise CaptureError("MIT-SHM is not available")
+        segment = _ShmSegmentInfo(shmid=-1)
+        self._segment = segment
+        image = self._xext.XShmCreateImage(
+            self._display,
+            self._x11.XDefaultVisual(self._display, screen),
+            self._x11.XDefaultDepth(self._display, screen),
+            _ZPIXMAP,
+            None,
+            ctypes.byref(segment),
+            self.width,
+            self.height,
+        )
+        if not image:
+            raise CaptureError("XShmCreateImage failed")
+        self._shm_image = image
+        size = image.contents.bytes_per_line * image.contents.height
+        segment.shmid = self._libc.shmget(_IPC_PRIVATE, size, _IPC_CREAT | 0o600)
+        if segment.shmid < 0:
+            raise CaptureError("shmget failed")
+        address = self._libc.shmat(segment.shmid, None, 0)
+        if address in (None, ctypes.c_void_p(-1).value):
+            raise CaptureError("shmat failed")
+        segment.shmaddr = image.contents.data = address
+        del _x_errors[:]
+        attached = self._xext.XShmAttach(self._display, ctypes.byref(segment))
+        self._x11.XSync(self._display, 0)
+        # The segment is freed once both sides detach
+        self._libc.shmctl(segment.shmid, _IPC_RMID, None)
+        if not attached or _x_errors:
+            # e.g. a remote display that cannot see our memory
+            raise CaptureError("XShmAttach failed")
+        self._shm_attached = True
+
+    def _detach_shm(self) -> None:
+        segment, self._segment = self._segment, None
+        image, self._shm_image = self._shm_image, None
+        if segment is None:
+            return
+        if self._shm_attached:
+            self._shm_attached = False
+            self._xext.XShmDetach(self._display, ctypes.byref(segment))
+            self._x11.XSync(self._display, 0)
+        if image:
+            self._x11.XDestroyImage(image)
+        if segment.shmaddr:
+            self._libc.shmdt(segment.shmaddr)
+        elif segment.shmid >= 0:
+            self._libc.shmctl(segment.shmid, _IPC_RMID, None)
+
+    def grab(self, box: tuple[int, int, int, int] | None = None) -> Image.Image:
+        """The current contents of the display, or of the box within it.
+
+        Args:
+            box: (left, top, right, bottom) in display pixels, clamped to
+                 the display
+        """
+        left, top, right, bottom = box or (0, 0, self.width, self.height)
+        left, right = max(left, 0), min(right, self.width)
+        top, bottom = max(top, 0), min(bottom, self.height)
+        if right <= left or bottom <= top:
+            raise CaptureError(f"empty capture region {box}")
+
+        with self._lock:
+            if not self._display:
+                raise CaptureError("capture is closed")
+            del _x_errors[:]
+            if self._shm_image is not None:
+                ok = self._xext.XShmGetImage(
+                    self._display, self._root, self._shm_image, 0, 0, _ALL_PLANES
+                )
+                if not ok or _x_errors:
+                    raise CaptureError("XShmGetImage failed")
+                image = self._to_pil(self._shm_image.contents, top, bottom)
+                if (left, right) != (0, self.width):
+                    image = image.crop((left, 0, right, bottom - top))
+                return image
+
+            # Without shared memory, only transfer the pixels asked for
+            image = self._x11.XGetImage(
+                self._display,
+                self._root,
+                left,
+                top,
+                right - left,
+                bottom - top,
+                _ALL_PLANES,
+                _ZPIXMAP,
+            )
+            if not image:
+                raise CaptureError("XGetImage failed")
+            try:
+                return self._to_pil(image.contents, 0, bottom - top)
+            finally:
+                self._x11.XDestroyImage(image)
+
+    @staticmethod
+    def _to_pil(image: _XImage, top: int, bottom: int) -> Image.Image:
+        """Rows top to bottom of an XImage."""
+        if image.bits_per_pixel != 32 or image.byte_order != _LSB_FIRST:
+            raise CaptureError(
+                f"unsupported pixel format: {image.bits_per_pixel} bpp, "
+                f"byte order {image.byte_order}"
+            )
+        # Copy out of the X buffer, which the next grab overwrites
+        stride = image.bytes_per_line
+        data = ctypes.string_at(image.data + top * stride, (bottom - top) * stride)
+        return Image.frombuffer(
+            "RGB",
+            (image.width, bottom - top),
+            data,
+            "raw",
+            "BGRX",
+            stride,
+            1,
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._display:
+                self._detach_shm()
+                self._x11.XCloseDisplay(self._display)
+                self._display = None
+
+
+def encode_png(image: Image.Image) -> str:
+    """Base64 encoded PNG of the image, built in memory."""
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def sample(image: Image.Image) -> Image.Image:
+    """Small greyscale version of a frame, for cheap comparisons."""
+    return image.reduce(SAMPLE_REDUCTION).convert("L")
+
+
+def changed_cells(a: Image.Image, b: Image.Image) -> int:
+    """Number of cells that differ between two samples of the same size."""
+    histogram = ImageChops.difference(a, b).histogram()
+    return sum(histogram[SAMPLE_NOISE + 1 :])
@@ -0,0 +1,231 @@
+"""Mouse and keyboard input through libxdo, the library behind xdotool.
+
+One XdoChannel keeps a connection to the X display open and injects
+events with XTest in-process, so an action costs a library call instead
+of spawning a shell and an xdotool process. Actions are described as
+steps, which the channel runs as one batch and which render to the
+equivalent xdotool command lines for the fallback path.
+"""
+
+import ctypes
+import ctypes.util
+import shlex
+import threading
+import time
+
+# Milliseconds between keystrokes, as used by `xdotool key` and `type`
+KEY_DELAY_MS = 12
+TYPING_DELAY_MS = 12
+# Characters per `xdotool type` command on the command line fallback
+TYPING_GROUP_SIZE = 50
+# `xdotool click --repeat` default
+CLICK_DELAY_MS = 100
+
+_CURRENT_WINDOW = 0
+
+# A step is a tuple starting with its xdotool command name:
+#   ("mousemove", x, y)              move and wait until the pointer arrives
+#   ("mousedown", button), ("mouseup", button)
+#   ("click", button, repeat, delay) delay in ms between clicks, or None
+#   ("key", keys), ("keydown", keys), ("keyup", keys)
+#                                    space separated key sequences
+#   ("type", text)
+#   ("sleep", seconds)
+Step = tuple
+
+
+class InputError(Exception):
+    """Raised when libxdo is unavailable or cannot open the display."""
+
+
+def chunks(s: str, chunk_size: int) -> list[str]:
+    return [s[i : i + chunk_size] for i in range(0, len(s), chunk_size)]
+
+
+def _quote_keys(keys: str) -> str:
+    return " ".join(shlex.quote(key) for key in keys.split())
+
+
+def xdotool_commands(steps: list[Step]) -> list[str]:
+    """xdotool arguments running the steps, one string per process.
+
+    Steps are chained into a single command, except text to type, which
+    is split into TYPING_GROUP_SIZE chunks of their own.
+    """
+    commands: list[str] = []
+    chain: list[str] = []
+    for step in steps:
+        name, *args = step
+        if name == "type":
+            if chain:
+                commands.append(" ".join(chain))
+                chain = []
+            commands += [
+                f"type --delay {TYPING_DELAY_MS} -- {shlex.quote(chunk)}"
+                for chunk in chunks(args[0], TYPING_GROUP_SIZE)
+            ]
+        elif name == "mousemove":
+            chain.append(f"mousemove --sync {args[0]} {args[1]}")
+        elif name == "click":
+            button, repeat, delay = args
+            options = f"--repeat {repeat} " if repeat != 1 else ""
+            if delay is not None:
+                options += f"--delay {delay} "
+            chain.append(f"click {options}{button}")
+        elif name == "key":
+            chain.append(f"key -- {_quote_keys(args[0])}")
+        elif name in ("keydown", "keyup"):
+            chain.append(f"{name} {_quote_keys(args[0])}")
+        else:
+            chain.append(" ".join(str(part) for part in step))
+    if chain:
+        commands.append(" ".join(chain))
+    return commands
+
+
+def _load() -> ctypes.CDLL:
+    path = ctypes.util.find_library("xdo")
+    if path is None:
+        raise InputError("libxdo is not installed")
+    xdo = ctypes.CDLL(path)
+    handle, cint, window, useconds = (
+        ctypes.c_void_p,
+        ctypes.c_int,
+        ctypes.c_ulong,
+        ctypes.c_uint,
+    )
+    signatures = {
+        "xdo_new": (handle, ctypes.c_char_p),
+        "xdo_free": (None, handle),
+        "xdo_move_mouse": (cint, handle, cint, cint, cint),
+        "xdo_wait_for_mouse_move_to": (cint, handle, cint, cint),
+        "xdo_mouse_down": (cint, handle, window, cint),
+        "xdo_mouse_up": (cint, handle, window, cint),
+        "xdo_click_window_multiple": (cint, handle, window, cint, cint, useconds),
+        "xdo_send_keysequence_window": (
+            cint,
+            handle,
+            window,
+            ctypes.c_char_p,
+            useconds,
+        ),
+        "xdo_send_keysequence_window_down": (
+            cint,
+            handle,
+            window,
+            ctypes.c_char_p,
+            useconds,
+        ),
+        "xdo_send_keysequence_window_up": (
+            cint,
+            handle,
+            window,
+            ctypes.c_char_p,
+            useconds,
+        ),
+        "xdo_enter_text_window": (cint, handle, window, ctypes.c_char_p, useconds),
+        "xdo_get_mouse_location": (
+            cint,
+            handle,
+            ctypes.POINTER(cint),
+            ctypes.POINTER(cint),
+            ctypes.POINTER(cint),
+        ),
+    }
+    for name, (restype, *argtypes) in signatures.items():
+        function = getattr(xdo, name)
+        function.restype = restype
+        function.argtypes = argtypes
+    return xdo
+
+
+class XdoChannel:
+    """A long-lived libxdo connection to an X display.
+
+    Calls are serialized, so one channel can be shared between threads;
+    run it from a worker thread, as typing and sleep steps block.
+    """
+
+    def __init__(self, display_num: int | None = None):
+        try:
+            self._lib = _load()
+        except OSError as e:
+            raise InputError(str(e)) from e
+        name = f":{display_num}".encode() if display_num is not None else None
+        self._xdo = self._lib.xdo_new(name)
+        if not self._xdo:
+            raise InputError(f"cannot open display {name!r}")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, display_num: int | None = None) -> "XdoChannel | None":
+        """A channel to the display, or None if libxdo cannot drive it."""
+        try:
+            return cls(display_num)
+        except InputError:
+            return None
+
+    def run(self, steps: list[Step]) -> str:
+        """Run the steps in order and return error messages, if any."""
+        errors = []
+        with self._lock:
+            if not self._xdo:
+                raise InputError("channel is closed")
+            for step in steps:
+                if self._run_step(*step) != 0:
+                    errors.append(f"xdotool {' '.join(map(str, step))} failed\n")
+        return "".join(errors)
+
+    def _run_step(self, name: str, *args) -> int:
+        lib, xdo = self._lib, self._xdo
+        if name == "mousemove":
+            x, y = args
+            return lib.xdo_move_mouse(xdo, x, y, 0) or (
+                lib.xdo_wait_for_mouse_move_to(xdo, x, y)
+            )
+        if name in ("mousedown", "mouseup"):
+            function = lib.xdo_mouse_down if name == "mousedown" else lib.xdo_mouse_up
+            return function(xdo, _CURRENT_WINDOW, args[0])
+        if name == "click":
+            button, repeat, delay = args
+            delay_us = (CLICK_DELAY_MS if delay is None else delay) * 1000
+            return lib.xdo_click_window_multiple(
+                xdo, _CURRENT_WINDOW, button, repeat, delay_us
+            )
+        if name in ("key", "keydown", "keyup"):
+            function = {
+                "key": lib.xdo_send_keysequence_window,
+                "keydown": lib.xdo_send_keysequence_window_down,
+                "keyup": lib.xdo_send_keysequence_window_up,
+            }[name]
+            for sequence in args[0].split():
+                status = function(
+                    xdo, _CURRENT_WINDOW, sequence.encode(), KEY_DELAY_MS * 1000
+                )
+                if status != 0:
+                    return status
+            return 0
+        if name == "type":
+            return lib.xdo_enter_text_window(
+                xdo, _CURRENT_WINDOW, args[0].encode(), TYPING_DELAY_MS * 1000
+            )
+        if name == "sleep":
+            time.sleep(args[0])
+            return 0
+        raise ValueError(f"unknown input step {name!r}")
+
+    def mouse_location(self) -> tuple[int, int]:
+        x, y, screen = ctypes.c_int(), ctypes.c_int(), ctypes.c_int()
+        with self._lock:
+            if not self._xdo:
+                raise InputError("channel is closed")
+            self._lib.xdo_get_mouse_location(
+                self._xdo, ctypes.byref(x), ctypes.byref(y), ctypes.byref(screen)
+            )
+        return x.value, y.value
+
+    def close(self) -> None:
+        with self._lock:
+            if self._xdo:
+                self._lib.xdo_free(self._xdo)
+                self._xdo = None
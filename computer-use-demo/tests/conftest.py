@@ -3,6 +3,8 @@ from unittest import mock
 
 import pytest
 
+from computer_use_demo.tools import computer
+
 
 @pytest.fixture(autouse=True)
 def mock_screen_dimensions():
@@ -10,3 +12,13 @@ def mock_screen_dimensions():
         os.environ, {"HEIGHT": "768", "WIDTH": "1024", "DISPLAY_NUM": "1"}
     ):
         yield
+
+
+@pytest.fixture(autouse=True)
+def reset_shared_backends():
+    # Computer tools share their display's backends; start each test afresh
+    with (
+        mock.patch.dict(computer._captures, clear=True),
+        mock.patch.dict(computer._channels, clear=True),
+    ):
+        yield
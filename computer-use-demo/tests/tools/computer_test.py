@@ -1,19 +1,30 @@
+import base64
+import io
 from unittest.mock import AsyncMock, patch
 
 import pytest
+from PIL import Image
 
 from computer_use_demo.tools.computer import (
+    SCREEN_UNCHANGED,
     ComputerTool20241022,
     ComputerTool20250124,
+    ComputerTool20251124,
     ScalingSource,
     ToolError,
     ToolResult,
 )
+from computer_use_demo.tools.screen import CaptureError, ScreenCapture
+from computer_use_demo.tools.xdo import XdoChannel, xdotool_commands
 
 
-@pytest.fixture(params=[ComputerTool20241022, ComputerTool20250124])
+@pytest.fixture(
+    params=[ComputerTool20241022, ComputerTool20250124, ComputerTool20251124]
+)
 def computer_tool(request):
-    return request.param()
+    # Exercise the xdotool command line path unless a test fakes the channel
+    with patch.object(XdoChannel, "open", return_value=None):
+        yield request.param()
 
 
 @pytest.mark.asyncio
@@ -138,3 +149,297 @@ async def test_computer_tool_missing_coordinate(computer_tool):
 async def test_computer_tool_missing_text(computer_tool):
     with pytest.raises(ToolError, match="text is required for type"):
         await computer_tool(action="type")
+
+
+class FakeCapture:
+    def __init__(self, size=(1920, 1080), error=None, colors=()):
+        self.size = size
+        self.error = error
+        self.colors = list(colors)
+        self.closed = False
+
+    def grab(self, box=None):
+        if self.error:
+            raise self.error
+        self.box = box
+        size = (box[2] - box[0], box[3] - box[1]) if box else self.size
+        color = self.colors.pop(0) if self.colors else "white"
+        return Image.new("RGB", size, color)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_screenshot_in_process(computer_tool):
+    computer_tool.width = 1920
+    computer_tool.height = 1080
+    with (
+        patch.object(ScreenCapture, "open", return_value=FakeCapture()) as mock_open,
+        patch.object(
+            computer_tool, "_screenshot_with_tools", new_callable=AsyncMock
+        ) as mock_tools,
+    ):
+        result = await computer_tool.screenshot()
+        await computer_tool.screenshot()
+        mock_open.assert_called_once_with(1)
+        mock_tools.assert_not_called()
+    image = Image.open(io.BytesIO(base64.b64decode(result.base64_image)))
+    assert image.format == "PNG"
+    assert image.size == (1366, 768)
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_screenshot_falls_back_to_tools(computer_tool):
+    capture = FakeCapture(error=CaptureError("display went away"))
+    with (
+        patch.object(ScreenCapture, "open", return_value=capture),
+        patch.object(
+            computer_tool, "_screenshot_with_tools", new_callable=AsyncMock
+        ) as mock_tools,
+    ):
+        mock_tools.return_value = ToolResult(base64_image="base64_screenshot")
+        result = await computer_tool.screenshot()
+        assert result.base64_image == "base64_screenshot"
+        assert capture.closed
+
+        # Never retried once the capture failed
+        await computer_tool.screenshot()
+        assert mock_tools.call_count == 2
+        assert ScreenCapture.open.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_computer_tools_share_the_display_capture(computer_tool):
+    capture = FakeCapture(size=(1024, 768))
+    with patch.object(ScreenCapture, "open", return_value=capture) as mock_open:
+        # A new tool collection is built on every turn
+        for tool in (computer_tool, type(computer_tool)(), type(computer_tool)()):
+            assert (await tool.screenshot()).base64_image
+        mock_open.assert_called_once_with(1)
+    assert not capture.closed
+
+
+@pytest.mark.asyncio
+async def test_screen_capture_open_without_display():
+    assert ScreenCapture.open(99) is None
+
+
+@pytest.fixture
+def fast_settle(computer_tool):
+    computer_tool._settle_interval = 0.01
+    computer_tool._settle_quiet = 0.03
+    computer_tool._screenshot_delay = 0.5
+    return computer_tool
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_settles_once_screen_stops_changing(fast_settle):
+    capture = FakeCapture(size=(64, 64), colors=["red", "blue", "green"])
+    with patch.object(ScreenCapture, "open", return_value=capture):
+        settle = await fast_settle.wait_for_settle()
+    assert settle.settled
+    assert settle.changed
+    assert settle.elapsed < 0.3
+    # Three changing frames, then white until it has been quiet long enough
+    assert settle.samples >= 5
+
+
+@pytest.fixture
+def settle_capture(fast_settle):
+    capture = FakeCapture(size=(1024, 768))
+    with (
+        patch.object(ScreenCapture, "open", return_value=capture),
+        patch(
+            "computer_use_demo.tools.computer.run",
+            new_callable=AsyncMock,
+            return_value=(0, "", ""),
+        ),
+    ):
+        yield capture
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_settles_after_a_redraw_before_sampling(
+    fast_settle, settle_capture
+):
+    assert (await fast_settle(action="screenshot")).base64_image
+    # Sampled before the click, then already redrawn at the first sample
+    settle_capture.colors = ["white"] + ["black"] * 100
+    result = await fast_settle(action="left_click")
+    assert result.base64_image
+    assert result.output is None
+    assert fast_settle.last_settle.settled
+    assert fast_settle.last_settle.changed
+    assert fast_settle.last_settle.elapsed < 0.2
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_action_without_visible_effect(fast_settle, settle_capture):
+    assert (await fast_settle(action="screenshot")).base64_image
+    result = await fast_settle(action="mouse_move", coordinate=[10, 10])
+    assert result.base64_image is None
+    assert result.output == SCREEN_UNCHANGED
+    assert fast_settle.last_settle.settled
+    assert not fast_settle.last_settle.changed
+    assert fast_settle.last_settle.elapsed < 0.2
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_settle_gives_up_at_max_wait(fast_settle):
+    colors = ["red", "blue"] * 100
+    capture = FakeCapture(size=(64, 64), colors=colors)
+    with patch.object(ScreenCapture, "open", return_value=capture):
+        settle = await fast_settle.wait_for_settle()
+    assert not settle.settled
+    assert settle.elapsed >= 0.5
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_shell_records_settle(fast_settle):
+    fast_settle._screenshot_delay = 0.05
+    with (
+        patch.object(ScreenCapture, "open", return_value=None),
+        patch(
+            "computer_use_demo.tools.computer.run",
+            new_callable=AsyncMock,
+            return_value=(0, "", ""),
+        ),
+        patch.object(
+            fast_settle, "_screenshot_with_tools", new_callable=AsyncMock
+        ) as mock_tools,
+    ):
+        mock_tools.return_value = ToolResult(base64_image="base64_screenshot")
+        result = await fast_settle.shell("xdotool click 1")
+    assert result.base64_image == "base64_screenshot"
+    assert fast_settle.last_settle.settled is False
+    assert fast_settle.last_settle.elapsed >= 0.05
+
+
+class FakeChannel:
+    def __init__(self):
+        self.steps = []
+
+    def run(self, steps):
+        self.steps.append(steps)
+        return ""
+
+    def mouse_location(self):
+        return 1024, 768
+
+
+def test_xdotool_commands():
+    assert xdotool_commands([("mousemove", 1, 2), ("click", 1, 2, 10)]) == [
+        "mousemove --sync 1 2 click --repeat 2 --delay 10 1"
+    ]
+    assert xdotool_commands(
+        [("keydown", "shift"), ("click", 5, 3, None), ("keyup", "shift")]
+    ) == ["keydown shift click --repeat 3 5 keyup shift"]
+    assert xdotool_commands([("key", "ctrl+a Delete;")]) == ["key -- ctrl+a 'Delete;'"]
+    assert xdotool_commands(
+        [("mousemove", 0, 0), ("type", "x" * 60), ("sleep", 1)]
+    ) == [
+        "mousemove --sync 0 0",
+        f"type --delay 12 -- {'x' * 50}",
+        "type --delay 12 -- xxxxxxxxxx",
+        "sleep 1",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_uses_input_channel(computer_tool):
+    channel = FakeChannel()
+    with (
+        patch.object(XdoChannel, "open", return_value=channel) as mock_open,
+        patch.object(computer_tool, "shell", new_callable=AsyncMock) as mock_shell,
+        patch.object(
+            computer_tool, "screenshot", new_callable=AsyncMock
+        ) as mock_screenshot,
+        patch.object(computer_tool, "wait_for_settle", new_callable=AsyncMock),
+    ):
+        mock_screenshot.return_value = ToolResult(base64_image="base64_screenshot")
+        result = await computer_tool(action="mouse_move", coordinate=[100, 200])
+        assert result.base64_image == "base64_screenshot"
+        await computer_tool(action="type", text="Hello, World!")
+        await computer_tool(action="double_click")
+        position = await computer_tool(action="cursor_position")
+        # Later turns' tools reuse the display's channel
+        later = type(computer_tool)()
+        await later.input([("click", 1, 1, None)], take_screenshot=False)
+        mock_shell.assert_not_called()
+        mock_open.assert_called_once_with(1)
+
+    assert channel.steps == [
+        [("mousemove", 100, 200)],
+        [("type", "Hello, World!")],
+        [("click", 1, 2, 10)],
+        [("click", 1, 1, None)],
+    ]
+    assert position.output == "X=1024,Y=768"
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_skips_unchanged_follow_up_screenshots(computer_tool):
+    computer_tool.width = 1024
+    computer_tool.height = 768
+    capture = FakeCapture(size=(1024, 768))
+    with (
+        patch.object(ScreenCapture, "open", return_value=capture),
+        patch.object(computer_tool, "wait_for_settle", new_callable=AsyncMock),
+        patch(
+            "computer_use_demo.tools.computer.run",
+            new_callable=AsyncMock,
+            return_value=(0, "", ""),
+        ),
+    ):
+        first = await computer_tool(action="mouse_move", coordinate=[10, 10])
+        assert first.base64_image
+
+        unchanged = await computer_tool(action="mouse_move", coordinate=[20, 20])
+        assert unchanged.base64_image is None
+        assert unchanged.output == SCREEN_UNCHANGED
+
+        # Explicit screenshots are always sent
+        explicit = await computer_tool(action="screenshot")
+        assert explicit.base64_image
+
+        # Before and after the click
+        capture.colors = ["white", "black"]
+        changed = await computer_tool(action="left_click")
+        assert changed.base64_image
+        assert changed.output is None
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_zoom_captures_region_at_native_resolution():
+    computer_tool = ComputerTool20251124()
+    computer_tool._scaling_enabled = True
+    computer_tool.width = 1920
+    computer_tool.height = 1080
+    assert computer_tool.to_params()["enable_zoom"] is True
+
+    capture = FakeCapture()
+    with patch.object(ScreenCapture, "open", return_value=capture):
+        result = await computer_tool(action="zoom", region=[683, 384, 1366, 768])
+        assert capture.box == (960, 540, 1920, 1080)
+        image = Image.open(io.BytesIO(base64.b64decode(result.base64_image)))
+        assert image.size == (960, 540)
+        assert "full screen" in result.output
+
+        # Magnified regions never exceed a full (scaled) screenshot
+        computer_tool._zoom_scale = 4.0
+        result = await computer_tool(action="zoom", region=[0, 0, 683, 384])
+        image = Image.open(io.BytesIO(base64.b64decode(result.base64_image)))
+        assert image.size == (1365, 768)
+
+
+@pytest.mark.asyncio
+async def test_computer_tool_zoom_invalid_region():
+    computer_tool = ComputerTool20251124()
+    computer_tool.width = 1024
+    computer_tool.height = 768
+    with pytest.raises(ToolError, match="region is required"):
+        await computer_tool(action="zoom")
+    for region in ([0, 0, 10], [0, 0, -1, 10], [10, 10, 5, 20], [0, 0, 2000, 10]):
+        with pytest.raises(ToolError):
+            await computer_tool(action="zoom", region=region)